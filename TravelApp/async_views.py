@@ -0,0 +1,399 @@
+import json
+import math
+from abc import ABCMeta, abstractmethod
+from contextlib import contextmanager, nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from django.middleware.csrf import get_token
+from django.views import View
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView as SyncGraphQLView, HttpError
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, specified_rules, \
+    validate_schema
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.reverse import reverse
+from rest_framework.views import exception_handler
+
+from . import documents, views
+from .cache import response_cache
+from .complexity import check_cost, get_config as get_cost_config
+from .conditional import etag_matches, not_modified, set_validators
+from .instrumentation import graphql_route, set_route
+from .renderers import JSONRenderer
+from .throttling import ScopedThrottle, acheck_throttles
+
+
+def is_anonymous(request):
+    # Without credentials every authenticator resolves to AnonymousUser with no query
+    return (
+        'HTTP_AUTHORIZATION' not in request.META
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        # APIClient.force_authenticate
+        and getattr(request, '_force_auth_user', None) is None
+    )
+
+
+class AsyncCatalogueView(View, metaclass=ABCMeta):
+    """
+    ASGI-native anonymous reads for a catalogue view.
+
+    Anonymous JSON ``GET``/``HEAD`` requests are answered in the event loop with
+    the async ORM and cache APIs, reusing ``drf_view`` for filtering,
+    pagination and serialization, so a cache hit or a ``304`` never occupies a
+    worker thread. Anything else is handed to ``drf_view`` unchanged.
+    Subclasses build the uncached response in ``respond``.
+    """
+
+    drf_view = None
+    drf_handler = None
+    view_is_async = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        initkwargs.setdefault('drf_handler', cls.drf_view.as_view())
+        view = super().as_view(**initkwargs)
+        # The delegated DRF view enforces CSRF for session-authenticated writes
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and is_anonymous(request):
+            view = self.drf_view()
+            view.setup(request, *args, **kwargs)
+            view.format_kwarg = None
+            view.request = view.initialize_request(request, *args, **kwargs)
+            view.headers = {}
+            try:
+                view.accepted_renderer, view.accepted_media_type = view.perform_content_negotiation(view.request)
+                if view.accepted_renderer.media_type != 'text/html':
+                    await acheck_throttles(view, view.request)
+                    return await self.read(view, view.request, kwargs)
+            except Throttled as exc:
+                # Answered here: delegating would count the request twice
+                return error_response(exc, view)
+            except APIException:
+                # Errors are rendered by the sync view, exactly as before
+                pass
+        return await self.delegate(request, *args, **kwargs)
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.drf_handler)(request, *args, **kwargs)
+
+    async def read(self, view, request, kwargs):
+        if not response_cache.enabled:
+            return await self.respond(view, request, kwargs)
+        key = await view.aget_cache_key(request, kwargs)
+        cached = await response_cache.aget(key)
+        if cached is not None:
+            data, headers = cached
+            if etag_matches(request, headers.get('ETag')):
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = render(data, view)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = await self.respond(view, request, kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            headers = {header: response[header] for header in view.cached_headers if header in response}
+            await response_cache.aset(key, (response.data, headers))
+            response['X-Cache'] = 'MISS'
+        return response
+
+    @abstractmethod
+    async def respond(self, view, request, kwargs):
+        """The response to an anonymous read the cache could not answer."""
+
+
+class AsyncListView(AsyncCatalogueView):
+    async def respond(self, view, request, kwargs):
+        stats = await view.filter_queryset(view.get_queryset()).aaggregate(
+            last_modified=Max('updated_at'), count=Count('pk')
+        )
+        # ETag only, see ConditionalGetMixin
+        etag = view.make_etag(request, stats['count'], stats['last_modified'])
+        if not_modified(request, etag, None):
+            return not_modified_response(etag, None)
+
+        queryset, compiled = view.get_list_queryset()
+        rows = await view.paginator.apaginate_queryset(queryset, request, view=view)
+        data = view.paginator.get_paginated_data(view.serialize_list(rows, compiled))
+        response = render(data, view)
+        set_validators(response, etag, None)
+        return response
+
+
+class AsyncDetailView(AsyncCatalogueView):
+    async def respond(self, view, request, kwargs):
+        lookup = {view.lookup_field: kwargs[view.lookup_url_kwarg or view.lookup_field]}
+        instance = await view.filter_queryset(view.get_queryset()).filter(**lookup).afirst()
+        if instance is None:
+            return await self.delegate(request._request, **kwargs)
+
+        if 'updated_at' in instance.get_deferred_fields():
+            # Left out by ?fields=
+            last_modified = await view.get_queryset().filter(**lookup).values_list('updated_at', flat=True).afirst()
+        else:
+            last_modified = instance.updated_at
+        etag = view.make_etag(request, lookup[view.lookup_field], last_modified)
+        if not_modified(request, etag, last_modified):
+            return not_modified_response(etag, last_modified)
+
+        response = render(view.get_serializer(instance).data, view)
+        set_validators(response, etag, last_modified)
+        return response
+
+
+def error_response(exc, view):
+    handled = exception_handler(exc, view.get_exception_handler_context())
+    response = render(handled.data, view)
+    response.status_code = handled.status_code
+    for header, value in handled.items():
+        if header != 'Content-Type':
+            response[header] = value
+    return response
+
+
+def render(data, view=None):
+    if view is None:
+        renderer, media_type, context = JSONRenderer(), JSONRenderer.media_type, {}
+    else:
+        renderer, media_type = view.accepted_renderer, view.accepted_media_type
+        context = {'view': view, 'request': view.request}
+    content_type = f'{media_type}; charset={renderer.charset}' if renderer.charset else media_type
+    response = HttpResponse(renderer.render(data, media_type, context), content_type=content_type)
+    response.data = data
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+class TourList(AsyncListView):
+    drf_view = views.TourList
+
+
+class TourDetail(AsyncDetailView):
+    drf_view = views.TourDetail
+
+
+class ApiRoot(View):
+    view_is_async = True
+
+    async def get(self, request, *args, **kwargs):
+        if 'text/html' in request.headers.get('Accept', ''):
+            return await sync_to_async(views.ApiRoot.as_view())(request, *args, **kwargs)
+        return render({
+            'users': reverse(views.UserList.name, request=request),
+            'reservations': reverse(views.ReservationList.name, request=request),
+            'tours': reverse(views.TourList.name, request=request),
+            'tour-reservations': reverse(views.TourReservationList.name, request=request),
+        })
+
+
+@contextmanager
+def read_snapshot():
+    """Runs the enclosed reads in one transaction that sees a single snapshot of the database."""
+    if connection.in_atomic_block:
+        yield
+        return
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        yield
+
+
+class GraphQLView(SyncGraphQLView):
+    """
+    GraphQL endpoint whose request handling stays in the event loop.
+
+    Body parsing, GraphiQL detection and the JSON response are handled in the
+    loop; the operations themselves run in one thread hop per request, since
+    the resolvers and relation loaders use the synchronous ORM. GraphiQL is
+    still rendered by the synchronous view.
+
+    Documents may be sent as persisted query hashes and are parsed and
+    validated once per process, see ``documents``. Each operation's
+    estimated cost is checked after validation, see ``complexity``, and
+    reported in its response's ``extensions``.
+
+    A JSON array of operations is a batch, answered with an array of
+    results. The operations share the request's relation loaders, so rows
+    loaded by one are not fetched again by the next; a batch of queries
+    also reads a single database snapshot.
+
+    Every operation counts against the client's ``booking`` rate when it is
+    a mutation and its ``catalogue`` rate otherwise; a request over either
+    is answered with ``429`` before any of its operations runs.
+    """
+
+    view_is_async = True
+    cost = None
+    throttle_scope = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'POST'):
+            return await self.delegate(request, *args, **kwargs)
+        try:
+            data = self.parse_body(request)
+            entries = data if isinstance(data, list) else [data]
+            set_route(graphql_route([
+                request.GET.get('operationName') or (entry.get('operationName') if isinstance(entry, dict) else None)
+                for entry in entries
+            ]))
+            if self.graphiql and self.can_display_graphiql(request, data):
+                return await self.delegate(request, *args, **kwargs)
+
+            # What ensure_csrf_cookie on the synchronous dispatch() does
+            get_token(request)
+            result, status_code = await sync_to_async(self.execute_operations)(request, data)
+            return HttpResponse(status=status_code, content=result, content_type='application/json')
+        except HttpError as e:
+            response = e.response
+            response['Content-Type'] = 'application/json'
+            response.content = self.json_encode(request, {'errors': [self.format_error(e)]})
+            return response
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+    def parse_body(self, request):
+        if self.get_content_type(request) != 'application/json':
+            return super().parse_body(request)
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            raise HttpError(HttpResponseBadRequest('POST body sent invalid JSON.'))
+        self.batch = isinstance(data, list)
+        if self.batch:
+            max_size = get_cost_config()['MAX_BATCH_SIZE']
+            if not 0 < len(data) <= max_size or not all(isinstance(entry, dict) for entry in data):
+                raise HttpError(HttpResponseBadRequest(f'A batch must hold 1 to {max_size} operations.'))
+        elif not isinstance(data, dict):
+            raise HttpError(HttpResponseBadRequest('The received data is not a valid JSON query.'))
+        return data
+
+    def execute_operations(self, request, data):
+        entries = data if self.batch else [data]
+        operations = [self.operation_type(request, entry) for entry in entries]
+        self.check_throttles(request, operations)
+        if not self.batch:
+            return self.get_response(request, data)
+        snapshot = read_snapshot() if all(op in (None, OperationType.QUERY) for op in operations) else nullcontext()
+        with snapshot:
+            responses = [self.get_response(request, entry) for entry in data]
+        result = '[{}]'.format(','.join(response[0] for response in responses))
+        return result, max(response[1] for response in responses)
+
+    def operation_type(self, request, data):
+        """The type of the operation a request entry runs; ``None`` for operations that will fail."""
+        query, _, operation_name, _ = self.get_graphql_params(request, data)
+        try:
+            query, _ = documents.resolve_query(query, request.GET.get('extensions') or data.get('extensions'))
+        except GraphQLError:
+            return None
+        if not query:
+            return None
+        document, errors = documents.validated_document(
+            self.schema.graphql_schema, query, tuple(self.validation_rules or specified_rules),
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        operation_ast = None if errors else get_operation_ast(document, operation_name)
+        return operation_ast.operation if operation_ast is not None else None
+
+    def check_throttles(self, request, operations):
+        waits = []
+        for operation in operations:
+            self.throttle_scope = 'booking' if operation == OperationType.MUTATION else 'catalogue'
+            throttle = ScopedThrottle()
+            if not throttle.allow_request(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            wait = math.ceil(max(waits))
+            response = HttpResponse(
+                f'Request was throttled. Expected available in {wait} seconds.',
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+            response['Retry-After'] = str(wait)
+            raise HttpError(response)
+
+    def get_response(self, request, data, show_graphiql=False):
+        self.cost = {}
+        return super().get_response(request, data, show_graphiql)
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        try:
+            query, unregistered = documents.resolve_query(
+                query, request.GET.get('extensions') or data.get('extensions')
+            )
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+        if not query:
+            return super().execute_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+
+        schema = self.schema.graphql_schema
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(errors=schema_validation_errors)
+        document, errors = documents.validated_document(
+            schema, query, tuple(self.validation_rules or specified_rules), graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if errors:
+            return ExecutionResult(errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if request.method == 'GET' and operation_ast is not None and operation_ast.operation != OperationType.QUERY:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'], f'Can only perform a {operation_ast.operation.value} operation from a POST request.',
+            ))
+        # Page sizes can come from the variables: estimated per request, on the cached document
+        errors = check_cost(schema, document, variables, operation_name, self.cost)
+        if errors:
+            return ExecutionResult(errors=errors)
+        if unregistered:
+            documents.registry.register(unregistered, query)
+
+        options = {
+            'root_value': self.get_root_value(request),
+            'context_value': self.get_context(request),
+            'variable_values': variables,
+            'operation_name': operation_name,
+            'middleware': self.get_middleware(request),
+            'execution_context_class': self.execution_context_class,
+        }
+        try:
+            if operation_ast is not None and operation_ast.operation == OperationType.MUTATION and (
+                graphene_settings.ATOMIC_MUTATIONS or connection.settings_dict.get('ATOMIC_MUTATIONS', False)
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False):
+                        transaction.set_rollback(True)
+                return result
+            return execute(schema, document, **options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+        finally:
+            if options['context_value'] is not None and operation_ast is not None \
+                    and operation_ast.operation == OperationType.MUTATION:
+                # Rows loaded so far may have changed: the next operation of a batch loads its own
+                options['context_value'].relation_loaders = None
+
+    def json_encode(self, request, d, pretty=False):
+        if self.cost:
+            d = {**d, 'extensions': {'cost': self.cost}}
+        return super().json_encode(request, d, pretty)
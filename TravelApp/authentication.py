@@ -0,0 +1,121 @@
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt import authentication, models, serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import LRUCache
+
+
+DEFAULT_CONFIG = {
+    'STATELESS_TOKENS': True,
+    'USER_CACHE_TTL': 60,
+    'USER_CACHE_MAXSIZE': 1024,
+}
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'TRAVELAPP_AUTHENTICATION', {})}
+
+
+USER_CLAIMS = ('is_staff', 'is_superuser')
+
+
+def add_user_claims(token, user):
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    token['username'] = user.get_username()
+    return token
+
+
+def tokens_for(user):
+    return add_user_claims(RefreshToken.for_user(user), user)
+
+
+class TokenObtainPairSerializer(serializers.TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Copied into every access token minted from this refresh token
+        return add_user_claims(super().get_token(user), user)
+
+
+class TokenRefreshSerializer(serializers.TokenRefreshSerializer):
+    """
+    Refreshes read the user again: the new access token carries its current
+    claims, and deactivated or deleted users get none.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = get_user_model()._default_manager.filter(pk=user_id_of(refresh)).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        add_user_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # Without the blacklist app
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
+
+def user_id_of(token):
+    # simplejwt writes the id claim as a string
+    return get_user_model()._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+
+
+class TokenUser(models.TokenUser):
+    @cached_property
+    def id(self):
+        return user_id_of(self.token)
+
+
+user_cache = LRUCache(get_config()['USER_CACHE_MAXSIZE'])
+
+
+def forget_user(user_id):
+    user_cache.set(user_id, None)
+
+
+class JWTAuthentication(authentication.JWTStatelessUserAuthentication):
+    """
+    Bearer tokens checked without a per-request ``User`` query.
+
+    Tokens carrying the ``is_staff``/``is_superuser`` claims authenticate as a
+    stateless ``TokenUser``, so permission checks read the claims. Refreshes
+    stamp them again from the ``User`` row, so a role change or deactivation
+    applies within ``ACCESS_TOKEN_LIFETIME``. Older tokens, or every token
+    with ``STATELESS_TOKENS`` off, load the ``User`` row through a small
+    per-process cache that keeps it for ``USER_CACHE_TTL`` seconds.
+    """
+
+    def get_user(self, validated_token):
+        if get_config()['STATELESS_TOKENS'] and all(claim in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+        return self.get_cached_user(validated_token)
+
+    def get_cached_user(self, validated_token):
+        user_id = user_id_of(validated_token)
+        cached = user_cache.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            user = cached[1]
+        else:
+            # simplejwt's lookup, including its inactive-user and revocation checks
+            user = authentication.JWTAuthentication.get_user(self, validated_token)
+            user_cache.set(user_id, (time.monotonic() + get_config()['USER_CACHE_TTL'], user))
+        # Requests must not share one mutable instance
+        return copy.copy(user)
@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Now
+
+from .cache import invalidate
+from .models import Tour, TourReservation
+from .stats import update_tour_stats
+
+
+class OverbookingError(Exception):
+    def __init__(self, tour_id, seats):
+        self.tour_id = tour_id
+        self.seats = seats
+        super().__init__(f"Tour #{tour_id} has fewer than {seats} free seats.")
+
+
+def seats_for(reservation):
+    return reservation.amount_of_adults + reservation.amount_of_children
+
+
+def held_seats(tour_reservation):
+    """Seats a link takes on its tour: inactive links keep their size but hold none."""
+    return tour_reservation.seats if tour_reservation.is_active else 0
+
+
+def reserve_seats(tour_id, seats):
+    """
+    Take ``seats`` on the tour or raise ``OverbookingError``.
+
+    A single conditional UPDATE checks and increments ``seats_taken``, so
+    concurrent bookings of one tour queue on that row's lock only and the
+    capacity check is re-evaluated against the committed counter.
+    """
+    if seats <= 0:
+        return
+    updated = Tour.objects.filter(
+        pk=tour_id, seats_taken__lte=F('max_number_of_participants') - seats
+    ).update(seats_taken=F('seats_taken') + seats, updated_at=Now())
+    if not updated:
+        raise OverbookingError(tour_id, seats)
+    invalidate(Tour)
+
+
+def release_seats(tour_id, seats):
+    if seats <= 0:
+        return
+    Tour.objects.filter(pk=tour_id).update(seats_taken=Greatest(F('seats_taken') - seats, 0), updated_at=Now())
+    invalidate(Tour)
+
+
+@transaction.atomic
+def book_tour(reservation, tour, **fields):
+    seats = seats_for(reservation)
+    if fields.get('is_active', True):
+        reserve_seats(tour.pk, seats)
+    return TourReservation.objects.create(reservation=reservation, tour=tour, seats=seats, **fields)
+
+
+# Called inside the serializer's transaction: no savepoint of its own
+@transaction.atomic(savepoint=False)
+def rebook(tour_reservation, previous_tour_id, previous_reservation_id, was_active=True):
+    """Move the seats of a link whose tour, reservation or ``is_active`` changed."""
+    if was_active:
+        release_seats(previous_tour_id, tour_reservation.seats)
+    if previous_tour_id != tour_reservation.tour_id:
+        # The link's post_save refreshed its current tour only
+        update_tour_stats([previous_tour_id])
+    seats = tour_reservation.seats
+    if previous_reservation_id != tour_reservation.reservation_id:
+        seats = seats_for(tour_reservation.reservation)
+    if tour_reservation.is_active:
+        reserve_seats(tour_reservation.tour_id, seats)
+    if seats != tour_reservation.seats:
+        tour_reservation.seats = seats
+        tour_reservation.save(update_fields=['seats', 'updated_at'])
+    return tour_reservation
+
+
+@transaction.atomic
+def resize_reservation(reservation):
+    """Apply a change in the number of participants to every booked tour."""
+    seats = seats_for(reservation)
+    for link in reservation.tour_links.exclude(seats=seats):
+        # Inactive links hold no seats, only their size follows the reservation
+        if link.is_active and seats > link.seats:
+            reserve_seats(link.tour_id, seats - link.seats)
+        elif link.is_active:
+            release_seats(link.tour_id, link.seats - seats)
+        link.seats = seats
+        link.save(update_fields=['seats', 'updated_at'])
@@ -0,0 +1,185 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from .booking import OverbookingError, reserve_seats, seats_for
+from .cache import invalidate
+from .models import Tour, TourReservation
+from .serializers import TourReservationSerializer, TourSerializer
+from .stats import refresh_tour_stats, update_tour_stats
+
+CHUNK_SIZE = 1000
+
+
+def preload_related(model, items):
+    """Resolve every foreign key referenced by ``items`` with one query per field."""
+    preloaded = {}
+    for field in model._meta.concrete_fields:
+        if not field.many_to_one:
+            continue
+        ids = set()
+        for item in items:
+            try:
+                ids.add(int(item[field.name]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        preloaded[field.name] = field.related_model._default_manager.in_bulk(ids)
+    return preloaded
+
+
+def validate_many(serializer_class, items, context, partial=False):
+    """
+    Validate ``items`` with a single child serializer.
+
+    Returns ``(index, validated_data)`` pairs for the valid items and an
+    ``{'index', 'errors'}`` entry for each invalid one.
+    """
+    context = {**context, 'preloaded': preload_related(serializer_class.Meta.model, items)}
+    child = serializer_class(many=True, partial=partial, context=context).child
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, child.run_validation(item)))
+        except serializers.ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.detail})
+    return valid, errors
+
+
+@transaction.atomic
+def create_tours(items, context):
+    valid, errors = validate_many(TourSerializer, items, context)
+    tours = Tour.objects.bulk_create([Tour(**data) for _, data in valid], batch_size=CHUNK_SIZE)
+    if tours:
+        invalidate(Tour)
+        refresh_tour_stats([tour.pk for tour in tours])
+    return tours, errors
+
+
+@transaction.atomic
+def create_tour_reservations(items, context):
+    """
+    Book many links at once with one conditional seat UPDATE per tour.
+
+    When a tour cannot fit all of its links from this batch, every one of
+    them is reported as an error and the tour is left untouched.
+    """
+    valid, errors = validate_many(TourReservationSerializer, items, context)
+    by_tour = defaultdict(list)
+    for index, data in valid:
+        by_tour[data['tour'].pk].append((index, data))
+
+    links = []
+    # Tour rows are locked in id order, so concurrent batches booking the same
+    # tours in a different order queue instead of deadlocking
+    for tour_id, group in sorted(by_tour.items()):
+        try:
+            # Inactive links are created without taking seats
+            seats = sum(seats_for(data['reservation']) for _, data in group if data.get('is_active', True))
+            reserve_seats(tour_id, seats)
+        except OverbookingError as exc:
+            errors.extend({'index': index, 'errors': {'tour': [str(exc)]}} for index, _ in group)
+            continue
+        links.extend((index, TourReservation(seats=seats_for(data['reservation']), **data)) for index, data in group)
+
+    errors.sort(key=lambda error: error['index'])
+    links = TourReservation.objects.bulk_create([link for _, link in sorted(links)], batch_size=CHUNK_SIZE)
+    update_tour_stats(link.tour_id for link in links)
+    return links, errors
+
+
+@transaction.atomic
+def update_many(serializer_class, items, context, fields=None):
+    """
+    Apply partial updates given as ``{'id': ..., <field>: ...}`` items with ``bulk_update``.
+
+    ``fields`` limits which fields may change in bulk; anything else is
+    reported per item.
+    """
+    model = serializer_class.Meta.model
+    ids = [item.get('id') for item in items if isinstance(item, dict)]
+    instances = model._default_manager.in_bulk([pk for pk in ids if isinstance(pk, int)])
+    valid, errors = validate_many(serializer_class, items, context, partial=True)
+
+    changed_fields = set()
+    updated = []
+    for index, data in valid:
+        instance = instances.get(items[index].get('id'))
+        if instance is None:
+            errors.append({'index': index, 'errors': {'id': ['Not found.']}})
+            continue
+        forbidden = set(data) - set(fields) if fields is not None else set()
+        if forbidden:
+            errors.append({'index': index, 'errors': {name: ['Cannot be changed in bulk.'] for name in forbidden}})
+            continue
+        previous = {name: getattr(instance, name) for name in data}
+        for name, value in data.items():
+            setattr(instance, name, value)
+        # Items are validated without their instance: checks across fields, and
+        # side effects such as seat moves, happen here
+        apply_bulk_update = getattr(serializer_class, 'apply_bulk_update', None)
+        if apply_bulk_update is not None:
+            try:
+                apply_bulk_update(instance, previous)
+            except serializers.ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+                continue
+        instance.updated_at = timezone.now()
+        changed_fields.update(data)
+        updated.append(instance)
+
+    if updated:
+        model._default_manager.bulk_update(updated, [*changed_fields, 'updated_at'], batch_size=CHUNK_SIZE)
+        if model is Tour:
+            invalidate(Tour)
+            refresh_tour_stats(instance.pk for instance in updated)
+        elif model is TourReservation:
+            update_tour_stats(instance.tour_id for instance in updated)
+    errors.sort(key=lambda error: error['index'])
+    return updated, errors
+
+
+def bulk_response(objects, errors, success_status):
+    payload = {'count': len(objects), 'ids': [obj.pk for obj in objects], 'errors': errors}
+    if not errors:
+        return Response(payload, status=success_status)
+    if not objects:
+        return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+    return Response(payload, status=status.HTTP_207_MULTI_STATUS)
+
+
+class BulkListMixin:
+    """
+    Bulk writes on a list endpoint.
+
+    ``POST`` with a JSON array creates, ``PATCH`` with an array of
+    ``{'id': ..., ...}`` updates and ``DELETE`` with ``{'ids': [...]}``
+    deletes, each in one transaction with per-item errors.
+    """
+    bulk_create = None
+    bulk_update_fields = None
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        objects, errors = self.bulk_create(request.data, self.get_serializer_context())
+        return bulk_response(objects, errors, status.HTTP_201_CREATED)
+
+    def patch(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of objects.'}, status=status.HTTP_400_BAD_REQUEST)
+        objects, errors = update_many(
+            self.get_serializer_class(), request.data, self.get_serializer_context(), self.bulk_update_fields
+        )
+        return bulk_response(objects, errors, status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'ids': ['Expected a list of integer ids.']}, status=status.HTTP_400_BAD_REQUEST)
+        model = self.get_queryset().model
+        with transaction.atomic():
+            deleted = model._default_manager.filter(pk__in=ids).delete()[1]
+        return Response({'count': deleted.get(model._meta.label, 0)}, status=status.HTTP_200_OK)
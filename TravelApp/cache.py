@@ -0,0 +1,222 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .conditional import etag_matches
+
+
+DEFAULT_CONFIG = {
+    'LOCAL_MAXSIZE': 1024,
+    # Seconds an entry is served from this process; None keeps it until evicted
+    'LOCAL_TIMEOUT': 5,
+    'SHARED_BACKEND': None,
+    'TIMEOUT': 300,
+}
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'TRAVELAPP_RESPONSE_CACHE', {})}
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for serialized read responses.
+
+    Entries are keyed by a per-table version, so bumping the version makes
+    every cached page of that table unreachable at once. With
+    ``SHARED_BACKEND`` set the versions and entries are shared by all
+    processes, so a write from any worker or management command invalidates
+    them, and the in-process LRU only saves the round trip for bodies.
+    Without it versions live in this process only and other processes' writes
+    go unseen: entries are then served for ``LOCAL_TIMEOUT`` seconds at most,
+    and nothing is cached when that is None.
+    """
+
+    def __init__(self):
+        self.local = LRUCache(get_config()['LOCAL_MAXSIZE'])
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        alias = get_config()['SHARED_BACKEND']
+        return caches[alias] if alias else None
+
+    @property
+    def enabled(self):
+        config = get_config()
+        return bool(config['SHARED_BACKEND']) or config['LOCAL_TIMEOUT'] is not None
+
+    def get_local(self, key):
+        entry = self.local.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set_local(self, key, value):
+        timeout = get_config()['LOCAL_TIMEOUT']
+        expires = time.monotonic() + timeout if timeout is not None else float('inf')
+        self.local.set(key, (expires, value))
+
+    def version(self, table):
+        shared = self.shared
+        if shared is None:
+            return self._versions.get(table, 0)
+        key = f'travelapp:version:{table}'
+        version = shared.get(key)
+        if version is None:
+            # Seeded from the clock so a version lost to eviction never matches old entries
+            shared.add(key, time.time_ns(), timeout=None)
+            version = shared.get(key)
+        return version
+
+    async def aversion(self, table):
+        shared = self.shared
+        if shared is None:
+            return self._versions.get(table, 0)
+        key = f'travelapp:version:{table}'
+        version = await shared.aget(key)
+        if version is None:
+            await shared.aadd(key, time.time_ns(), timeout=None)
+            version = await shared.aget(key)
+        return version
+
+    def bump(self, table):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+        shared = self.shared
+        if shared is not None:
+            key = f'travelapp:version:{table}'
+            try:
+                shared.incr(key)
+            except ValueError:
+                shared.add(key, time.time_ns(), timeout=None)
+
+    def get(self, key):
+        value = self.get_local(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.set_local(key, value)
+        return value
+
+    def set(self, key, value):
+        self.set_local(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, timeout=get_config()['TIMEOUT'])
+
+    async def aget(self, key):
+        value = self.get_local(key)
+        if value is None and self.shared is not None:
+            value = await self.shared.aget(key)
+            if value is not None:
+                self.set_local(key, value)
+        return value
+
+    async def aset(self, key, value):
+        self.set_local(key, value)
+        if self.shared is not None:
+            await self.shared.aset(key, value, timeout=get_config()['TIMEOUT'])
+
+
+response_cache = ResponseCache()
+
+
+def bump_version(model):
+    response_cache.bump(model._meta.db_table)
+
+
+def invalidate(model):
+    # Bumped again after commit: a read racing the open transaction could
+    # otherwise cache the old rows under the new version.
+    bump_version(model)
+    transaction.on_commit(lambda: bump_version(model))
+
+
+class CachedResponseMixin:
+    """
+    Serve anonymous GET responses of a generic view from ``response_cache``.
+
+    The key covers the view, its URL kwargs, the host and the normalized query
+    parameters, and embeds the version of the view model's table. Validators
+    set by the wrapped view are stored with the body, so a cached ``ETag``
+    still answers ``If-None-Match`` with ``304``.
+    """
+
+    cached_headers = ('ETag', 'Last-Modified')
+
+    def make_cache_key(self, request, kwargs, version):
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        raw = repr((request.scheme, request.get_host(), sorted(kwargs.items()), params))
+        return f'travelapp:response:{self.name}:{version}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+    def get_cache_key(self, request, kwargs):
+        table = self.get_queryset().model._meta.db_table
+        return self.make_cache_key(request, kwargs, response_cache.version(table))
+
+    async def aget_cache_key(self, request, kwargs):
+        table = self.get_queryset().model._meta.db_table
+        return self.make_cache_key(request, kwargs, await response_cache.aversion(table))
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated or not response_cache.enabled:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_cache_key(request, kwargs)
+        cached = response_cache.get(key)
+        if cached is not None:
+            data, headers = cached
+            if etag_matches(request, headers.get('ETag')):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(data)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            headers = {header: response[header] for header in self.cached_headers if header in response}
+            response_cache.set(key, (response.data, headers))
+            response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
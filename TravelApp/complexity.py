@@ -0,0 +1,142 @@
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, GraphQLList, GraphQLNonNull,
+    InlineFragmentNode, get_named_type, get_operation_ast, value_from_ast,
+)
+from graphql.pyutils import Undefined
+
+
+DEFAULT_CONFIG = {
+    'MAX_COST': 5_000,
+    'MAX_DEPTH': 8,
+    # Operations per batched request, each checked on its own
+    'MAX_BATCH_SIZE': 10,
+    # Rows assumed for a list without first/last, by "Type.field"
+    'DEFAULT_LIST_SIZE': 20,
+    'LIST_SIZES': {
+        'Query.allReservations': 100,
+        'Query.allTours': 100,
+        'Query.allTourReservations': 100,
+    },
+    # Cost of resolving one "Type.field"; object fields cost 1 and scalars 0 otherwise
+    'FIELD_WEIGHTS': {
+        'Query.searchTours': 10,
+    },
+}
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'TRAVELAPP_GRAPHQL_COST', {})}
+
+
+PAGE_ARGUMENTS = ('first', 'last')
+
+
+def is_list(type_):
+    if isinstance(type_, GraphQLNonNull):
+        type_ = type_.of_type
+    return isinstance(type_, GraphQLList)
+
+
+class CostAnalysis:
+    """
+    Cost of one operation estimated from its selection set.
+
+    A field costs its weight plus its selections' cost, once per row it
+    returns: ``first``/``last`` for paginated fields, the configured list
+    size for other lists, one otherwise. A page size given on a connection
+    or search field applies to the list beneath it. Introspection fields
+    are free.
+    """
+
+    def __init__(self, schema, fragments, variables, config):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables or {}
+        self.config = config
+        self.max_limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+        self.depth = 0
+
+    def page_size(self, field_def, node):
+        for argument in node.arguments:
+            if argument.name.value in PAGE_ARGUMENTS and argument.name.value in field_def.args:
+                value = value_from_ast(argument.value, field_def.args[argument.name.value].type, self.variables)
+                if value is not Undefined and value is not None:
+                    return min(max(value, 0), self.max_limit)
+        return None
+
+    def selection_cost(self, parent_type, selection_set, depth, page, fragments=frozenset()):
+        cost = 0
+        for selection in selection_set.selections if selection_set else ():
+            if isinstance(selection, FieldNode):
+                cost += self.field_cost(parent_type, selection, depth, page, fragments)
+            elif isinstance(selection, InlineFragmentNode):
+                type_ = parent_type
+                if selection.type_condition is not None:
+                    type_ = self.schema.get_type(selection.type_condition.name.value) or parent_type
+                cost += self.selection_cost(type_, selection.selection_set, depth, page, fragments)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                # Cycles are reported by NoFragmentCycles
+                if fragment is None or name in fragments:
+                    continue
+                type_ = self.schema.get_type(fragment.type_condition.name.value) or parent_type
+                cost += self.selection_cost(type_, fragment.selection_set, depth, page, fragments | {name})
+        return cost
+
+    def field_cost(self, parent_type, node, depth, page, fragments):
+        name = node.name.value
+        fields = getattr(parent_type, 'fields', None)
+        if name.startswith('__') or not fields or name not in fields:
+            return 0
+        field_def = fields[name]
+        key = f'{parent_type.name}.{name}'
+        type_ = get_named_type(field_def.type)
+        if not hasattr(type_, 'fields'):
+            return self.config['FIELD_WEIGHTS'].get(key, 0)
+
+        self.depth = max(self.depth, depth)
+        own_page = self.page_size(field_def, node)
+        if is_list(field_def.type):
+            rows = page if page is not None else self.config['LIST_SIZES'].get(key, self.config['DEFAULT_LIST_SIZE'])
+            rows = own_page if own_page is not None else rows
+            page = None
+        else:
+            rows = 1
+            page = own_page if own_page is not None else page
+        children = self.selection_cost(type_, node.selection_set, depth + 1, page, fragments)
+        return rows * (self.config['FIELD_WEIGHTS'].get(key, 1) + children)
+
+
+def check_cost(schema, document, variables, operation_name, report):
+    """
+    Errors for the operation that is going to run when it is estimated to
+    cost more than ``MAX_COST`` or nests deeper than ``MAX_DEPTH``. Run on a
+    validated document, once per request since page sizes can come from the
+    variables; ``report`` receives the estimate.
+    """
+    operation = get_operation_ast(document, operation_name)
+    root = schema.get_root_type(operation.operation) if operation is not None else None
+    if root is None:
+        return []
+    config = get_config()
+    fragments = {
+        definition.name.value: definition for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    analysis = CostAnalysis(schema, fragments, variables, config)
+    cost = analysis.selection_cost(root, operation.selection_set, 1, None)
+    report.update(cost=cost, maxCost=config['MAX_COST'], depth=analysis.depth, maxDepth=config['MAX_DEPTH'])
+    if analysis.depth > config['MAX_DEPTH']:
+        return [GraphQLError(
+            f"Query depth {analysis.depth} exceeds the maximum of {config['MAX_DEPTH']}.", operation,
+            extensions={'code': 'QUERY_TOO_DEEP'},
+        )]
+    if cost > config['MAX_COST']:
+        return [GraphQLError(
+            f"Query cost {cost} exceeds the maximum of {config['MAX_COST']}.", operation,
+            extensions={'code': 'QUERY_TOO_COSTLY'},
+        )]
+    return []
@@ -0,0 +1,84 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header or not etag:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag.removeprefix('W/') in [tag.removeprefix('W/') for tag in etags]
+
+
+def not_modified(request, etag, last_modified):
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        return etag_matches(request, etag)
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and last_modified is not None and int(last_modified.timestamp()) <= since
+
+
+def not_modified_response(etag, last_modified):
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+
+
+class ConditionalGetMixin:
+    """
+    ``ETag``/``Last-Modified`` for generic list and detail views.
+
+    The validators come from ``updated_at`` and the row count of the
+    filtered queryset, one aggregate query that never touches the
+    serializer, and a matching ``If-None-Match`` or ``If-Modified-Since``
+    is answered with ``304``. Lists get an ``ETag`` only: deleting a row
+    leaves their newest ``updated_at`` where it was, or moves it back.
+    """
+
+    def get_validator_fingerprint(self):
+        return ()
+
+    def make_etag(self, request, *parts):
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        raw = repr((self.name, request.user.pk, params, parts, self.get_validator_fingerprint()))
+        return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+    def list(self, request, *args, **kwargs):
+        stats = self.filter_queryset(self.get_queryset()).aggregate(
+            last_modified=Max('updated_at'), count=Count('pk')
+        )
+        etag = self.make_etag(request, stats['count'], stats['last_modified'])
+        if not_modified(request, etag, None):
+            return not_modified_response(etag, None)
+
+        response = super().list(request, *args, **kwargs)
+        set_validators(response, etag, None)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        last_modified = self.get_queryset().filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        ).values_list('updated_at', flat=True).first()
+        if last_modified is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = self.make_etag(request, kwargs[lookup_url_kwarg], last_modified)
+        if not_modified(request, etag, last_modified):
+            # Object permissions still apply before revealing that nothing changed
+            self.get_object()
+            return not_modified_response(etag, last_modified)
+
+        response = super().retrieve(request, *args, **kwargs)
+        set_validators(response, etag, last_modified)
+        return response
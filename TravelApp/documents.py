@@ -0,0 +1,159 @@
+import hashlib
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from graphql import GraphQLError, parse, validate
+from graphql.pyutils import Undefined
+
+from .cache import LRUCache
+
+
+DEFAULT_CONFIG = {
+    # Parsed and validated documents kept per process, by query text
+    'DOCUMENT_CACHE_MAXSIZE': 512,
+    # Longest document accepted, in characters
+    'MAX_DOCUMENT_LENGTH': 20_000,
+    # Automatic persisted queries registered by clients, per process and in
+    # SHARED_BACKEND (a CACHES alias) when set, for SHARED_TIMEOUT seconds
+    'REGISTRY_MAXSIZE': 1024,
+    'SHARED_BACKEND': None,
+    'SHARED_TIMEOUT': 24 * 60 * 60,
+    # JSON file mapping SHA-256 hashes to the documents the clients ship with
+    'ALLOW_LIST': None,
+    # Run only documents from ALLOW_LIST; clients cannot register new ones
+    'ALLOW_LIST_ONLY': False,
+}
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'TRAVELAPP_GRAPHQL_DOCUMENTS', {})}
+
+
+def sha256(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def load_allow_list(path):
+    with open(path) as manifest:
+        documents = json.load(manifest)
+    for hash, query in documents.items():
+        if sha256(query) != hash:
+            raise ImproperlyConfigured(f'{path}: {hash} is not the SHA-256 hash of its document.')
+    return documents
+
+
+def allow_list():
+    path = get_config()['ALLOW_LIST']
+    return load_allow_list(path) if path else {}
+
+
+def persisted_query_error(message, code):
+    return GraphQLError(message, extensions={'code': code})
+
+
+class Registry:
+    """Documents known by their SHA-256 hash: the allow list first, then those clients registered."""
+
+    def __init__(self):
+        self.local = LRUCache(get_config()['REGISTRY_MAXSIZE'])
+
+    @property
+    def shared(self):
+        alias = get_config()['SHARED_BACKEND']
+        return caches[alias] if alias else None
+
+    def get(self, hash):
+        query = allow_list().get(hash) or self.local.get(hash)
+        if query is None and self.shared is not None:
+            query = self.shared.get(f'travelapp:apq:{hash}')
+            if query is not None:
+                self.local.set(hash, query)
+        return query
+
+    def register(self, hash, query):
+        self.local.set(hash, query)
+        if self.shared is not None:
+            self.shared.set(f'travelapp:apq:{hash}', query, get_config()['SHARED_TIMEOUT'])
+
+    def clear(self):
+        self.local.clear()
+
+
+registry = Registry()
+
+
+def persisted_query(extensions):
+    """The ``persistedQuery`` request extension, from a JSON body or a GET parameter."""
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise persisted_query_error('Extensions are not valid JSON.', 'BAD_REQUEST')
+    if not isinstance(extensions, dict):
+        return None
+    persisted = extensions.get('persistedQuery')
+    if persisted is None:
+        return None
+    if not isinstance(persisted, dict) or persisted.get('version') != 1 \
+            or not isinstance(persisted.get('sha256Hash'), str):
+        raise persisted_query_error('Unsupported persisted query.', 'PERSISTED_QUERY_NOT_SUPPORTED')
+    return persisted['sha256Hash']
+
+
+def resolve_query(query, extensions):
+    """
+    ``(query, hash)``: the document to run for a request, following the
+    automatic persisted queries protocol, and the hash to register it under
+    once it has been validated and passed the cost check, if it is new. A
+    hash alone is looked up in the registry. Raises ``GraphQLError`` for
+    documents over ``MAX_DOCUMENT_LENGTH``, unknown or mismatched hashes
+    and, in allow-list-only mode, any document off the allow list.
+    """
+    config = get_config()
+    if query and len(query) > config['MAX_DOCUMENT_LENGTH']:
+        raise GraphQLError(
+            f"Documents are limited to {config['MAX_DOCUMENT_LENGTH']} characters.",
+            extensions={'code': 'QUERY_TOO_LARGE'},
+        )
+    hash = persisted_query(extensions)
+    if hash is None:
+        if query and config['ALLOW_LIST_ONLY'] and sha256(query) not in allow_list():
+            raise persisted_query_error('Only allow-listed documents are accepted.', 'PERSISTED_QUERY_NOT_ALLOWED')
+        return query, None
+    if not query:
+        query = registry.get(hash)
+        if query is None:
+            raise persisted_query_error('PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND')
+        return query, None
+    if sha256(query) != hash:
+        raise persisted_query_error('Provided sha does not match query.', 'PERSISTED_QUERY_HASH_MISMATCH')
+    if hash in allow_list():
+        return query, None
+    if config['ALLOW_LIST_ONLY']:
+        raise persisted_query_error('Only allow-listed documents are accepted.', 'PERSISTED_QUERY_NOT_ALLOWED')
+    return query, hash
+
+
+document_cache = LRUCache(get_config()['DOCUMENT_CACHE_MAXSIZE'])
+
+
+def validated_document(schema, query, rules, max_errors=None):
+    """
+    ``(document, errors)`` for a query: parsed and validated once, then
+    served from an LRU. Syntax and validation errors are cached too.
+    """
+    key = (schema, rules, query)
+    entry = document_cache.get(key, Undefined)
+    if entry is Undefined:
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            entry = (None, [e])
+        else:
+            entry = (document, validate(schema, document, rules, max_errors))
+        document_cache.set(key, entry)
+    return entry
@@ -0,0 +1,129 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, generics
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer
+
+from .models import Reservation, Tour, TourReservation
+
+CHUNK_SIZE = 2000
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error payloads are rendered, rows are streamed by the view
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class NDJSONRenderer(CSVRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_rows(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_rows(header, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + '\n'
+
+
+async def async_rows(stream):
+    """``stream`` for ASGI servers, read in a worker thread ``CHUNK_SIZE`` lines at a time."""
+    next_chunk = sync_to_async(lambda: ''.join(islice(stream, CHUNK_SIZE)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+class ExportView(generics.GenericAPIView):
+    """
+    Stream the filtered queryset as CSV (``?format=csv``, the default) or NDJSON (``?format=ndjson``).
+
+    Rows are read as tuples through a server-side cursor in chunks of
+    ``CHUNK_SIZE``, so memory use does not depend on the number of rows.
+    Under ASGI the stream is an async iterator: Django would otherwise read
+    a synchronous one to the end before sending anything.
+    """
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    permission_classes = [IsAdminUser]
+    columns = ()
+    filename = 'export'
+
+    def get_rows(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        return queryset.values_list(*self.columns).iterator(chunk_size=CHUNK_SIZE)
+
+    def get(self, request, *args, **kwargs):
+        rows = self.get_rows()
+        header = [column.replace('__', '_') for column in self.columns]
+        export_format = request.accepted_renderer.format
+        stream = ndjson_rows(header, rows) if export_format == 'ndjson' else csv_rows(header, rows)
+        if isinstance(request._request, ASGIRequest):
+            stream = async_rows(stream)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(stream, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{export_format}"'
+        return response
+
+
+class ReservationExport(ExportView):
+    queryset = Reservation.objects.all()
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['date_of_reservation']
+    filterset_fields = ['user', 'is_confirmed', 'is_active']
+    ordering = ['id']
+    columns = (
+        'id', 'user_id', 'user__username', 'date_of_reservation', 'amount_of_adults', 'amount_of_children',
+        'is_confirmed', 'is_active',
+    )
+    filename = 'reservations'
+    name = 'reservation-export'
+
+
+class TourReservationExport(ExportView):
+    queryset = TourReservation.objects.all()
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['reservation', 'tour']
+    filterset_fields = ['is_price_reduced', 'is_active']
+    ordering = ['id']
+    columns = ('id', 'reservation_id', 'tour_id', 'is_price_reduced', 'is_active', 'seats')
+    filename = 'tour-reservations'
+    name = 'tourreservation-export'
+
+
+class TourManifest(ExportView):
+    queryset = TourReservation.objects.all()
+    columns = (
+        'id', 'reservation_id', 'reservation__user__username', 'reservation__user__first_name',
+        'reservation__user__last_name', 'reservation__user__email', 'reservation__amount_of_adults',
+        'reservation__amount_of_children', 'is_price_reduced', 'is_active', 'reservation__is_confirmed',
+    )
+    name = 'tour-manifest'
+
+    def get_rows(self):
+        if not Tour.objects.filter(pk=self.kwargs['pk']).exists():
+            raise Http404
+        self.filename = f'tour-{self.kwargs["pk"]}-manifest'
+        queryset = self.get_queryset().filter(tour_id=self.kwargs['pk']).order_by('reservation_id')
+        return queryset.values_list(*self.columns).iterator(chunk_size=CHUNK_SIZE)
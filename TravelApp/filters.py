@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.db.models import F
+from django_filters import rest_framework as filters
+from psycopg2.extras import DateRange
+from rest_framework.exceptions import ValidationError
+
+from .models import Period, Tour
+
+
+class TourFilter(filters.FilterSet):
+    """
+    ``?price_min=&price_max=``, ``?travel_after=&travel_before=`` for tours
+    overlapping a travel window, ``?free_seats=`` and
+    ``?duration_min=&duration_max=`` in days, on top of the equality filters.
+    """
+    price = filters.RangeFilter()
+    travel = filters.DateFromToRangeFilter(method='filter_travel')
+    free_seats = filters.NumberFilter(method='filter_free_seats')
+    duration = filters.RangeFilter(method='filter_duration')
+
+    class Meta:
+        model = Tour
+        fields = ['tour_type', 'country', 'is_active']
+
+    def filter_travel(self, queryset, name, value):
+        # The range field hands over datetimes spanning whole days
+        start = value.start.date() if value.start else None
+        stop = value.stop.date() if value.stop else None
+        if start and stop and start > stop:
+            raise ValidationError({'travel_after': ['Must not be later than travel_before.']})
+        # Same expression as tour_period_idx, so the overlap is answered by the GiST index
+        window = DateRange(start, stop, '[]')
+        return queryset.alias(period=Period('date_start', 'date_end')).filter(period__overlap=window)
+
+    def filter_free_seats(self, queryset, name, value):
+        return queryset.filter(max_number_of_participants__gte=F('seats_taken') + int(value))
+
+    def filter_duration(self, queryset, name, value):
+        queryset = queryset.alias(duration=F('date_end') - F('date_start'))
+        if value.start is not None:
+            queryset = queryset.filter(duration__gte=timedelta(days=int(value.start)))
+        if value.stop is not None:
+            queryset = queryset.filter(duration__lte=timedelta(days=int(value.stop)))
+        return queryset
@@ -0,0 +1,281 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.dispatch import Signal
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import throttling
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    # Route name -> most queries one request may run; None for no budget
+    'QUERY_BUDGETS': {},
+    'DEFAULT_QUERY_BUDGET': None,
+    'METRICS_ALLOWED_IPS': ['127.0.0.1', '::1'],
+    # Past this many label sets new routes are recorded as "other"
+    'MAX_SERIES': 500,
+}
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'TRAVELAPP_INSTRUMENTATION', {})}
+
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def __contains__(self, labels):
+        return labels in self._series
+
+    def __len__(self):
+        return len(self._series)
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count)
+                            in self._series.items())
+        for labels, (counts, total, count) in series:
+            pairs = ','.join(f'{name}="{escape(value)}"' for name, value in zip(label_names, labels))
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket
+                lines.append(f'{self.name}_bucket{{{pairs},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{pairs}}} {total}')
+            lines.append(f'{self.name}_count{{{pairs}}} {count}')
+        return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+LABELS = ('route', 'method')
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+latency = Histogram('travelapp_request_duration_seconds', 'Time to build the response.', SECONDS)
+query_count = Histogram('travelapp_request_queries', 'Database queries per request.', QUERIES)
+query_time = Histogram('travelapp_request_query_duration_seconds', 'Time spent in database queries.', SECONDS)
+serializer_time = Histogram('travelapp_request_serializer_duration_seconds', 'Time spent serializing.', SECONDS)
+HISTOGRAMS = (latency, query_count, query_time, serializer_time)
+
+budget_overruns = {}
+_overruns_lock = threading.Lock()
+
+# Sent for every request over its query budget, with ``route``, ``method``, ``queries`` and ``budget``
+query_budget_exceeded = Signal()
+
+
+class RequestStats:
+    __slots__ = ('route', 'queries', 'query_time', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.route = None
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+# Context variables follow the request into sync_to_async threads
+current = ContextVar('travelapp_request_stats', default=None)
+
+
+def set_route(route):
+    """Name the current request's route, e.g. after the GraphQL operation it runs."""
+    stats = current.get()
+    if stats is not None:
+        stats.route = route
+
+
+def count_queries(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - started
+
+
+def instrument_connection(connection):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+@contextmanager
+def serializing():
+    """Counts the enclosed block as serializer time; nested blocks are counted once."""
+    stats = current.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_time += time.perf_counter() - started
+        stats.serializing = False
+
+
+class SerializerTimingMixin:
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
+
+
+GRAPHQL_OPERATION = re.compile(r'\w{1,64}')
+
+
+def graphql_route(operation_names):
+    if len(operation_names) != 1:
+        return 'graphql:batch'
+    name = operation_names[0]
+    # Operation names come from clients: keep the label set bounded and printable
+    return f'graphql:{name}' if name and GRAPHQL_OPERATION.fullmatch(name) else 'graphql:anonymous'
+
+
+class InstrumentationMiddleware:
+    """
+    Per-request route, query count and time, serializer time and latency.
+
+    The numbers feed the histograms served by ``metrics`` and are checked
+    against ``QUERY_BUDGETS``; requests over budget are logged and announced
+    through ``query_budget_exceeded``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        record(request, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        record(request, stats, time.perf_counter() - started)
+        return response
+
+
+def route_of(request, stats):
+    if stats.route:
+        return stats.route
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.route
+
+
+def record(request, stats, elapsed):
+    config = get_config()
+    route = route_of(request, stats)
+    method = request.method if request.method in METHODS else 'OTHER'
+    labels = (route, method)
+    if labels not in latency and len(latency) >= config['MAX_SERIES']:
+        labels = ('other', method)
+    latency.observe(labels, elapsed)
+    query_count.observe(labels, stats.queries)
+    query_time.observe(labels, stats.query_time)
+    serializer_time.observe(labels, stats.serializer_time)
+
+    budget = config['QUERY_BUDGETS'].get(route, config['DEFAULT_QUERY_BUDGET'])
+    if budget is not None and stats.queries > budget:
+        with _overruns_lock:
+            budget_overruns[labels] = budget_overruns.get(labels, 0) + 1
+        logger.warning('%s %s (%s) ran %d queries, over its budget of %d',
+                       method, request.path, route, stats.queries, budget)
+        query_budget_exceeded.send(sender=InstrumentationMiddleware, route=route, method=method,
+                                   queries=stats.queries, budget=budget)
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render(LABELS)
+    lines += ['# HELP travelapp_query_budget_exceeded_total Requests over their query budget.',
+              '# TYPE travelapp_query_budget_exceeded_total counter']
+    with _overruns_lock:
+        overruns = sorted(budget_overruns.items())
+    for (route, method), count in overruns:
+        lines.append(f'travelapp_query_budget_exceeded_total{{route="{escape(route)}",method="{method}"}} {count}')
+    lines += ['# HELP travelapp_throttled_requests_total Requests rejected by a throttle.',
+              '# TYPE travelapp_throttled_requests_total counter']
+    for scope, count in sorted(throttling.rejections.items()):
+        lines.append(f'travelapp_throttled_requests_total{{scope="{escape(scope)}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics(request):
+    """Prometheus text exposition of this process's metrics."""
+    if request.META.get('REMOTE_ADDR') not in get_config()['METRICS_ALLOWED_IPS']:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class QueryBudgetTestMixin:
+    """Fails a test case when a request it makes runs over its route's query budget."""
+
+    def setUp(self):
+        super().setUp()
+        overruns = []
+
+        def receiver(route, method, queries, budget, **kwargs):
+            overruns.append(f'{method} {route}: {queries} queries, budget {budget}')
+        query_budget_exceeded.connect(receiver, weak=False)
+        # Cleanups run last first: disconnect after the check
+        self.addCleanup(query_budget_exceeded.disconnect, receiver)
+        self.addCleanup(lambda: overruns and self.fail('Over the query budget: ' + '; '.join(overruns)))
@@ -0,0 +1,103 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def with_tiebreaker(ordering):
+    """
+    Append the primary key to ``ordering`` so every position is unique.
+
+    The tie-breaker follows the direction of the leading column, which lets
+    PostgreSQL walk a ``(column, id)`` index in a single direction.
+    """
+    ordering = list(ordering)
+    if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+        descending = bool(ordering) and ordering[0].startswith('-')
+        ordering.append('-id' if descending else 'id')
+    return ordering
+
+
+def reverse_ordering(ordering):
+    return [name[1:] if name.startswith('-') else '-' + name for name in ordering]
+
+
+def position(row, ordering):
+    if isinstance(row, dict):
+        return [row[name.lstrip('-')] for name in ordering]
+    return [getattr(row, name.lstrip('-')) for name in ordering]
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(model, ordering, cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise InvalidCursor(cursor)
+        return [
+            model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(ordering, values)
+        ]
+    except (TypeError, ValueError, ValidationError) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def seek(queryset, ordering, values, backward=False):
+    """
+    Keep only the rows strictly after ``values`` in ``ordering``.
+
+    Expands the row comparison ``(a, b) > (x, y)`` into
+    ``a > x OR (a = x AND b > y)``, which honours mixed directions and is
+    answered by an index on the ordering columns.
+    """
+    condition = Q()
+    equal = {}
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        descending = name.startswith('-') != backward
+        condition |= Q(**equal, **{f'{field}__{"lt" if descending else "gt"}': value})
+        equal[field] = value
+    return queryset.filter(condition)
+
+
+def page_queryset(queryset, ordering, size, cursor=None, backward=False):
+    ordering = with_tiebreaker(ordering)
+    queryset = queryset.order_by(*(reverse_ordering(ordering) if backward else ordering))
+    if cursor is not None:
+        values = decode_cursor(queryset.model, ordering, cursor)
+        queryset = seek(queryset, ordering, values, backward=backward)
+    return queryset[:size + 1]
+
+
+def finish_page(rows, size, backward=False):
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if backward:
+        rows.reverse()
+    return rows, has_more
+
+
+def page(queryset, ordering, size, cursor=None, backward=False):
+    """
+    Fetch ``size`` rows after (or before) ``cursor`` without OFFSET or COUNT.
+
+    Returns the rows in ``ordering`` order and whether more rows exist in the
+    direction of travel.
+    """
+    rows = list(page_queryset(queryset, ordering, size, cursor, backward))
+    return finish_page(rows, size, backward)
+
+
+async def apage(queryset, ordering, size, cursor=None, backward=False):
+    rows = [row async for row in page_queryset(queryset, ordering, size, cursor, backward)]
+    return finish_page(rows, size, backward)
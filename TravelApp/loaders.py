@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+
+class RelationLoaders:
+    """
+    Request-scoped batching for relation fields of the GraphQL types.
+
+    Every instance handed out by a resolver is registered as a sibling of its
+    model. The first time a relation is needed on one instance it is loaded for
+    all registered siblings at once with a single ``IN (...)`` query, so the
+    number of queries depends on the depth of the selection, not on the number
+    of rows. Rows already loaded in this request are never fetched again.
+    """
+
+    def __init__(self):
+        self._objects = defaultdict(dict)
+        self._resolved = defaultdict(set)
+        self._children = defaultdict(dict)
+
+    def register(self, instances):
+        instances = list(instances)
+        for instance in instances:
+            self._objects[type(instance)][instance.pk] = instance
+        return instances
+
+    def load(self, instance, name):
+        field = instance._meta.get_field(name)
+        self._objects[type(instance)].setdefault(instance.pk, instance)
+        if field.concrete:
+            return self._load_forward(instance, field)
+        if field.one_to_one:
+            return self._load_reverse_one(instance, field)
+        return self._load_reverse(instance, field)
+
+    def _load_forward(self, instance, field):
+        if field.is_cached(instance):
+            return getattr(instance, field.name)
+
+        key = getattr(instance, field.attname)
+        if key is None:
+            return None
+
+        model = type(instance)
+        related_model = field.related_model
+        objects = self._objects[related_model]
+        if key not in objects:
+            resolved = self._resolved[(model, field.name)]
+            pending = [pk for pk in self._objects[model] if pk not in resolved]
+            missing = {getattr(self._objects[model][pk], field.attname) for pk in pending}
+            missing.discard(None)
+            missing.difference_update(objects)
+            missing.add(key)
+            loaded = related_model._default_manager.in_bulk(missing)
+            objects.update(loaded)
+            resolved.update(pending)
+
+        related = objects.get(key)
+        field.set_cached_value(instance, related)
+        return related
+
+    def _load_reverse_one(self, instance, rel):
+        if rel.is_cached(instance):
+            return rel.get_cached_value(instance)
+        rows = self._load_reverse(instance, rel)
+        related = rows[0] if rows else None
+        rel.set_cached_value(instance, related)
+        return related
+
+    def _load_reverse(self, instance, rel):
+        accessor = rel.get_accessor_name()
+        prefetched = getattr(instance, '_prefetched_objects_cache', {})
+        if accessor in prefetched:
+            return list(prefetched[accessor])
+
+        model = type(instance)
+        children = self._children[(model, accessor)]
+        if instance.pk not in children:
+            pending = [pk for pk in self._objects[model] if pk not in children]
+            remote_field = rel.field
+            grouped = defaultdict(list)
+            rows = rel.related_model._default_manager.filter(**{f'{remote_field.name}__in': pending})
+            for row in self.register(rows):
+                parent_pk = getattr(row, remote_field.attname)
+                remote_field.set_cached_value(row, self._objects[model][parent_pk])
+                grouped[parent_pk].append(row)
+            for pk in pending:
+                children[pk] = grouped.get(pk, [])
+
+        return children[instance.pk]
+
+
+def get_loaders(info):
+    context = info.context
+    if context is None:
+        return RelationLoaders()
+
+    loaders = getattr(context, 'relation_loaders', None)
+    if loaders is None:
+        loaders = RelationLoaders()
+        context.relation_loaders = loaders
+    return loaders
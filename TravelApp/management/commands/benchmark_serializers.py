@@ -0,0 +1,101 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from TravelApp.management.commands.explain_indexes import SEED_RESERVATIONS_SQL, SEED_TOURS_SQL, SEED_USERS_SQL
+from TravelApp.models import Reservation, Tour, TourReservation
+from TravelApp.rows import row_serializer
+from TravelApp.serializers import ReservationSerializer, TourReservationSerializer, TourSerializer
+
+
+SEED_LINKS_SQL = """
+INSERT INTO "{table}" (reservation_id, tour_id, is_price_reduced, is_active, seats, updated_at)
+SELECT r.id, t.id, r.n %% 4 = 0, true, 1, now()
+FROM (SELECT id, row_number() OVER (ORDER BY id) AS n FROM "{reservation}") AS r
+JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n FROM "{tour}") AS t ON t.n = r.n
+LIMIT %s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list serialization throughput of the DRF serializers and the compiled row serializers "
+        "on seeded rows. Everything runs in one transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_serializers needs PostgreSQL.')
+
+        rows = options['rows']
+        with transaction.atomic():
+            self.seed(rows)
+            context = {'request': Request(APIRequestFactory().get('/api/tours/', HTTP_HOST='localhost'))}
+            cases = [
+                ('tours', TourSerializer, Tour.objects.defer('search_vector')),
+                ('reservations', ReservationSerializer, Reservation.objects.filter(user__username__startswith='bench-')),
+                ('tour-reservations', TourReservationSerializer, TourReservation.objects.all()),
+            ]
+            self.stdout.write(f"{'serializer':<20} {'rows':>7} {'DRF rows/s':>12} {'rows rows/s':>12} {'speedup':>8}"
+                              f" {'DRF e2e/s':>11} {'rows e2e/s':>11}")
+            for label, serializer_class, queryset in cases:
+                self.compare(label, serializer_class, queryset.order_by('id')[:rows], context, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, rows):
+        supervisor = User.objects.create(username='bench-supervisor')
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_USERS_SQL.replace('explain-user-', 'bench-'), [100])
+            cursor.execute(SEED_TOURS_SQL.format(table=Tour._meta.db_table), [supervisor.id, rows])
+            # Every third tour has a picture, so the URL converter is part of the run
+            cursor.execute(f'UPDATE "{Tour._meta.db_table}" SET profile_pic = \'profile/tour-\' || id || \'.jpg\' '
+                           f'WHERE id %% 3 = 0', [])
+            cursor.execute(SEED_RESERVATIONS_SQL.replace('explain-user-', 'bench-')
+                           .format(table=Reservation._meta.db_table), [rows, 100])
+            cursor.execute(SEED_LINKS_SQL.format(
+                table=TourReservation._meta.db_table,
+                reservation=Reservation._meta.db_table,
+                tour=Tour._meta.db_table,
+            ), [rows])
+
+    def compare(self, label, serializer_class, queryset, context, repeat):
+        compiled = row_serializer(serializer_class, context)
+
+        def drf():
+            return serializer_class(list(queryset), many=True, context=context).data
+
+        def values():
+            return compiled.serialize(list(queryset.values(*compiled.columns)), context)
+
+        instances = list(queryset)
+        rows = list(queryset.values(*compiled.columns))
+        if serializer_class(instances, many=True, context=context).data != compiled.serialize(rows, context):
+            raise CommandError(f'{label}: the row serializer output differs from {serializer_class.__name__}.')
+
+        count = len(rows)
+        results = [
+            best(lambda: serializer_class(instances, many=True, context=context).data, repeat),
+            best(lambda: compiled.serialize(rows, context), repeat),
+            best(drf, repeat),
+            best(values, repeat),
+        ]
+        drf_rate, rows_rate, drf_e2e, rows_e2e = (count / seconds for seconds in results)
+        self.stdout.write(f'{label:<20} {count:>7} {drf_rate:>12,.0f} {rows_rate:>12,.0f} {rows_rate / drf_rate:>7.1f}x'
+                          f' {drf_e2e:>11,.0f} {rows_e2e:>11,.0f}')
+
+
+def best(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
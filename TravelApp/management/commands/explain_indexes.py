@@ -0,0 +1,125 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from TravelApp import search
+from TravelApp.filters import TourFilter
+from TravelApp.models import Reservation, Tour
+
+
+SEED_USERS_SQL = """
+INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, email, is_staff, is_active, date_joined)
+SELECT '!', false, 'explain-user-' || g, '', '', '', false, true, now()
+FROM generate_series(1, %s) AS g
+"""
+
+SEED_TOURS_SQL = """
+INSERT INTO "{table}" (supervisor_id, max_number_of_participants, seats_taken, date_start, date_end, place_id,
+                       tour_type, price, country, region, city, accommodation, is_active, profile_pic, updated_at)
+SELECT %s, 10 + g %% 40, 0, d, d + (3 + g %% 11), g,
+       (ARRAY['all inclusive', 'standard', 'exclusive'])[1 + g %% 3],
+       round((200 + random() * 4800)::numeric, 2),
+       (ARRAY['Italy', 'Spain', 'Greece', 'France', 'Croatia', 'Portugal', 'Poland', 'Egypt', 'Turkey', 'Japan'])
+           [1 + (g * 7) %% 10],
+       'Region ' || g %% 50, 'City ' || g %% 500, 'Hotel ' || g %% 1000, g %% 5 <> 0, '', now()
+FROM (SELECT g, DATE '2025-01-01' + g %% 730 AS d FROM generate_series(1, %s) AS g) AS s
+"""
+
+SEED_RESERVATIONS_SQL = """
+INSERT INTO "{table}" (user_id, date_of_reservation, amount_of_children, amount_of_adults, is_confirmed, is_active,
+                       updated_at)
+SELECT u.id, DATE '2024-01-01' + g %% 900, g %% 3, 1 + g %% 4, g %% 10 <> 0, g %% 7 <> 0, now()
+FROM generate_series(1, %s) AS g
+JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n FROM auth_user WHERE username LIKE 'explain-user-%%') AS u
+  ON u.n = 1 + g %% %s
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset and print the query plans of the list view query shapes "
+        "with and without the TravelApp indexes. Everything runs in one transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tours', type=int, default=1_000_000)
+        parser.add_argument('--reservations', type=int, default=200_000)
+        parser.add_argument('--users', type=int, default=1_000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('explain_indexes needs PostgreSQL.')
+
+        with transaction.atomic():
+            self.seed(options['tours'], options['reservations'], options['users'])
+            user = User.objects.filter(username='explain-user-1').first()
+
+            scenarios = [
+                ('tour-list ?is_active=true&ordering=price',
+                 Tour.objects.filter(is_active=True).order_by('price', 'id')[:11]),
+                ('tour-list ?country=Italy&ordering=price',
+                 Tour.objects.filter(country='Italy').order_by('price', 'id')[:11]),
+                ('tour-list ?tour_type=exclusive&ordering=date_start',
+                 Tour.objects.filter(tour_type='exclusive').order_by('date_start', 'id')[:11]),
+                ('tour-list ?is_active=true&ordering=date_start&after=<deep cursor>',
+                 Tour.objects.filter(is_active=True, date_start__gt='2026-06-01').order_by('date_start', 'id')[:11]),
+                ('tour-list (default ordering)',
+                 Tour.objects.all()[:11]),
+                ('tour-list ?country=Italy&travel_after=2025-07-01&travel_before=2025-07-14&price_max=2000'
+                 '&free_seats=4&ordering=date_start',
+                 TourFilter({
+                     'country': 'Italy', 'travel_after': '2025-07-01', 'travel_before': '2025-07-14',
+                     'price_max': '2000', 'free_seats': '4',
+                 }, queryset=Tour.objects.all()).qs.order_by('date_start', 'id')[:11]),
+                ('tour-search ?q=City 42',
+                 search.ranked(search.matching(Tour.objects.all(), 'City 42'), 'City 42')[:10]),
+                ('reservation-list ?user=<id>&ordering=date_of_reservation',
+                 Reservation.objects.filter(user=user).order_by('date_of_reservation', 'id')[:11]),
+                ('reservation-list ?is_active=true&is_confirmed=true&ordering=date_of_reservation',
+                 Reservation.objects.filter(is_active=True, is_confirmed=True)
+                 .order_by('date_of_reservation', 'id')[:11]),
+            ]
+
+            self.stdout.write(self.style.MIGRATE_HEADING('With indexes'))
+            self.explain_all(scenarios)
+
+            self.drop_indexes(Tour, Reservation)
+            self.stdout.write(self.style.MIGRATE_HEADING('Without indexes'))
+            self.explain_all(scenarios)
+
+            transaction.set_rollback(True)
+
+    def drop_indexes(self, *models):
+        # Only those the database has: some, such as the trigram index, need an extension
+        with connection.cursor() as cursor:
+            existing = {
+                model: connection.introspection.get_constraints(cursor, model._meta.db_table) for model in models
+            }
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    if index.name in existing[model]:
+                        editor.remove_index(model, index)
+
+    def seed(self, tours, reservations, users):
+        started = time.perf_counter()
+        supervisor = User.objects.create(username='explain-supervisor')
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_USERS_SQL, [users])
+            cursor.execute(SEED_TOURS_SQL.format(table=Tour._meta.db_table), [supervisor.id, tours])
+            cursor.execute(SEED_RESERVATIONS_SQL.format(table=Reservation._meta.db_table), [reservations, users])
+            cursor.execute(f'ANALYZE "{Tour._meta.db_table}", "{Reservation._meta.db_table}", auth_user')
+        self.stdout.write(
+            f'Seeded {tours} tours, {reservations} reservations and {users} users '
+            f'in {time.perf_counter() - started:.1f}s'
+        )
+
+    def explain_all(self, scenarios):
+        for label, queryset in scenarios:
+            plan = queryset.explain(analyze=True)
+            scan = 'index scan' if 'Index' in plan and 'Seq Scan' not in plan else 'sequential scan'
+            self.stdout.write(self.style.SUCCESS(f'{label}: {scan}'))
+            self.stdout.write(plan)
+            self.stdout.write('')
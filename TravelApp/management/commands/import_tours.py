@@ -0,0 +1,355 @@
+import csv
+import io
+import json
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from TravelApp.booking import OverbookingError, resize_reservation
+from TravelApp.cache import invalidate
+from TravelApp.models import Reservation, Tour, TourReservation
+from TravelApp.stats import refresh_tour_stats, update_reservation_tours
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+
+def parse_int(minimum=None):
+    def parse(value):
+        number = int(value)
+        if minimum is not None and number < minimum:
+            raise ValueError(f'must be at least {minimum}')
+        return number
+    return parse
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'{value!r} is not a boolean')
+
+
+def parse_date(value):
+    return date.fromisoformat(value)
+
+
+def parse_decimal(field):
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places)
+    quantum = Decimal(1).scaleb(-field.decimal_places)
+
+    def parse(value):
+        try:
+            number = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(f'{value!r} is not a decimal')
+        if not number.is_finite() or abs(number) >= limit or number != number.quantize(quantum):
+            raise ValueError(f'{value!r} does not fit {field.max_digits} digits with {field.decimal_places} places')
+        return number
+    return parse
+
+
+def parse_text(field):
+    def parse(value):
+        text = str(value)
+        if not text:
+            raise ValueError('may not be blank')
+        if len(text) > field.max_length:
+            raise ValueError(f'longer than {field.max_length} characters')
+        return text
+    return parse
+
+
+def parse_choice(choices):
+    allowed = {choice for choice, _ in choices}
+
+    def parse(value):
+        if value not in allowed:
+            raise ValueError(f'{value!r} is not one of {sorted(allowed)}')
+        return value
+    return parse
+
+
+parse_id = parse_int(minimum=1)
+
+
+def field(model, name):
+    return model._meta.get_field(name)
+
+
+# Each kind lists its columns as (name, parser, default); a default of ...
+# marks the column as required. The username column is resolved separately.
+KINDS = {
+    'tours': {
+        'model': Tour,
+        'owner': ('supervisor', 'supervisor_id'),
+        'columns': [
+            ('max_number_of_participants', parse_int(minimum=0), ...),
+            ('date_start', parse_date, ...),
+            ('date_end', parse_date, ...),
+            ('place_id', parse_int(), ...),
+            ('tour_type', parse_choice(Tour.TOUR_TYPES), ...),
+            ('price', parse_decimal(field(Tour, 'price')), ...),
+            ('country', parse_text(field(Tour, 'country')), ...),
+            ('region', parse_text(field(Tour, 'region')), ...),
+            ('city', parse_text(field(Tour, 'city')), ...),
+            ('accommodation', parse_text(field(Tour, 'accommodation')), ...),
+            ('is_active', parse_bool, True),
+        ],
+        'insert_only': {'seats_taken': '0', 'profile_pic': "''"},
+        'stats': lambda updated_ids: refresh_tour_stats(updated_ids, missing=True),
+        'check': lambda row: row['date_end'] >= row['date_start'] or 'date_end is before date_start',
+    },
+    'reservations': {
+        'model': Reservation,
+        'owner': ('user', 'user_id'),
+        'columns': [
+            ('date_of_reservation', parse_date, ...),
+            ('amount_of_children', parse_int(minimum=0), 0),
+            ('amount_of_adults', parse_int(minimum=0), 0),
+            ('is_confirmed', parse_bool, True),
+            ('is_active', parse_bool, True),
+        ],
+        'insert_only': {},
+        'stats': update_reservation_tours,
+        'check': lambda row: True,
+        # Booked reservations changing head count move their seats first
+        'resize_booked': True,
+    },
+}
+
+
+def read_records(stream, file_format):
+    if file_format == 'ndjson':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                # Rejected by parse() like any other invalid record
+                record = ValueError(f'invalid JSON: {exc}')
+            yield line_number, record
+        return
+
+    reader = csv.reader(stream)
+    header = next(reader, [])
+    for line_number, values in enumerate(reader, start=2):
+        yield line_number, dict(zip(header, values))
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream tours or reservations from a CSV or NDJSON file into PostgreSQL. Rows are validated in Python, "
+        "COPY'd into a staging table batch by batch and merged with one INSERT ... ON CONFLICT (id) statement."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--kind', choices=sorted(KINDS), default='tours')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], dest='file_format')
+        parser.add_argument('--batch-size', type=int, default=50_000)
+        parser.add_argument('--strict', action='store_true', help='Abort without importing if any row is invalid.')
+        parser.add_argument('--max-errors', type=int, default=20, help='How many rejected rows to print.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('import_tours loads through COPY and needs PostgreSQL.')
+
+        self.kind = KINDS[options['kind']]
+        self.max_errors = options['max_errors']
+        self.rejected = 0
+        self.usernames = {}
+        file_format = options['file_format'] or ('ndjson' if options['path'].endswith(('.ndjson', '.jsonl')) else 'csv')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            self.create_staging()
+            staged = 0
+            with open(options['path'], newline='', encoding='utf-8') as stream:
+                batch = []
+                for record in read_records(stream, file_format):
+                    batch.append(record)
+                    if len(batch) >= options['batch_size']:
+                        staged += self.stage(batch)
+                        batch = []
+                staged += self.stage(batch)
+
+            if self.kind.get('resize_booked'):
+                self.resize_booked()
+            if self.rejected and options['strict']:
+                raise CommandError(f'{self.rejected} invalid rows, nothing imported.')
+            inserted, total = self.merge()
+            self.refresh_stats()
+
+        if total:
+            invalidate(self.kind['model'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} {options["kind"]} ({inserted} new, {total - inserted} updated), '
+            f'rejected {self.rejected}, staged {staged} in {elapsed:.2f}s '
+            f'({(staged + self.rejected) / elapsed if elapsed else 0:,.0f} rows/s)'
+        ))
+
+    @property
+    def columns(self):
+        return ['id', self.kind['owner'][1], *(name for name, _, _ in self.kind['columns'])]
+
+    def create_staging(self):
+        model = self.kind['model']
+        select = ', '.join(f'"{name}"' for name in self.columns)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS travelapp_import_staging')
+            cursor.execute(
+                f'CREATE TEMP TABLE travelapp_import_staging ON COMMIT DROP AS '
+                f'SELECT {select}, 0::bigint AS line FROM "{model._meta.db_table}" WITH NO DATA'
+            )
+
+    def reject(self, line_number, message):
+        self.rejected += 1
+        if self.rejected <= self.max_errors:
+            self.stderr.write(f'line {line_number}: {message}')
+
+    def parse(self, line_number, record):
+        if isinstance(record, ValueError):
+            raise record
+        if not isinstance(record, dict):
+            raise ValueError('expected an object')
+        row = {}
+        raw_id = record.get('id')
+        row['id'] = parse_id(raw_id) if raw_id not in (None, '') else None
+        for name, parser, default in self.kind['columns']:
+            value = record.get(name)
+            if value is None or value == '':
+                if default is ...:
+                    raise ValueError(f'{name}: this field is required')
+                row[name] = default
+                continue
+            try:
+                row[name] = parser(value)
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f'{name}: {exc}')
+        check = self.kind['check'](row)
+        if check is not True:
+            raise ValueError(check)
+        return row
+
+    def resolve_usernames(self, usernames):
+        missing = usernames - self.usernames.keys()
+        if missing:
+            self.usernames.update(User.objects.filter(username__in=missing).values_list('username', 'id'))
+
+    def stage(self, records):
+        owner = self.kind['owner'][0]
+        parsed = []
+        for line_number, record in records:
+            try:
+                row = self.parse(line_number, record)
+            except ValueError as exc:
+                self.reject(line_number, exc)
+                continue
+            parsed.append((line_number, str(record.get(owner) or ''), row))
+
+        self.resolve_usernames({username for _, username, _ in parsed})
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        names = [name for name, _, _ in self.kind['columns']]
+        staged = 0
+        for line_number, username, row in parsed:
+            owner_id = self.usernames.get(username)
+            if owner_id is None:
+                self.reject(line_number, f'{owner}: unknown username {username!r}')
+                continue
+            writer.writerow([row['id'], owner_id, *(row[name] for name in names), line_number])
+            staged += 1
+
+        if not staged:
+            return 0
+        buffer.seek(0)
+        columns = ', '.join(f'"{name}"' for name in [*self.columns, 'line'])
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f'COPY travelapp_import_staging ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        return staged
+
+    def resize_booked(self):
+        """
+        Resize the tour links of updated reservations through the booking
+        capacity check; rows that would overbook a tour are rejected.
+        """
+        sql = f'''
+            SELECT s.line, s.id, s.amount_of_adults, s.amount_of_children
+            FROM (
+                SELECT DISTINCT ON (id) * FROM travelapp_import_staging WHERE id IS NOT NULL ORDER BY id, line DESC
+            ) AS s
+            WHERE EXISTS (
+                SELECT 1 FROM "{TourReservation._meta.db_table}" AS l
+                WHERE l.reservation_id = s.id AND l.seats <> s.amount_of_adults + s.amount_of_children
+            )
+            ORDER BY s.id
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+        reservations = Reservation.objects.in_bulk([pk for _, pk, _, _ in rows])
+        overbooked = []
+        for line_number, pk, adults, children in rows:
+            reservation = reservations[pk]
+            reservation.amount_of_adults, reservation.amount_of_children = adults, children
+            try:
+                resize_reservation(reservation)
+            except OverbookingError as exc:
+                self.reject(line_number, exc)
+                overbooked.append(pk)
+        if overbooked:
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM travelapp_import_staging WHERE id = ANY(%s)', [overbooked])
+
+    def merge(self):
+        table = self.kind['model']._meta.db_table
+        data_columns = self.columns[1:]
+        insert_only = self.kind['insert_only']
+        target = ', '.join(f'"{name}"' for name in ['id', *data_columns, *insert_only, 'updated_at'])
+        values = ', '.join(f's."{name}"' for name in data_columns)
+        defaults = ''.join(f', {expression}' for expression in insert_only.values())
+        updates = ', '.join(f'"{name}" = EXCLUDED."{name}"' for name in [*data_columns, 'updated_at'])
+        sequence = f"pg_get_serial_sequence('\"{table}\"', 'id')"
+        sql = f'''
+            WITH upserted AS (
+                INSERT INTO "{table}" ({target})
+                SELECT COALESCE(s.id, nextval({sequence})), {values}{defaults}, now()
+                FROM (
+                    SELECT DISTINCT ON (id) * FROM travelapp_import_staging WHERE id IS NOT NULL ORDER BY id, line DESC
+                ) AS s
+                UNION ALL
+                SELECT nextval({sequence}), {values}{defaults}, now()
+                FROM travelapp_import_staging AS s WHERE s.id IS NULL
+                ON CONFLICT (id) DO UPDATE SET {updates}
+                RETURNING xmax = 0 AS inserted
+            )
+            SELECT count(*) FILTER (WHERE inserted), count(*) FROM upserted
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            inserted, total = cursor.fetchone()
+            # Explicit ids may run ahead of the sequence
+            cursor.execute(
+                f'SELECT setval({sequence}, GREATEST((SELECT max(id) FROM "{table}"), 1)) '
+                f'WHERE EXISTS (SELECT 1 FROM travelapp_import_staging WHERE id IS NOT NULL)'
+            )
+        return inserted, total
+
+    def refresh_stats(self):
+        # New tours only need their empty row, updated rows may have changed revenue or head counts
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT DISTINCT id FROM travelapp_import_staging WHERE id IS NOT NULL')
+            updated_ids = [pk for pk, in cursor.fetchall()]
+        self.kind['stats'](updated_ids)
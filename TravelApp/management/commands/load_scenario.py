@@ -0,0 +1,245 @@
+import asyncio
+import base64
+import json
+import random
+import re
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from TravelApp.management.commands.load_test import percentile
+from TravelApp.management.commands.seed_benchmark import ADMIN_USERNAME, PASSWORD, USERNAME_PREFIX, run_metadata
+from TravelApp.models import Tour
+
+DEFAULT_MIX = 'browse=70,login=10,booking=15,export=5'
+
+METRIC = re.compile(r'^travelapp_request_queries_(sum|count)\{route="([^"]*)",method="([^"]*)"\} (\S+)$', re.M)
+
+
+async def request(base, method, path, headers=None, body=None, timeout=30.0):
+    parts = urlsplit(base)
+    payload = json.dumps(body).encode() if body is not None else b''
+    headers = {'Accept': 'application/json', **(headers or {})}
+    head = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close']
+    head += [f'{name}: {value}' for name, value in headers.items()]
+    if body is not None:
+        head += ['Content-Type: application/json', f'Content-Length: {len(payload)}']
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        writer.write('\r\n'.join(head).encode() + b'\r\n\r\n' + payload)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status_line, _, rest = response.partition(b'\r\n')
+    content = rest.partition(b'\r\n\r\n')[2]
+    if b'Transfer-Encoding: chunked' in rest.partition(b'\r\n\r\n')[0]:
+        content = dechunk(content)
+    return int(status_line.split()[1]), content, time.perf_counter() - start
+
+
+def dechunk(content):
+    chunks = []
+    while content:
+        size, _, content = content.partition(b'\r\n')
+        size = int(size.split(b';')[0], 16)
+        if not size:
+            break
+        chunks.append(content[:size])
+        content = content[size + 2:]
+    return b''.join(chunks)
+
+
+def token_user_id(token):
+    payload = token.split('.')[1]
+    return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['user_id']
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in Scenario.steps:
+            raise CommandError(f"Unknown step '{name}', expected one of: {', '.join(Scenario.steps)}.")
+        mix[name] = int(weight)
+    return mix
+
+
+def query_metrics(text):
+    """``(route, method) -> [query sum, request count]`` from a /metrics/ page."""
+    metrics = defaultdict(lambda: [0.0, 0.0])
+    for kind, route, method, value in METRIC.findall(text):
+        metrics[route, method][0 if kind == 'sum' else 1] = float(value)
+    return metrics
+
+
+class Scenario:
+    """
+    One virtual user: picks steps by weight and keeps its login between them.
+
+    Every request is recorded under its endpoint, named like the route so the
+    server's per-route query counts line up with the client's latencies.
+    """
+
+    steps = ('browse', 'login', 'booking', 'export')
+
+    def __init__(self, base, rng, tour_ids, usernames, results, timeout):
+        self.base = base
+        self.rng = rng
+        self.tour_ids = tour_ids
+        self.usernames = usernames
+        self.results = results
+        self.timeout = timeout
+        self.token = None
+        self.admin_token = None
+
+    async def call(self, endpoint, method, path, token=None, body=None, accept='application/json'):
+        headers = {'Accept': accept}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            status, content, latency = await request(self.base, method, path, headers, body, self.timeout)
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+            self.results[endpoint]['errors'] += 1
+            return None, None
+        result = self.results[endpoint]
+        result['statuses'][status] = result['statuses'].get(status, 0) + 1
+        if status < 500:
+            result['latencies'].append(latency)
+        return status, content
+
+    async def browse(self):
+        ordering = self.rng.choice(['price', '-price', 'date_start'])
+        await self.call(('tour-list', 'GET'), 'GET', f'/api/tours/?ordering={ordering}&page_size=20')
+        await self.call(('tour-detail', 'GET'), 'GET', f'/api/tours/{self.rng.choice(self.tour_ids)}/')
+        query = urlencode({'q': f'City {int(50 * self.rng.random() ** 2)}'})
+        await self.call(('tour-search', 'GET'), 'GET', f'/api/tours/search/?{query}')
+
+    async def log_in(self, username):
+        status, content = await self.call(('login', 'POST'), 'POST', '/login/',
+                                          body={'username': username, 'password': PASSWORD})
+        return json.loads(content)['access'] if status == 200 else None
+
+    async def login(self):
+        self.token = await self.log_in(self.rng.choice(self.usernames))
+
+    async def booking(self):
+        if self.token is None:
+            await self.login()
+        if self.token is None:
+            return
+        user_id = token_user_id(self.token)
+        status, content = await self.call(('reservation-list', 'GET'), 'GET',
+                                          f'/api/reservations/?user={user_id}&page_size=5', self.token)
+        if status != 200 or not json.loads(content)['results']:
+            return
+        reservation = self.rng.choice(json.loads(content)['results'])['id']
+        # Overbooked tours answer 400: part of the scenario, not a failure
+        await self.call(('tourreservation-list', 'POST'), 'POST', '/api/tour-reservations/', self.token,
+                        {'reservation': reservation, 'tour': self.rng.choice(self.tour_ids)})
+
+    async def export(self):
+        if self.admin_token is None:
+            self.admin_token = await self.log_in(ADMIN_USERNAME)
+        if self.admin_token is not None:
+            await self.call(('reservation-export', 'GET'), 'GET', '/api/reservations/export/?is_confirmed=false',
+                            self.admin_token, accept='text/csv')
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a scripted load scenario (catalogue browse, login, booking, admin export) against a running "
+        "server on the seed_benchmark dataset, and print throughput, p50/p95/p99 latency and queries per "
+        "request for each endpoint as JSON. Queries per request come from the server's /metrics/, so run a "
+        "single worker, and raise TRAVELAPP_THROTTLING rates on it, or most calls are answered with 429."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Base URL of the server, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--iterations', type=int, default=2_000, help='Scenario steps in total.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Virtual users.')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Step weights, default {DEFAULT_MIX}.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--output', help='Write the JSON here instead of to stdout.')
+
+    def handle(self, *args, **options):
+        base = options['url'].rstrip('/')
+        if urlsplit(base).scheme != 'http':
+            raise CommandError(f'Only http:// URLs are supported: {base}')
+        if options['concurrency'] < 1 or options['iterations'] < 1:
+            raise CommandError('--iterations and --concurrency must be positive.')
+        mix = parse_mix(options['mix'])
+
+        tour_ids = list(Tour.objects.filter(supervisor__username=ADMIN_USERNAME, is_active=True)
+                        .order_by('id').values_list('id', flat=True)[:1_000])
+        usernames = list(User.objects.filter(username__startswith=USERNAME_PREFIX)
+                         .order_by('id').values_list('username', flat=True)[:1_000])
+        if not tour_ids or not usernames:
+            raise CommandError('No benchmark dataset: run seed_benchmark first.')
+
+        result = {
+            'meta': run_metadata(),
+            'scenario': {key: options[key] for key in ('url', 'iterations', 'concurrency', 'seed')} | {'mix': mix},
+        }
+        result.update(asyncio.run(self.run(base, mix, tour_ids, usernames, options)))
+
+        document = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(document + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(document)
+
+    async def metrics(self, base, timeout):
+        try:
+            status, content, _ = await request(base, 'GET', '/metrics/', timeout=timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        return query_metrics(content.decode()) if status == 200 else None
+
+    async def run(self, base, mix, tour_ids, usernames, options):
+        results = defaultdict(lambda: {'statuses': {}, 'errors': 0, 'latencies': []})
+        steps = iter(range(options['iterations']))
+        names, weights = list(mix), list(mix.values())
+
+        async def virtual_user(number):
+            rng = random.Random(options['seed'] * 1_000 + number)
+            scenario = Scenario(base, rng, tour_ids, usernames, results, options['timeout'])
+            for _ in steps:
+                await getattr(scenario, rng.choices(names, weights)[0])()
+
+        before = await self.metrics(base, options['timeout'])
+        start = time.perf_counter()
+        await asyncio.gather(*(virtual_user(number) for number in range(options['concurrency'])))
+        elapsed = time.perf_counter() - start
+        after = await self.metrics(base, options['timeout'])
+
+        endpoints = {}
+        for (route, method), result in sorted(results.items()):
+            latencies = sorted(result['latencies'])
+            queries = None
+            if before is not None and after is not None:
+                total, count = (a - b for a, b in zip(after[route, method], before[route, method]))
+                queries = total / count if count else None
+            endpoints[f'{method} {route}'] = {
+                'requests': sum(result['statuses'].values()) + result['errors'],
+                'statuses': {str(status): count for status, count in sorted(result['statuses'].items())},
+                'errors': result['errors'],
+                'throughput': len(latencies) / elapsed,
+                'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else None,
+                'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+                'p99_ms': percentile(latencies, 0.99) * 1000 if latencies else None,
+                'queries_per_request': queries,
+            }
+        requests = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'elapsed_s': elapsed,
+            'throughput': requests / elapsed,
+            'endpoints': endpoints,
+        }
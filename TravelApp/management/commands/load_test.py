@@ -0,0 +1,87 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+async def fetch(url, delay, timeout):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+    try:
+        # A slow client: the request line first, the rest of the head after ``delay``
+        writer.write(f'GET {path} HTTP/1.1\r\n'.encode())
+        await writer.drain()
+        if delay:
+            await asyncio.sleep(delay)
+        writer.write(f'Host: {parts.netloc}\r\nAccept: application/json\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return int(status_line.split()[1]), time.perf_counter() - start
+
+
+async def run(url, requests, concurrency, delay, timeout):
+    latencies, failures = [], 0
+    queue = iter(range(requests))
+
+    async def client():
+        nonlocal failures
+        for _ in queue:
+            try:
+                status, latency = await fetch(url, delay, timeout)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                failures += 1
+                continue
+            if status >= 400:
+                failures += 1
+            else:
+                latencies.append(latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, failures, time.perf_counter() - start
+
+
+def percentile(values, share):
+    return values[min(int(len(values) * share), len(values) - 1)] if values else float('nan')
+
+
+class Command(BaseCommand):
+    help = (
+        "Hit one or more running deployments with concurrent slow clients and compare throughput and "
+        "latency, e.g. the ASGI and the WSGI server of the same build on the /api/tours/ catalogue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', metavar='url')
+        parser.add_argument('--requests', type=int, default=10_000)
+        parser.add_argument('--concurrency', type=int, default=1_000)
+        parser.add_argument('--delay', type=float, default=0.0, help='Seconds each client stalls mid-request.')
+        parser.add_argument('--timeout', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+
+        self.stdout.write(f"{'url':<50} {'ok':>7} {'failed':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for url in options['urls']:
+            if urlsplit(url).scheme != 'http':
+                raise CommandError(f'Only http:// URLs are supported: {url}')
+            latencies, failures, elapsed = asyncio.run(run(
+                url, options['requests'], options['concurrency'], options['delay'], options['timeout']
+            ))
+            latencies.sort()
+            self.stdout.write(
+                f'{url:<50} {len(latencies):>7} {failures:>7} {len(latencies) / elapsed:>9.0f} '
+                + ' '.join(f'{percentile(latencies, share) * 1000:>8.1f}' for share in (0.5, 0.95, 0.99))
+            )
+            if latencies:
+                self.stdout.write(f'{"":<50} mean {statistics.fmean(latencies) * 1000:.1f} ms')
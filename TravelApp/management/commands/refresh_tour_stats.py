@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from TravelApp.stats import refresh_tour_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the TourStats summary from the bookings. The hooks keep it current; "
+        "run this periodically to repair drift from writes that bypass them (raw SQL, admin bulk actions)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tour', type=int, action='append', dest='tour_ids', help='Only refresh these tours.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            count = refresh_tour_stats(options['tour_ids'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed stats of {count} tours in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,156 @@
+import json
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from TravelApp.management.commands.benchmark_serializers import best
+from TravelApp.management.commands.seed_benchmark import ADMIN_USERNAME, USERNAME_PREFIX, run_metadata
+from TravelApp.models import Reservation, Tour, TourReservation, TourStats
+from TravelApp.rows import row_serializer
+from TravelApp.schema import Query, schema
+from TravelApp import serializers
+
+
+def serializer_cases():
+    users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+    reservations = Reservation.objects.filter(user__username__startswith=USERNAME_PREFIX)
+    tours = Tour.objects.defer('search_vector').filter(supervisor__username=ADMIN_USERNAME)
+    return [
+        (serializers.UserSerializer, users, {}),
+        (serializers.RegisterSerializer, users, {}),
+        (serializers.ReservationSerializer, reservations, {}),
+        (serializers.ReservationAggregatesSerializer,
+         reservations.annotate(participants=F('amount_of_adults') + F('amount_of_children'),
+                               tour_count=Count('tour_links')),
+         {'aggregates': ('participants', 'tour_count')}),
+        (serializers.TourSerializer, tours, {}),
+        (serializers.TourStatsSerializer, TourStats.objects.filter(tour__in=tours), {}),
+        (serializers.TourReservationSerializer, TourReservation.objects.filter(tour__in=tours), {}),
+    ]
+
+
+# One representative operation per Query field, nested far enough to run the type resolvers too
+RESOLVER_QUERIES = {
+    'all_reservations': (
+        'query { allReservations(isActive: true, isConfirmed: false) '
+        '{ id dateOfReservation user { username } tourLinks { seats } } }'
+    ),
+    'reservations': (
+        'query { reservations(first: 50) { edges { node '
+        '{ id user { username } tourLinks { tour { city } } } } } }'
+    ),
+    'reservation': (
+        'query($reservation: Int) { reservation(id: $reservation) '
+        '{ id user { username } tourLinks { tour { city price } } } }'
+    ),
+    'all_tours': (
+        'query { allTours(country: "Japan") { id city price supervisor { username } stats { bookings revenue } } }'
+    ),
+    'tours': (
+        'query { tours(first: 50, orderBy: "price", isActive: true) { edges { node '
+        '{ id city price reservationLinks { seats } } } } }'
+    ),
+    'tour': (
+        'query($tour: Int) { tour(id: $tour) '
+        '{ id city reservationLinks { reservation { user { username } } } stats { revenue } } }'
+    ),
+    'search_tours': (
+        'query { searchTours(query: "City 1", first: 20) { count facets { country { value count } } tours { id city } } }'
+    ),
+    'all_tour_reservations': (
+        'query { allTourReservations(isPriceReduced: true) { id seats tour { city } reservation { id } } }'
+    ),
+    'tour_reservations': (
+        'query { tourReservations(first: 50) { edges { node '
+        '{ id seats tour { city } reservation { user { username } } } } } }'
+    ),
+    'tour_reservation': (
+        'query($tourReservation: Int) { tourReservation(id: $tourReservation) '
+        '{ id seats tour { city } reservation { amountOfAdults } } }'
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark every serializer in serializers.py and every Query resolver in schema.py on the "
+        "seed_benchmark dataset, and print the results as JSON to compare runs across commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000, help='Instances per serializer run.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='Write the JSON here instead of to stdout.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('run_benchmarks needs PostgreSQL.')
+        if not User.objects.filter(username=ADMIN_USERNAME).exists():
+            raise CommandError('No benchmark dataset: run seed_benchmark first.')
+
+        result = {
+            'meta': run_metadata(),
+            'serializers': [self.serializer(*case, options['rows'], options['repeat']) for case in serializer_cases()],
+            'resolvers': [],
+        }
+        variables = self.variables()
+        for field in Query._meta.fields:
+            if field not in RESOLVER_QUERIES:
+                raise CommandError(f'No benchmark query for Query.{field}: add one to RESOLVER_QUERIES.')
+            result['resolvers'].append(self.resolver(field, RESOLVER_QUERIES[field], variables, options['repeat']))
+
+        document = json.dumps(result, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(document + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(document)
+
+    def serializer(self, serializer_class, queryset, extra_context, rows, repeat):
+        context = {'request': Request(APIRequestFactory().get('/', HTTP_HOST='localhost')), **extra_context}
+        queryset = queryset.order_by('pk')[:rows]
+        instances = list(queryset)
+
+        def drf():
+            return serializer_class(instances, many=True, context=context).data
+
+        with CaptureQueriesContext(connection) as queries:
+            drf()
+        entry = {
+            'serializer': serializer_class.__name__,
+            'rows': len(instances),
+            'drf_ms': best(drf, repeat) * 1000,
+            # Related fields read per instance show up here
+            'drf_queries': len(queries),
+            'rows_ms': None,
+        }
+        compiled = row_serializer(serializer_class, context, tuple(extra_context.get('aggregates', ())))
+        if compiled.readable(queryset):
+            values = list(queryset.values(*compiled.columns))
+            entry['rows_ms'] = best(lambda: compiled.serialize(values, context), repeat) * 1000
+        return entry
+
+    def variables(self):
+        link = TourReservation.objects.filter(tour__supervisor__username=ADMIN_USERNAME).order_by('pk').first()
+        if link is None:
+            raise CommandError('The benchmark dataset has no bookings.')
+        return {'reservation': link.reservation_id, 'tour': link.tour_id, 'tourReservation': link.pk}
+
+    def resolver(self, field, query, variables, repeat):
+        def execute():
+            # A fresh context per operation, like a request: loaders batch within it only
+            result = schema.execute(query, variable_values=variables, context_value=SimpleNamespace())
+            if result.errors:
+                raise CommandError(f'Query.{field}: {result.errors[0]}')
+            return result
+
+        with CaptureQueriesContext(connection) as queries:
+            execute()
+        return {'field': field, 'ms': best(execute, repeat) * 1000, 'queries': len(queries)}
@@ -0,0 +1,190 @@
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from TravelApp.cache import invalidate
+from TravelApp.models import Reservation, Tour, TourReservation, TourStats
+from TravelApp.stats import refresh_tour_stats
+
+
+USERNAME_PREFIX = 'bench-user-'
+ADMIN_USERNAME = 'bench-admin'
+PASSWORD = 'bench-password'
+
+# random() ** k skews a uniform draw towards 0: the low ids become the
+# frequent users, the popular tours and the common countries.
+SEED_USERS_SQL = """
+INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, email, is_staff, is_active, date_joined)
+SELECT %s, false, 'bench-user-' || g, 'First ' || g, 'Last ' || g, 'bench-user-' || g || '@example.com', false, true,
+       now() - floor(random() * 1000) * interval '1 day'
+FROM generate_series(1, %s) AS g
+"""
+
+SEED_TOURS_SQL = """
+INSERT INTO "{table}" (supervisor_id, max_number_of_participants, seats_taken, date_start, date_end, place_id,
+                       tour_type, price, country, region, city, accommodation, is_active, profile_pic, updated_at)
+SELECT %s, capacity, 0, d, d + (3 + floor(random() * 12)::int), g,
+       (ARRAY['standard', 'all inclusive', 'exclusive'])[1 + floor(3 * random() ^ 2)::int],
+       round(exp(5 + random() * 3)::numeric, 2),
+       (ARRAY['Italy', 'Spain', 'Greece', 'France', 'Croatia', 'Portugal', 'Poland', 'Egypt', 'Turkey', 'Japan'])
+           [1 + floor(10 * random() ^ 2)::int],
+       'Region ' || floor(50 * random() ^ 2)::int, 'City ' || floor(500 * random() ^ 2)::int,
+       'Hotel ' || floor(1000 * random())::int, random() < 0.9, '', now()
+FROM (
+    SELECT g, current_date + floor(random() * 540)::int AS d, 10 + floor(random() * 40)::int AS capacity
+    FROM generate_series(1, %s) AS g
+) AS s
+"""
+
+SEED_RESERVATIONS_SQL = """
+INSERT INTO "{table}" (user_id, date_of_reservation, amount_of_children, amount_of_adults, is_confirmed, is_active,
+                       updated_at)
+SELECT u.id, current_date - floor(random() * 365)::int, floor(4 * random() ^ 3)::int,
+       1 + floor(4 * random() ^ 2)::int, random() < 0.9, random() < 0.95, now()
+FROM (SELECT g, 1 + floor(%s * random() ^ 3)::int AS n FROM generate_series(1, %s) AS g) AS s
+JOIN (SELECT id, row_number() OVER (ORDER BY id) AS n FROM auth_user WHERE username LIKE 'bench-user-%%') AS u
+  ON u.n = s.n
+ORDER BY s.g
+"""
+
+# One to three links per reservation to popular tours; links that would
+# overbook a tour are dropped, oldest reservations first.
+SEED_LINKS_SQL = """
+INSERT INTO "{link}" (reservation_id, tour_id, is_price_reduced, is_active, seats, updated_at)
+SELECT reservation_id, tour_id, reduced, true, seats, now()
+FROM (
+    SELECT c.*, SUM(c.seats) OVER (PARTITION BY c.tour_id ORDER BY c.reservation_id) AS booked
+    FROM (
+        SELECT DISTINCT ON (r.id, t.id) r.id AS reservation_id, t.id AS tour_id,
+               r.amount_of_adults + r.amount_of_children AS seats, pick.reduced, t.max_number_of_participants
+        FROM (
+            SELECT id, amount_of_adults, amount_of_children, 1 + floor(3 * random() ^ 3)::int AS links
+            FROM "{reservation}"
+            WHERE user_id IN (SELECT id FROM auth_user WHERE username LIKE 'bench-user-%%')
+        ) AS r
+        CROSS JOIN LATERAL (
+            SELECT 1 + floor(%s * random() ^ 4)::int AS n, random() < 0.2 AS reduced
+            FROM generate_series(1, r.links)
+        ) AS pick
+        JOIN (SELECT id, max_number_of_participants, row_number() OVER (ORDER BY id) AS n
+              FROM "{tour}" WHERE supervisor_id = %s) AS t ON t.n = pick.n
+        ORDER BY r.id, t.id
+    ) AS c
+) AS s
+WHERE booked <= max_number_of_participants
+"""
+
+SEATS_SQL = """
+UPDATE "{tour}" AS t SET seats_taken = l.seats
+FROM (SELECT tour_id, SUM(seats) AS seats FROM "{link}" WHERE is_active GROUP BY tour_id) AS l
+WHERE l.tour_id = t.id AND t.supervisor_id = %s
+"""
+
+
+def run_metadata():
+    """What a benchmark result needs to be compared with another run."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip()
+    except OSError:
+        commit = ''
+    counts = {
+        model._meta.label: model.objects.count() for model in (User, Tour, Reservation, TourReservation, TourStats)
+    }
+    return {
+        'commit': commit or None,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': f'{connection.vendor} {getattr(connection, "pg_version", "")}'.strip(),
+        'rows': counts,
+    }
+
+
+FLUSH_SQL = [
+    'DELETE FROM "{link}" WHERE tour_id IN (SELECT id FROM "{tour}" WHERE supervisor_id = %(admin)s)',
+    'DELETE FROM "{stats}" WHERE tour_id IN (SELECT id FROM "{tour}" WHERE supervisor_id = %(admin)s)',
+    'DELETE FROM "{tour}" WHERE supervisor_id = %(admin)s',
+    'DELETE FROM "{link}" WHERE reservation_id IN (SELECT id FROM "{reservation}" WHERE user_id IN ({users}))',
+    'DELETE FROM "{reservation}" WHERE user_id IN ({users})',
+    'DELETE FROM auth_user WHERE id IN ({users}) OR id = %(admin)s',
+]
+
+
+def flush():
+    """Delete every row a previous ``seed_benchmark`` created, without per-row signals."""
+    names = {
+        'tour': Tour._meta.db_table,
+        'link': TourReservation._meta.db_table,
+        'reservation': Reservation._meta.db_table,
+        'stats': TourStats._meta.db_table,
+        'users': "SELECT id FROM auth_user WHERE username LIKE 'bench-user-%%'",
+    }
+    admin = User.objects.filter(username=ADMIN_USERNAME).values_list('id', flat=True).first()
+    with connection.cursor() as cursor:
+        for statement in FLUSH_SQL:
+            cursor.execute(statement.format(**names), {'admin': admin})
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace the benchmark dataset with N users, tours, reservations and bookings with realistic skew: "
+        "a few heavy users, popular tours and common countries. The same --seed gives the same rows. "
+        f"Users log in as {USERNAME_PREFIX}<n>, the admin as {ADMIN_USERNAME}, both with the password "
+        f"'{PASSWORD}'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--tours', type=int, default=10_000)
+        parser.add_argument('--reservations', type=int, default=50_000)
+        parser.add_argument('--seed', type=float, default=0.42, help='PostgreSQL setseed() value, -1 to 1.')
+        parser.add_argument('--flush', action='store_true', help='Only delete the benchmark dataset.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('seed_benchmark needs PostgreSQL.')
+        if not -1 <= options['seed'] <= 1:
+            raise CommandError('--seed must be between -1 and 1.')
+        if min(options['users'], options['tours'], options['reservations']) < 1:
+            raise CommandError('--users, --tours and --reservations must be positive.')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            flush()
+            if not options['flush']:
+                self.seed(options['users'], options['tours'], options['reservations'], options['seed'])
+            invalidate(Tour)
+        if not options['flush']:
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE auth_user, "{Tour._meta.db_table}", "{Reservation._meta.db_table}", '
+                               f'"{TourReservation._meta.db_table}", "{TourStats._meta.db_table}"')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Flushed" if options["flush"] else "Seeded"} the benchmark dataset '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def seed(self, users, tours, reservations, seed):
+        admin = User.objects.create_user(ADMIN_USERNAME, password=PASSWORD, is_staff=True)
+        tables = {
+            'tour': Tour._meta.db_table,
+            'link': TourReservation._meta.db_table,
+            'reservation': Reservation._meta.db_table,
+        }
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT setseed(%s)', [seed])
+            # One hash for everyone: hashing per user would dominate the run
+            cursor.execute(SEED_USERS_SQL, [make_password(PASSWORD), users])
+            cursor.execute(SEED_TOURS_SQL.format(table=tables['tour']), [admin.id, tours])
+            cursor.execute(SEED_RESERVATIONS_SQL.format(table=tables['reservation']), [users, reservations])
+            cursor.execute(SEED_LINKS_SQL.format(**tables), [tours, admin.id])
+            links = cursor.rowcount
+            cursor.execute(SEATS_SQL.format(**tables), [admin.id])
+        refresh_tour_stats(Tour.objects.filter(supervisor=admin).values_list('id', flat=True))
+        self.stdout.write(f'{users} users, {tours} tours, {reservations} reservations, {links} bookings')
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.21 on 2026-10-17 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TravelApp', '0003_tour_profile_pic_alter_reservation_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='reservation',
+            options={'ordering': ['is_confirmed', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='tour',
+            options={'ordering': ['is_active', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='tourreservation',
+            options={'ordering': ['is_active', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['is_confirmed', 'id'], name='reservation_confirmed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'date_of_reservation', 'id'], name='reservation_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date_of_reservation', 'id'], name='reservation_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_confirmed', True)), fields=['date_of_reservation', 'id'], name='reservation_open_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['is_active', 'id'], name='tour_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['price', 'id'], name='tour_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['date_start', 'id'], name='tour_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['country', 'price', 'id'], name='tour_country_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(fields=['tour_type', 'date_start', 'id'], name='tour_type_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'id'], name='tour_open_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['date_start', 'id'], name='tour_open_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourreservation',
+            index=models.Index(fields=['is_active', 'id'], name='tourreservation_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourreservation',
+            index=models.Index(fields=['tour', 'reservation'], name='tourreservation_tour_idx'),
+        ),
+    ]
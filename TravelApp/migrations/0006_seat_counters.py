@@ -0,0 +1,42 @@
+# Generated by Django 4.2.21 on 2026-10-17 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TravelApp', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tourreservation',
+            name='seats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql=[
+                '''
+                UPDATE "TravelApp_tourreservation" AS tr
+                SET seats = r.amount_of_adults + r.amount_of_children
+                FROM "TravelApp_reservation" AS r
+                WHERE r.id = tr.reservation_id
+                ''',
+                '''
+                UPDATE "TravelApp_tour" AS t
+                SET seats_taken = booked.seats
+                FROM (
+                    SELECT tour_id, SUM(seats) AS seats FROM "TravelApp_tourreservation" GROUP BY tour_id
+                ) AS booked
+                WHERE booked.tour_id = t.id
+                ''',
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
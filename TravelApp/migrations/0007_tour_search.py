@@ -0,0 +1,75 @@
+# Generated by Django 4.2.21 on 2026-10-17 19:23
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+TRIGRAM_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['country', 'region', 'city', 'accommodation'],
+    name='tour_search_trgm_idx',
+    opclasses=['gin_trgm_ops', 'gin_trgm_ops', 'gin_trgm_ops', 'gin_trgm_ops'],
+)
+
+
+def add_trigram_index(apps, schema_editor):
+    # pg_trgm ships with contrib, which some PostgreSQL builds leave out
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm')")
+        if not cursor.fetchone()[0]:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.add_index(apps.get_model('TravelApp', 'Tour'), TRIGRAM_INDEX)
+
+
+def remove_trigram_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{TRIGRAM_INDEX.name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TravelApp', '0006_seat_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql=[
+                '''
+                CREATE FUNCTION travelapp_tour_search_vector() RETURNS trigger AS $$
+                BEGIN
+                    NEW.search_vector :=
+                        setweight(to_tsvector('simple', coalesce(NEW.city, '')), 'A') ||
+                        setweight(to_tsvector('simple', coalesce(NEW.country, '')), 'A') ||
+                        setweight(to_tsvector('simple', coalesce(NEW.region, '')), 'B') ||
+                        setweight(to_tsvector('simple', coalesce(NEW.accommodation, '')), 'C');
+                    RETURN NEW;
+                END
+                $$ LANGUAGE plpgsql
+                ''',
+                '''
+                CREATE TRIGGER travelapp_tour_search_vector
+                BEFORE INSERT OR UPDATE OF city, country, region, accommodation, search_vector
+                ON "TravelApp_tour"
+                FOR EACH ROW EXECUTE FUNCTION travelapp_tour_search_vector()
+                ''',
+                'UPDATE "TravelApp_tour" SET city = city',
+            ],
+            reverse_sql=[
+                'DROP TRIGGER travelapp_tour_search_vector ON "TravelApp_tour"',
+                'DROP FUNCTION travelapp_tour_search_vector()',
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='tour_search_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddIndex(model_name='tour', index=TRIGRAM_INDEX)],
+            database_operations=[migrations.RunPython(add_trigram_index, remove_trigram_index)],
+        ),
+    ]
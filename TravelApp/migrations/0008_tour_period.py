@@ -0,0 +1,31 @@
+# Generated by Django 4.2.21 on 2026-10-17 19:29
+
+import TravelApp.models
+import django.contrib.postgres.indexes
+from django.db import migrations
+from django.db.models import F
+
+
+def check_periods(apps, schema_editor):
+    # DATERANGE() raises on these rows while the index is built
+    Tour = apps.get_model('TravelApp', 'Tour')
+    inverted = list(Tour.objects.filter(date_end__lt=F('date_start')).values_list('id', flat=True)[:20])
+    if inverted:
+        raise RuntimeError(
+            f"Tours ending before they start, fix their dates before migrating: {', '.join(map(str, inverted))}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TravelApp', '0007_tour_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_periods, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tour',
+            index=django.contrib.postgres.indexes.GistIndex(TravelApp.models.Period('date_start', 'date_end'), name='tour_period_idx'),
+        ),
+    ]
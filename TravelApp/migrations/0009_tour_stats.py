@@ -0,0 +1,56 @@
+# Generated by Django 4.2.21 on 2026-10-17 19:37
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# A copy of TravelApp.stats as of this migration, so later changes to that
+# module do not change what this migration does
+BACKFILL_SQL = '''
+INSERT INTO "TravelApp_tourstats" (tour_id, bookings, adults, children, reduced_price_bookings, revenue, refreshed_at)
+SELECT t.id,
+       COUNT(tr.id),
+       COALESCE(SUM(r.amount_of_adults), 0),
+       COALESCE(SUM(r.amount_of_children), 0),
+       COUNT(tr.id) FILTER (WHERE tr.is_price_reduced),
+       COALESCE(SUM(
+           t.price * (r.amount_of_adults + r.amount_of_children)
+           * CASE WHEN tr.is_price_reduced THEN %s ELSE 1 END
+       ), 0),
+       now()
+FROM "TravelApp_tour" AS t
+LEFT JOIN "TravelApp_tourreservation" AS tr ON tr.tour_id = t.id AND tr.is_active
+LEFT JOIN "TravelApp_reservation" AS r ON r.id = tr.reservation_id
+GROUP BY t.id
+'''
+
+
+def backfill(apps, schema_editor):
+    rate = Decimal(str(getattr(settings, 'TRAVELAPP_REDUCED_PRICE_RATE', '0.5')))
+    schema_editor.execute(BACKFILL_SQL, [rate])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TravelApp', '0008_tour_period'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourStats',
+            fields=[
+                ('tour', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='TravelApp.tour')),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('adults', models.PositiveIntegerField(default=0)),
+                ('children', models.PositiveIntegerField(default=0)),
+                ('reduced_price_bookings', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
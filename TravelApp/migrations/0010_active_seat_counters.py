@@ -0,0 +1,24 @@
+# Generated by Django 4.2.21 on 2026-10-17 21:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TravelApp', '0009_tour_stats'),
+    ]
+
+    operations = [
+        # 0006 counted inactive links too; they hold no seats
+        migrations.RunSQL(
+            sql='''
+            UPDATE "TravelApp_tour" AS t
+            SET seats_taken = COALESCE((
+                SELECT SUM(tr.seats) FROM "TravelApp_tourreservation" AS tr
+                WHERE tr.tour_id = t.id AND tr.is_active
+            ), 0)
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import DateRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class Reservation(models.Model):
@@ -10,14 +13,32 @@ class Reservation(models.Model):
     amount_of_adults = models.PositiveIntegerField(default=0)
     is_confirmed = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['is_confirmed']
+        ordering = ['is_confirmed', 'id']
+        indexes = [
+            models.Index(fields=['is_confirmed', 'id'], name='reservation_confirmed_idx'),
+            models.Index(fields=['user', 'date_of_reservation', 'id'], name='reservation_user_date_idx'),
+            models.Index(fields=['date_of_reservation', 'id'], name='reservation_date_idx'),
+            models.Index(
+                fields=['date_of_reservation', 'id'],
+                condition=models.Q(is_active=True, is_confirmed=True),
+                name='reservation_open_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Reservation #{self.id} by {self.user}"
 
 
+class Period(models.Func):
+    # Inclusive daterange, so a one-day tour is not an empty range
+    function = 'DATERANGE'
+    template = "%(function)s(%(expressions)s, '[]')"
+    output_field = DateRangeField()
+
+
 class StandardToursManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(tour_type='standard')
@@ -32,6 +53,7 @@ class Tour(models.Model):
 
     supervisor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='supervised_tours')
     max_number_of_participants = models.PositiveIntegerField()
+    seats_taken = models.PositiveIntegerField(default=0)
     date_start = models.DateField()
     date_end = models.DateField()
     place_id = models.IntegerField()
@@ -45,22 +67,68 @@ class Tour(models.Model):
     objects = models.Manager()
     standard_tours = StandardToursManager()
     profile_pic = models.ImageField(upload_to='profile/', blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by a database trigger from city, country, region and accommodation
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
-        ordering = ['is_active']
+        ordering = ['is_active', 'id']
+        indexes = [
+            models.Index(fields=['is_active', 'id'], name='tour_active_idx'),
+            models.Index(fields=['price', 'id'], name='tour_price_idx'),
+            models.Index(fields=['date_start', 'id'], name='tour_date_start_idx'),
+            models.Index(fields=['country', 'price', 'id'], name='tour_country_price_idx'),
+            models.Index(fields=['tour_type', 'date_start', 'id'], name='tour_type_date_start_idx'),
+            models.Index(
+                fields=['price', 'id'],
+                condition=models.Q(is_active=True),
+                name='tour_open_price_idx',
+            ),
+            models.Index(
+                fields=['date_start', 'id'],
+                condition=models.Q(is_active=True),
+                name='tour_open_date_start_idx',
+            ),
+            GistIndex(Period('date_start', 'date_end'), name='tour_period_idx'),
+            GinIndex(fields=['search_vector'], name='tour_search_idx'),
+            GinIndex(
+                fields=['country', 'region', 'city', 'accommodation'],
+                opclasses=['gin_trgm_ops'] * 4,
+                name='tour_search_trgm_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Tour #{self.id} - {self.city}, {self.country}"
 
 
+class TourStats(models.Model):
+    tour = models.OneToOneField(Tour, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    bookings = models.PositiveIntegerField(default=0)
+    adults = models.PositiveIntegerField(default=0)
+    children = models.PositiveIntegerField(default=0)
+    reduced_price_bookings = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats of tour #{self.tour_id}"
+
+
 class TourReservation(models.Model):
     reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='tour_links')
     tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='reservation_links')
     is_price_reduced = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    seats = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['is_active']
+        ordering = ['is_active', 'id']
+        indexes = [
+            models.Index(fields=['is_active', 'id'], name='tourreservation_active_idx'),
+            models.Index(fields=['tour', 'reservation'], name='tourreservation_tour_idx'),
+        ]
 
     def __str__(self):
         return f"Reservation #{self.reservation.id} - Tour #{self.tour.id}"
@@ -0,0 +1,85 @@
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.utils import get_model_fields
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+def optimize(queryset, info, field_nodes=None, fields=()):
+    """
+    Narrow ``queryset`` to what the client selected in ``info``.
+
+    Scalar selections become ``only()`` columns, forward foreign keys are
+    joined with ``select_related()`` and reverse relations are prefetched with
+    querysets that are planned the same way. ``field_nodes`` overrides where
+    the selection starts and ``fields`` are columns the resolver itself needs.
+    """
+    only, select_related, prefetch_related = _plan(queryset.model, info, field_nodes or info.field_nodes)
+    only.extend(fields)
+    return _apply(queryset, (only, select_related, prefetch_related))
+
+
+def connection_nodes(info):
+    edges = _selected_fields(info, info.field_nodes).get('edges', [])
+    return _selected_fields(info, edges).get('node', [])
+
+
+def _apply(queryset, plan):
+    only, select_related, prefetch_related = plan
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset.only(*only)
+
+
+def _plan(model, info, nodes, prefix=''):
+    only = [prefix + model._meta.pk.name]
+    select_related = []
+    prefetch_related = []
+    fields = dict(get_model_fields(model))
+
+    for name, children in _selected_fields(info, nodes).items():
+        name = to_snake_case(name)
+        field = fields.get(name)
+        if field is None:
+            continue
+
+        if not field.is_relation:
+            only.append(prefix + field.name)
+        elif field.concrete and (field.many_to_one or field.one_to_one):
+            path = prefix + field.name
+            only.append(path)
+            select_related.append(path)
+            nested_only, nested_select, nested_prefetch = _plan(field.related_model, info, children, path + '__')
+            only.extend(nested_only)
+            select_related.extend(nested_select)
+            prefetch_related.extend(nested_prefetch)
+        else:
+            nested_only, nested_select, nested_prefetch = _plan(field.related_model, info, children)
+            if field.one_to_many or field.one_to_one:
+                nested_only.append(field.field.name)
+            queryset = _apply(
+                field.related_model._default_manager.all(),
+                (nested_only, nested_select, nested_prefetch),
+            )
+            prefetch_related.append(Prefetch(prefix + name, queryset=queryset))
+
+    return only, select_related, prefetch_related
+
+
+def _selected_fields(info, nodes):
+    selected = {}
+    for node in nodes:
+        if node.selection_set is None:
+            continue
+        for selection in node.selection_set.selections:
+            if isinstance(selection, FieldNode):
+                selected.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments[selection.name.value]
+                for name, children in _selected_fields(info, [fragment]).items():
+                    selected.setdefault(name, []).extend(children)
+            elif isinstance(selection, InlineFragmentNode):
+                for name, children in _selected_fields(info, [selection]).items():
+                    selected.setdefault(name, []).extend(children)
+    return selected
@@ -0,0 +1,149 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .keyset import InvalidCursor, apage, encode_cursor, page, position, with_tiebreaker
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    page_size = 10
+
+
+def estimate_count(queryset):
+    """
+    Row estimate from the PostgreSQL planner statistics instead of COUNT(*).
+
+    Other backends have no cheap estimate and fall back to an exact count.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek pagination over the view's ``ordering_fields`` plus ``id``.
+
+    Pages are addressed with ``after``/``before`` cursors holding the position
+    of the last/first row, so a page costs the same at any depth and no
+    ``COUNT(*)`` runs unless the client asks for ``count=exact`` or the
+    planner-based ``count=estimated``.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    after_query_param = 'after'
+    before_query_param = 'before'
+    count_query_param = 'count'
+    count_modes = ('exact', 'estimated')
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'TRAVELAPP_MAX_PAGE_SIZE', 100)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = OrderingFilter().get_ordering(request, queryset, view) or ['id']
+        columns = []
+        for name in ordering:
+            prefix = '-' if name.startswith('-') else ''
+            field = queryset.model._meta.get_field(name.lstrip('-'))
+            columns.append(prefix + field.attname)
+        return with_tiebreaker(columns)
+
+    def start(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.after = request.query_params.get(self.after_query_param)
+        self.before = request.query_params.get(self.before_query_param)
+        self.backward = self.before is not None and self.after is None
+        return self.before if self.backward else self.after
+
+    def finish(self, rows, has_more):
+        self.has_next = self.before is not None if self.backward else has_more
+        self.has_previous = has_more if self.backward else self.after is not None
+        self.first_position = position(rows[0], self.ordering) if rows else None
+        self.last_position = position(rows[-1], self.ordering) if rows else None
+        self.count_mode = self.request.query_params.get(self.count_query_param)
+        self.count = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor = self.start(queryset, request, view)
+        try:
+            rows, has_more = page(queryset, self.ordering, self.page_size, cursor=cursor, backward=self.backward)
+        except InvalidCursor:
+            raise NotFound('Invalid cursor.')
+
+        self.finish(rows, has_more)
+        if self.count_mode == 'exact':
+            self.count = queryset.count()
+        elif self.count_mode == 'estimated':
+            self.count = estimate_count(queryset)
+        return rows
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        cursor = self.start(queryset, request, view)
+        try:
+            rows, has_more = await apage(queryset, self.ordering, self.page_size, cursor=cursor, backward=self.backward)
+        except InvalidCursor:
+            raise NotFound('Invalid cursor.')
+
+        self.finish(rows, has_more)
+        if self.count_mode == 'exact':
+            self.count = await queryset.acount()
+        elif self.count_mode == 'estimated':
+            self.count = await sync_to_async(estimate_count)(queryset)
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.before_query_param)
+        return replace_query_param(url, self.after_query_param, encode_cursor(self.last_position))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.after_query_param)
+        return replace_query_param(url, self.before_query_param, encode_cursor(self.first_position))
+
+    def get_paginated_data(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -5,6 +5,7 @@ class IsReservedOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        if obj.user == request.user:
+        # Compared by id: neither side needs its User row
+        if obj.user_id == request.user.id:
             return True
         return False
@@ -0,0 +1,180 @@
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from .instrumentation import serializing
+from .sparse import SparseFieldsMixin
+
+
+def decimal_converter(field, model_field, context):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = -field.decimal_places
+
+    def convert(value):
+        # Columns come back from the database already at the field's scale
+        if value.as_tuple().exponent == exponent:
+            return format(value, 'f')
+        return field.to_representation(value)
+    return convert
+
+
+def date_converter(field, model_field, context):
+    if getattr(field, 'format', api_settings.DATE_FORMAT) != ISO_8601:
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+def datetime_converter(field, model_field, context):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or tz is None:
+        return field.to_representation
+
+    def convert(value):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def file_converter(field, model_field, context):
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda name: name or None
+    storage = model_field.storage
+    request = context.get('request')
+
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def unconverted(field, model_field, context):
+    return None
+
+
+# Most specific classes first: ImageField is a FileField, ChoiceField a Field
+CONVERTERS = [
+    (serializers.DecimalField, decimal_converter),
+    (serializers.DateTimeField, datetime_converter),
+    (serializers.DateField, date_converter),
+    (serializers.FileField, file_converter),
+    ((serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.ChoiceField), unconverted),
+]
+
+
+UNSUPPORTED = (serializers.BaseSerializer, serializers.ManyRelatedField, serializers.RelatedField)
+
+
+class RowSerializer:
+    """
+    Read-only serialization of ``values()`` rows for list responses.
+
+    Compiled once from a serializer's fields into the column list for
+    ``values()`` and one plain converter per field, so a row costs a dict
+    build instead of DRF's per-field ``get_attribute`` and
+    ``to_representation``. Fields that cannot be read from a column
+    (nested serializers, method fields, dotted sources) make the serializer
+    unsupported, and the view keeps the full serializer.
+    """
+
+    def __init__(self, serializer):
+        concrete = {field.name: field for field in serializer.Meta.model._meta.concrete_fields}
+        self.fields = []
+        # Sources that are not columns must be annotations of the queryset
+        self.annotations = []
+        self.supported = True
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                if source not in concrete:
+                    self.supported = False
+                    break
+                self.fields.append((name, concrete[source].attname, field, None, unconverted))
+                continue
+            if '.' in source or source == '*' or isinstance(field, UNSUPPORTED):
+                self.supported = False
+                break
+            if source not in concrete:
+                self.annotations.append(source)
+            factory = next((factory for types, factory in CONVERTERS if isinstance(field, types)), None)
+            if factory is None:
+                factory = lambda field, model_field, context: field.to_representation  # noqa: E731
+            self.fields.append((name, source, field, concrete.get(source), factory))
+        self.columns = [entry[1] for entry in self.fields]
+
+    def narrow(self, names):
+        narrowed = object.__new__(RowSerializer)
+        narrowed.supported = self.supported
+        narrowed.fields = [entry for entry in self.fields if entry[0] in names]
+        narrowed.annotations = [entry[1] for entry in narrowed.fields if entry[1] in self.annotations]
+        narrowed.columns = [entry[1] for entry in narrowed.fields]
+        return narrowed
+
+    def readable(self, queryset):
+        return self.supported and all(name in queryset.query.annotations for name in self.annotations)
+
+    def serialize(self, rows, context):
+        fields = [
+            (name, column, factory(field, model_field, context))
+            for name, column, field, model_field, factory in self.fields
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in fields:
+                value = row[column]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+_compiled = {}
+
+
+def row_serializer(serializer_class, context, key=()):
+    """The cached ``RowSerializer`` of ``serializer_class``; ``key`` tells context-dependent field sets apart."""
+    cache_key = (serializer_class, key)
+    compiled = _compiled.get(cache_key)
+    if compiled is None:
+        compiled = _compiled[cache_key] = RowSerializer(serializer_class(context=context))
+    return compiled
+
+
+class ValuesListMixin(SparseFieldsMixin):
+    """
+    List ``GET`` responses built from ``values()`` rows through the view
+    serializer's compiled ``RowSerializer``; writes keep the full serializer.
+    """
+
+    def get_list_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        compiled = row_serializer(self.get_serializer_class(), self.get_serializer_context(),
+                                  self.get_row_serializer_key())
+        selected = self.get_sparse_fields()
+        if selected is not None:
+            compiled = compiled.narrow(selected)
+        if not compiled.readable(queryset):
+            return queryset, None
+        columns = compiled.columns
+        if selected is not None:
+            columns = list(dict.fromkeys(self.get_sparse_columns(queryset.model, selected) + columns))
+        return queryset.values(*columns), compiled
+
+    def serialize_list(self, rows, compiled):
+        if compiled is None:
+            return self.get_serializer(rows, many=True).data
+        with serializing():
+            return compiled.serialize(rows, self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        queryset, compiled = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_list(page, compiled))
+        return Response(self.serialize_list(queryset, compiled))
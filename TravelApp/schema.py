@@ -1,60 +1,250 @@
 import graphene
+from graphene import relay
+from graphene_django.settings import graphene_settings
 from graphene_django.types import DjangoObjectType
+from graphql import GraphQLError
 from django.contrib.auth.models import User
-from .models import Reservation, Tour, TourReservation
+from .models import Reservation, Tour, TourReservation, TourStats
+from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
+from .loaders import get_loaders
+from .optimizer import optimize, connection_nodes
+from .booking import OverbookingError, book_tour, resize_reservation
+from .bulk import create_tours, create_tour_reservations
+from .keyset import InvalidCursor, encode_cursor, page, position, with_tiebreaker
+from . import search
 
 class UserType(DjangoObjectType):
     class Meta:
         model = User
         fields = "__all__"
 
+    def resolve_reservations(self, info):
+        return get_loaders(info).load(self, 'reservations')
+
+    def resolve_supervised_tours(self, info):
+        return get_loaders(info).load(self, 'supervised_tours')
+
 
 class ReservationType(DjangoObjectType):
     class Meta:
         model = Reservation
         fields = "__all__"
 
+    def resolve_user(self, info):
+        return get_loaders(info).load(self, 'user')
+
+    def resolve_tour_links(self, info):
+        return get_loaders(info).load(self, 'tour_links')
+
 
 class TourType(DjangoObjectType):
     class Meta:
         model = Tour
+        exclude = ("search_vector",)
+
+    def resolve_supervisor(self, info):
+        return get_loaders(info).load(self, 'supervisor')
+
+    def resolve_reservation_links(self, info):
+        return get_loaders(info).load(self, 'reservation_links')
+
+    def resolve_stats(self, info):
+        return get_loaders(info).load(self, 'stats')
+
+
+class TourStatsType(DjangoObjectType):
+    class Meta:
+        model = TourStats
         fields = "__all__"
 
+    def resolve_tour(self, info):
+        return get_loaders(info).load(self, 'tour')
+
 
 class TourReservationType(DjangoObjectType):
     class Meta:
         model = TourReservation
         fields = "__all__"
 
+    def resolve_reservation(self, info):
+        return get_loaders(info).load(self, 'reservation')
+
+    def resolve_tour(self, info):
+        return get_loaders(info).load(self, 'tour')
+
+class ReservationConnection(relay.Connection):
+    class Meta:
+        node = ReservationType
+
+
+class TourConnection(relay.Connection):
+    class Meta:
+        node = TourType
+
+
+class TourReservationConnection(relay.Connection):
+    class Meta:
+        node = TourReservationType
+
+
+class FacetCount(graphene.ObjectType):
+    value = graphene.String()
+    count = graphene.Int()
+
+
+class TourSearchFacets(graphene.ObjectType):
+    tour_type = graphene.List(FacetCount)
+    country = graphene.List(FacetCount)
+    price = graphene.List(FacetCount)
+
+
+class TourSearchResult(graphene.ObjectType):
+    count = graphene.Int()
+    facets = graphene.Field(TourSearchFacets)
+    tours = graphene.List(TourType)
+
+    def __init__(self, matches, text, first, offset):
+        super().__init__()
+        self.matches = matches
+        self.text = text
+        self.first = first
+        self.offset = offset
+        self._facets = None
+
+    def facet_counts(self):
+        if self._facets is None:
+            self._facets = search.facet_counts(self.matches)
+        return self._facets
+
+    def resolve_count(self, info):
+        return self.facet_counts()[1]
+
+    def resolve_facets(self, info):
+        return TourSearchFacets(**self.facet_counts()[0])
+
+    def resolve_tours(self, info):
+        queryset = optimize(search.ranked(self.matches, self.text), info)
+        return get_loaders(info).register(queryset[self.offset:self.offset + self.first])
+
+
+RESERVATION_ORDERINGS = ['date_of_reservation', '-date_of_reservation', 'id', '-id']
+TOUR_ORDERINGS = ['date_start', '-date_start', 'price', '-price', 'id', '-id']
+TOUR_RESERVATION_ORDERINGS = ['id', '-id']
+DEFAULT_PAGE_SIZE = 10
+
+
+def resolve_connection(connection_type, queryset, info, orderings, order_by,
+                       first=None, last=None, after=None, before=None, **filters):
+    if order_by not in orderings:
+        raise GraphQLError(f"Unknown ordering '{order_by}', expected one of: {', '.join(orderings)}.")
+
+    backward = last is not None and first is None
+    size = last if backward else first
+    size = min(size if size is not None else DEFAULT_PAGE_SIZE, graphene_settings.RELAY_CONNECTION_MAX_LIMIT)
+    if size < 0:
+        raise GraphQLError("Page size must not be negative.")
+
+    ordering = with_tiebreaker([order_by])
+    queryset = optimize(
+        queryset.filter(**filters), info,
+        field_nodes=connection_nodes(info),
+        fields=[name.lstrip('-') for name in ordering],
+    )
+    try:
+        rows, has_more = page(queryset, ordering, size, cursor=before if backward else after, backward=backward)
+    except InvalidCursor:
+        raise GraphQLError("Invalid cursor.")
+
+    get_loaders(info).register(rows)
+    edges = [
+        connection_type.Edge(node=row, cursor=encode_cursor(position(row, ordering)))
+        for row in rows
+    ]
+    return connection_type(
+        edges=edges,
+        page_info=relay.PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_next_page=has_more if not backward else before is not None,
+            has_previous_page=has_more if backward else after is not None,
+        ),
+    )
+
+
 class Query(graphene.ObjectType):
-    all_reservations = graphene.List(ReservationType)
+    all_reservations = graphene.List(
+        ReservationType, user=graphene.Int(), is_confirmed=graphene.Boolean(), is_active=graphene.Boolean()
+    )
+    reservations = relay.ConnectionField(
+        ReservationConnection, order_by=graphene.String(default_value='date_of_reservation'),
+        user=graphene.Int(), is_confirmed=graphene.Boolean(), is_active=graphene.Boolean()
+    )
     reservation = graphene.Field(ReservationType, id=graphene.Int())
 
-    all_tours = graphene.List(TourType)
+    all_tours = graphene.List(
+        TourType, tour_type=graphene.String(), country=graphene.String(), is_active=graphene.Boolean()
+    )
+    tours = relay.ConnectionField(
+        TourConnection, order_by=graphene.String(default_value='date_start'),
+        tour_type=graphene.String(), country=graphene.String(), is_active=graphene.Boolean()
+    )
     tour = graphene.Field(TourType, id=graphene.Int())
-
-    all_tour_reservations = graphene.List(TourReservationType)
+    search_tours = graphene.Field(
+        TourSearchResult, query=graphene.String(required=True), first=graphene.Int(), offset=graphene.Int(),
+        tour_type=graphene.String(), country=graphene.String(), is_active=graphene.Boolean()
+    )
+
+    all_tour_reservations = graphene.List(
+        TourReservationType, is_price_reduced=graphene.Boolean(), is_active=graphene.Boolean()
+    )
+    tour_reservations = relay.ConnectionField(
+        TourReservationConnection, order_by=graphene.String(default_value='id'),
+        is_price_reduced=graphene.Boolean(), is_active=graphene.Boolean()
+    )
     tour_reservation = graphene.Field(TourReservationType, id=graphene.Int())
 
-    def resolve_all_reservations(self, info):
-        return Reservation.objects.all()
+    def resolve_all_reservations(self, info, **filters):
+        return get_loaders(info).register(optimize(Reservation.objects.filter(**filters), info))
+
+    def resolve_reservations(self, info, order_by, **kwargs):
+        return resolve_connection(
+            ReservationConnection, Reservation.objects.all(), info, RESERVATION_ORDERINGS, order_by, **kwargs
+        )
 
     def resolve_reservation(self, info, id):
-        return Reservation.objects.filter(id=id).first()
+        return optimize(Reservation.objects.filter(id=id), info).first()
 
-    def resolve_all_tours(self, info):
-        return Tour.objects.all()
+    def resolve_all_tours(self, info, **filters):
+        return get_loaders(info).register(optimize(Tour.objects.filter(**filters), info))
 
-    def resolve_tour(self, info, id):
-        return Tour.objects.filter(id=id).first()
+    def resolve_tours(self, info, order_by, **kwargs):
+        return resolve_connection(TourConnection, Tour.objects.all(), info, TOUR_ORDERINGS, order_by, **kwargs)
 
-    def resolve_all_tour_reservations(self, info):
-        return TourReservation.objects.all()
+    def resolve_tour(self, info, id):
+        return optimize(Tour.objects.filter(id=id), info).first()
+
+    def resolve_search_tours(self, info, query, first=None, offset=0, **filters):
+        if not query.strip():
+            raise GraphQLError("Search query must not be blank.")
+        first = min(first if first is not None else DEFAULT_PAGE_SIZE, graphene_settings.RELAY_CONNECTION_MAX_LIMIT)
+        if first < 0 or offset < 0:
+            raise GraphQLError("first and offset must not be negative.")
+        matches = search.matching(Tour.objects.filter(**filters), query.strip())
+        return TourSearchResult(matches, query.strip(), first, offset)
+
+    def resolve_all_tour_reservations(self, info, **filters):
+        return get_loaders(info).register(optimize(TourReservation.objects.filter(**filters), info))
+
+    def resolve_tour_reservations(self, info, order_by, **kwargs):
+        return resolve_connection(
+            TourReservationConnection, TourReservation.objects.all(), info, TOUR_RESERVATION_ORDERINGS, order_by,
+            **kwargs
+        )
 
     def resolve_tour_reservation(self, info, id):
-        return TourReservation.objects.filter(id=id).first()
+        return optimize(TourReservation.objects.filter(id=id), info).first()
 
 
 class CreateReservation(graphene.Mutation):
@@ -97,7 +287,12 @@ class UpdateReservation(graphene.Mutation):
         reservation = Reservation.objects.get(id=id)
         for field, value in kwargs.items():
             setattr(reservation, field, value)
-        reservation.save()
+        try:
+            with transaction.atomic():
+                reservation.save()
+                resize_reservation(reservation)
+        except OverbookingError as exc:
+            raise GraphQLError(str(exc))
         return UpdateReservation(reservation=reservation)
 
 
@@ -133,6 +328,8 @@ class CreateTour(graphene.Mutation):
     tour = graphene.Field(TourType)
 
     def mutate(self, info, supervisor_id, **kwargs):
+        if kwargs['date_end'] < kwargs['date_start']:
+            raise GraphQLError("date_end must not be before date_start.")
         supervisor = User.objects.get(id=supervisor_id)
         tour = Tour.objects.create(supervisor=supervisor, **kwargs)
         return CreateTour(tour=tour)
@@ -184,11 +381,14 @@ class CreateTourReservation(graphene.Mutation):
     def mutate(self, info, reservation_id, tour_id, is_price_reduced=False):
         reservation = Reservation.objects.get(id=reservation_id)
         tour = Tour.objects.get(id=tour_id)
-        tr = TourReservation.objects.create(
-            reservation=reservation,
-            tour=tour,
-            is_price_reduced=is_price_reduced
-        )
+        try:
+            tr = book_tour(
+                reservation=reservation,
+                tour=tour,
+                is_price_reduced=is_price_reduced
+            )
+        except OverbookingError as exc:
+            raise GraphQLError(str(exc))
         return CreateTourReservation(tour_reservation=tr)
 
 
@@ -206,16 +406,83 @@ class DeleteTourReservation(graphene.Mutation):
         return DeleteTourReservation(success=True)
 
 
+class TourInput(graphene.InputObjectType):
+    supervisor_id = graphene.Int(required=True)
+    max_number_of_participants = graphene.Int(required=True)
+    date_start = graphene.Date(required=True)
+    date_end = graphene.Date(required=True)
+    place_id = graphene.Int(required=True)
+    tour_type = graphene.String(required=True)
+    price = graphene.Float(required=True)
+    country = graphene.String(required=True)
+    region = graphene.String(required=True)
+    city = graphene.String(required=True)
+    accommodation = graphene.String(required=True)
+    is_active = graphene.Boolean()
+
+
+class TourReservationInput(graphene.InputObjectType):
+    reservation_id = graphene.Int(required=True)
+    tour_id = graphene.Int(required=True)
+    is_price_reduced = graphene.Boolean()
+
+
+class BulkItemError(graphene.ObjectType):
+    index = graphene.Int()
+    messages = graphene.List(graphene.String)
+
+
+def bulk_errors(errors):
+    return [
+        BulkItemError(
+            index=error['index'],
+            messages=[f"{field}: {message}" for field, messages in error['errors'].items() for message in messages],
+        )
+        for error in errors
+    ]
+
+
+class BulkCreateTours(graphene.Mutation):
+    class Arguments:
+        tours = graphene.List(graphene.NonNull(TourInput), required=True)
+
+    tours = graphene.List(TourType)
+    errors = graphene.List(BulkItemError)
+
+    def mutate(self, info, tours):
+        items = [{**item, 'supervisor': item.pop('supervisor_id')} for item in map(dict, tours)]
+        created, errors = create_tours(items, {})
+        return BulkCreateTours(tours=created, errors=bulk_errors(errors))
+
+
+class BulkCreateTourReservations(graphene.Mutation):
+    class Arguments:
+        tour_reservations = graphene.List(graphene.NonNull(TourReservationInput), required=True)
+
+    tour_reservations = graphene.List(TourReservationType)
+    errors = graphene.List(BulkItemError)
+
+    def mutate(self, info, tour_reservations):
+        items = [
+            {**item, 'reservation': item.pop('reservation_id'), 'tour': item.pop('tour_id')}
+            for item in map(dict, tour_reservations)
+        ]
+        created, errors = create_tour_reservations(items, {})
+        return BulkCreateTourReservations(tour_reservations=created, errors=bulk_errors(errors))
+
+
 class Mutation(graphene.ObjectType):
     create_reservation = CreateReservation.Field()
     update_reservation = UpdateReservation.Field()
     delete_reservation = DeleteReservation.Field()
 
     create_tour = CreateTour.Field()
+    bulk_create_tours = BulkCreateTours.Field()
     update_tour = UpdateTour.Field()
     delete_tour = DeleteTour.Field()
 
     create_tour_reservation = CreateTourReservation.Field()
+    bulk_create_tour_reservations = BulkCreateTourReservations.Field()
     delete_tour_reservation = DeleteTourReservation.Field()
 
 
@@ -0,0 +1,91 @@
+from functools import lru_cache
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+SEARCH_CONFIG = 'simple'
+SEARCH_FIELDS = ('city', 'country', 'region', 'accommodation')
+PRICE_BUCKETS = (500, 1000, 2500, 5000)
+
+# GROUPING() bitmask of (tour_type, country, bucket) for each grouping set
+FACET_LEVELS = {0b011: 'tour_type', 0b101: 'country', 0b110: 'price', 0b111: None}
+
+FACETS_SQL = '''
+SELECT m.tour_type, m.country, m.bucket, GROUPING(m.tour_type, m.country, m.bucket), COUNT(*)
+FROM (SELECT tour_type, country, width_bucket(price, %s::numeric[]) AS bucket FROM ({matches}) AS t) AS m
+GROUP BY GROUPING SETS ((m.tour_type), (m.country), (m.bucket), ())
+'''
+
+
+@lru_cache(maxsize=None)
+def trigram_enabled():
+    # Without pg_trgm (see migration 0007) search is full-text only
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")
+        return cursor.fetchone()[0]
+
+
+def search_query(text):
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def matching(queryset, text):
+    """
+    Tours whose text fields match ``text``.
+
+    A row matches on the full-text index, or on the trigram index when one of
+    the fields contains a word close enough to ``text`` to absorb a typo.
+    """
+    condition = Q(search_vector=search_query(text))
+    if trigram_enabled():
+        for name in SEARCH_FIELDS:
+            condition |= Q(**{f'{name}__trigram_word_similar': text})
+    return queryset.filter(condition)
+
+
+def ranked(queryset, text):
+    rank = SearchRank(F('search_vector'), search_query(text))
+    if trigram_enabled():
+        rank = rank + Greatest(*(TrigramWordSimilarity(text, name) for name in SEARCH_FIELDS))
+    return queryset.annotate(rank=rank).order_by('-rank', 'id')
+
+
+def price_bucket_label(bucket):
+    bounds = (0, *PRICE_BUCKETS)
+    if bucket >= len(PRICE_BUCKETS):
+        return f'{bounds[-1]}+'
+    return f'{bounds[bucket]}-{bounds[bucket + 1]}'
+
+
+def facet_counts(queryset):
+    """
+    Counts by tour type, country and price bucket plus the total, in one ``GROUPING SETS`` query.
+
+    Returns ``(facets, total)`` where each facet is a list of ``{'value', 'count'}``.
+    """
+    sql, params = queryset.order_by().values('tour_type', 'country', 'price').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(FACETS_SQL.format(matches=sql), [list(PRICE_BUCKETS), *params])
+        rows = cursor.fetchall()
+
+    values = {'tour_type': {}, 'country': {}, 'price': {}}
+    total = 0
+    for tour_type, country, bucket, level, count in rows:
+        name = FACET_LEVELS[level]
+        if name is None:
+            total = count
+        else:
+            values[name][{'tour_type': tour_type, 'country': country, 'price': bucket}[name]] = count
+
+    facets = {
+        name: [{'value': value, 'count': count} for value, count in sorted(
+            values[name].items(), key=lambda item: (-item[1], item[0])
+        )]
+        for name in ('tour_type', 'country')
+    }
+    facets['price'] = [
+        {'value': price_bucket_label(bucket), 'count': count} for bucket, count in sorted(values['price'].items())
+    ]
+    return facets, total
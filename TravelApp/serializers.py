@@ -1,33 +1,139 @@
 from rest_framework import serializers
-from .models import Reservation, Tour, TourReservation
+from django.db import transaction
+from .models import Reservation, Tour, TourReservation, TourStats
+from .booking import OverbookingError, book_tour, rebook, release_seats, reserve_seats, resize_reservation
+from .instrumentation import SerializerTimingMixin
 from django.contrib.auth.models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Looks related rows up in ``context['preloaded']`` when a bulk write has fetched them already."""
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(self.source)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return preloaded[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class UserSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     class Meta:
         model = Reservation
         fields = '__all__'
 
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                instance = super().update(instance, validated_data)
+                resize_reservation(instance)
+        except OverbookingError as exc:
+            raise serializers.ValidationError({'non_field_errors': [str(exc)]})
+        return instance
+
+
+class ReservationAggregatesSerializer(ReservationSerializer):
+    participants = serializers.IntegerField(read_only=True)
+    tour_count = serializers.IntegerField(read_only=True)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('aggregates', ())
+        for name in ('participants', 'tour_count'):
+            if name not in requested:
+                fields.pop(name)
+        return fields
+
+
+def check_dates(date_start, date_end):
+    # The tour_period_idx range cannot end before it starts
+    if date_start is not None and date_end is not None and date_end < date_start:
+        raise serializers.ValidationError({'date_end': ['Must not be before date_start.']})
+
+
+class TourSerializer(SerializerTimingMixin, serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
 
-class TourSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tour
+        exclude = ('search_vector',)
+        read_only_fields = ('seats_taken',)
+
+    def validate(self, data):
+        check_dates(
+            data.get('date_start', getattr(self.instance, 'date_start', None)),
+            data.get('date_end', getattr(self.instance, 'date_end', None)),
+        )
+        return data
+
+    @staticmethod
+    def apply_bulk_update(instance, previous):
+        """Checks an instance a bulk update has changed, see ``bulk.update_many``."""
+        check_dates(instance.date_start, instance.date_end)
+
+
+class TourStatsSerializer(SerializerTimingMixin, serializers.ModelSerializer):
+    class Meta:
+        model = TourStats
         fields = '__all__'
 
 
-class TourReservationSerializer(serializers.ModelSerializer):
+class TourReservationSerializer(SerializerTimingMixin, serializers.ModelSerializer):
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+
     class Meta:
         model = TourReservation
         fields = '__all__'
+        read_only_fields = ('seats',)
+        # Form posts leave out unchecked booleans: a missing is_active must not
+        # book an inactive link, which would hold no seats
+        extra_kwargs = {'is_active': {'default': True}}
+
+    def create(self, validated_data):
+        try:
+            return book_tour(**validated_data)
+        except OverbookingError as exc:
+            raise serializers.ValidationError({'tour': [str(exc)]})
+
+    def update(self, instance, validated_data):
+        previous = (instance.tour_id, instance.reservation_id, instance.is_active)
+        try:
+            with transaction.atomic():
+                instance = super().update(instance, validated_data)
+                if (instance.tour_id, instance.reservation_id, instance.is_active) != previous:
+                    tour_id, reservation_id, was_active = previous
+                    rebook(instance, tour_id, reservation_id, was_active)
+        except OverbookingError as exc:
+            raise serializers.ValidationError({'tour': [str(exc)]})
+        return instance
+
+    @staticmethod
+    def apply_bulk_update(instance, previous):
+        """Takes or frees the seats of links activated or deactivated in bulk, see ``bulk.update_many``."""
+        if previous.get('is_active', instance.is_active) == instance.is_active:
+            return
+        try:
+            if instance.is_active:
+                reserve_seats(instance.tour_id, instance.seats)
+            else:
+                release_seats(instance.tour_id, instance.seats)
+        except OverbookingError as exc:
+            raise serializers.ValidationError({'is_active': [str(exc)]})
 
 
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     password2 = serializers.CharField(write_only=True)
 
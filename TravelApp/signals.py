@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import forget_user
+from .booking import held_seats, release_seats
+from .cache import invalidate
+from .instrumentation import instrument_connection
+from .models import Reservation, Tour, TourReservation
+from .stats import refresh_tour_stats, update_reservation_tours, update_tour_stats
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+def invalidate_tour_responses(sender, **kwargs):
+    invalidate(Tour)
+
+
+@receiver(post_delete, sender=TourReservation)
+def release_booked_seats(sender, instance, **kwargs):
+    release_seats(instance.tour_id, held_seats(instance))
+
+
+@receiver(post_save, sender=Tour)
+def refresh_stats_of_tour(sender, instance, created, update_fields=None, **kwargs):
+    # Revenue follows the price, and new tours get their (empty) row here
+    if created or update_fields is None or 'price' in update_fields:
+        refresh_tour_stats([instance.pk])
+
+
+@receiver(post_save, sender=TourReservation)
+@receiver(post_delete, sender=TourReservation)
+def update_stats_of_link(sender, instance, **kwargs):
+    update_tour_stats([instance.tour_id])
+
+
+@receiver(post_save, sender=Reservation)
+def update_stats_of_reservation(sender, instance, created, **kwargs):
+    if not created:
+        update_reservation_tours([instance.pk])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
+
+
+@receiver(connection_created)
+def count_connection_queries(sender, connection, **kwargs):
+    instrument_connection(connection)
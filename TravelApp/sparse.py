@@ -0,0 +1,87 @@
+from rest_framework.exceptions import ValidationError
+
+
+_field_names = {}
+
+
+def serializer_field_names(serializer_class, context, key=()):
+    cache_key = (serializer_class, key)
+    names = _field_names.get(cache_key)
+    if names is None:
+        fields = serializer_class(context=context).fields
+        names = _field_names[cache_key] = [name for name, field in fields.items() if not field.write_only]
+    return names
+
+
+def parse_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()] if value else []
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=id,city`` and ``?exclude=profile_pic`` on reads.
+
+    Unselected fields are dropped from the serializer and their columns are
+    left out of the query with ``only()``; the primary key and the ordering
+    columns are always loaded so keyset positions never trigger extra queries.
+    """
+
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+
+    def get_row_serializer_key(self):
+        return ()
+
+    def get_sparse_fields(self):
+        """The selected serializer field names in declaration order, or ``None`` for all of them."""
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+
+        requested = parse_names(self.request.query_params.get(self.fields_query_param))
+        excluded = parse_names(self.request.query_params.get(self.exclude_query_param))
+        selected = None
+        if requested or excluded:
+            available = serializer_field_names(
+                self.get_serializer_class(), self.get_serializer_context(), self.get_row_serializer_key()
+            )
+            errors = {}
+            for param, names in ((self.fields_query_param, requested), (self.exclude_query_param, excluded)):
+                unknown = [name for name in names if name not in available]
+                if unknown:
+                    errors[param] = [f'Unknown field: {name}.' for name in unknown]
+            if errors:
+                raise ValidationError(errors)
+            selected = [
+                name for name in available
+                if (not requested or name in requested) and name not in excluded
+            ]
+        self._sparse_fields = selected
+        return selected
+
+    def get_sparse_columns(self, model, selected):
+        """Model columns needed for ``selected``, plus the primary key and the ordering columns."""
+        fields = {field.name: field for field in model._meta.concrete_fields}
+        names = [model._meta.pk.attname]
+        names += [fields[name].attname for name in getattr(self, 'ordering_fields', None) or () if name in fields]
+        # Serializer field names are the model field names for ModelSerializer fields
+        names += [fields[name].attname for name in selected if name in fields]
+        return list(dict.fromkeys(names))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selected = self.get_sparse_fields()
+        if selected is None:
+            return queryset
+        return queryset.only(*self.get_sparse_columns(queryset.model, selected))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        selected = self.get_sparse_fields()
+        if selected is not None:
+            fields = serializer.child.fields if kwargs.get('many') else serializer.fields
+            for name in list(fields):
+                if name not in selected:
+                    fields.pop(name)
+        return serializer
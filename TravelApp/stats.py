@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Reservation, Tour, TourReservation, TourStats
+
+AGGREGATE_SQL = '''
+SELECT t.id AS tour_id,
+       COUNT(tr.id) AS bookings,
+       COALESCE(SUM(r.amount_of_adults), 0) AS adults,
+       COALESCE(SUM(r.amount_of_children), 0) AS children,
+       COUNT(tr.id) FILTER (WHERE tr.is_price_reduced) AS reduced_price_bookings,
+       COALESCE(SUM(
+           t.price * (r.amount_of_adults + r.amount_of_children)
+           * CASE WHEN tr.is_price_reduced THEN %s ELSE 1 END
+       ), 0) AS revenue
+FROM "{tour}" AS t
+LEFT JOIN "{link}" AS tr ON tr.tour_id = t.id AND tr.is_active
+LEFT JOIN "{reservation}" AS r ON r.id = tr.reservation_id
+{where}
+GROUP BY t.id
+'''
+
+UPSERT_SQL = '''
+INSERT INTO "{stats}" (tour_id, bookings, adults, children, reduced_price_bookings, revenue, refreshed_at)
+SELECT a.*, now() FROM ({aggregate}) AS a
+ON CONFLICT (tour_id) DO UPDATE SET
+    bookings = EXCLUDED.bookings,
+    adults = EXCLUDED.adults,
+    children = EXCLUDED.children,
+    reduced_price_bookings = EXCLUDED.reduced_price_bookings,
+    revenue = EXCLUDED.revenue,
+    refreshed_at = EXCLUDED.refreshed_at
+'''
+
+# Never inserts, so a hook firing while a tour is being cascade-deleted cannot
+# recreate the stats row the deletion has just removed.
+UPDATE_SQL = '''
+UPDATE "{stats}" AS s
+SET bookings = a.bookings, adults = a.adults, children = a.children,
+    reduced_price_bookings = a.reduced_price_bookings, revenue = a.revenue, refreshed_at = now()
+FROM ({aggregate}) AS a
+WHERE s.tour_id = a.tour_id
+'''
+
+
+def reduced_price_rate():
+    return Decimal(str(getattr(settings, 'TRAVELAPP_REDUCED_PRICE_RATE', '0.5')))
+
+
+def _execute(template, where, params):
+    aggregate = AGGREGATE_SQL.format(
+        tour=Tour._meta.db_table,
+        link=TourReservation._meta.db_table,
+        reservation=Reservation._meta.db_table,
+        where=where,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            template.format(stats=TourStats._meta.db_table, aggregate=aggregate),
+            [reduced_price_rate(), *params],
+        )
+        return cursor.rowcount
+
+
+def _ids(pks):
+    return sorted({pk for pk in pks if pk is not None})
+
+
+def refresh_tour_stats(tour_ids=None, missing=False):
+    """
+    Create or recompute ``TourStats`` rows.
+
+    Covers ``tour_ids``, the tours that have no row yet with ``missing=True``,
+    or every tour when neither is given.
+    """
+    conditions, params = [], []
+    if tour_ids is not None:
+        conditions.append('t.id = ANY(%s)')
+        params.append(_ids(tour_ids))
+    if missing:
+        conditions.append(f'NOT EXISTS (SELECT 1 FROM "{TourStats._meta.db_table}" AS s WHERE s.tour_id = t.id)')
+    where = f'WHERE {" OR ".join(conditions)}' if conditions else ''
+    return _execute(UPSERT_SQL, where, params)
+
+
+def update_tour_stats(tour_ids):
+    """
+    Recompute the existing ``TourStats`` rows of ``tour_ids`` after a booking change.
+
+    Each tour is aggregated from its own links only, through
+    ``tourreservation_tour_idx``, so keeping a row current costs the same
+    however large the booking tables grow.
+    """
+    tour_ids = _ids(tour_ids)
+    if not tour_ids:
+        return 0
+    return _execute(UPDATE_SQL, 'WHERE t.id = ANY(%s)', [tour_ids])
+
+
+def update_reservation_tours(reservation_ids):
+    links = TourReservation.objects.filter(reservation_id__in=reservation_ids).order_by()
+    return update_tour_stats(links.values_list('tour_id', flat=True))
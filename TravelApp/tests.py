@@ -1,7 +1,9 @@
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Reservation, Tour, TourReservation
 from datetime import date, timedelta
+from decimal import Decimal
 
 
 # Aby odpalić testy "python manage.py test"
@@ -88,7 +90,11 @@ class TourReservationModelTest(TestCase):
 
 # GRAPHQL TEST
 from graphene.test import Client
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from .schema import schema
+from .loaders import RelationLoaders
 
 
 class GraphQLTestCase(TestCase):
@@ -318,3 +324,1787 @@ class GraphQLTestCase(TestCase):
         response = self.client.execute(mutation)
         self.assertTrue(response["data"]["deleteTourReservation"]["success"])
         self.assertEqual(TourReservation.objects.count(), 0)
+
+
+class GraphQLBatchingTest(TestCase):
+    query = """
+    query {
+        allTourReservations {
+            reservation { user { username } }
+            tour { supervisor { email } reservationLinks { isActive } }
+        }
+    }
+    """
+
+    def setUp(self):
+        self.client = Client(schema)
+        self.factory = RequestFactory()
+
+    def add_rows(self, count):
+        for i in range(count):
+            suffix = TourReservation.objects.count()
+            user = User.objects.create(username=f"client{suffix}")
+            supervisor = User.objects.create(username=f"guide{suffix}", email=f"guide{suffix}@example.com")
+            reservation = Reservation.objects.create(user=user, amount_of_adults=1)
+            tour = Tour.objects.create(
+                supervisor=supervisor,
+                max_number_of_participants=10,
+                date_start=date.today(),
+                date_end=date.today(),
+                place_id=i,
+                tour_type="standard",
+                price=100,
+                country="Poland",
+                region="Tatra",
+                city="Zakopane",
+                accommodation="Hotel",
+            )
+            TourReservation.objects.create(reservation=reservation, tour=tour)
+
+    def execute(self):
+        return self.client.execute(self.query, context_value=self.factory.post('/graphql/'))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.add_rows(2)
+        with CaptureQueriesContext(connection) as small:
+            response = self.execute()
+        self.assertEqual(len(response["data"]["allTourReservations"]), 2)
+
+        self.add_rows(8)
+        with CaptureQueriesContext(connection) as large:
+            response = self.execute()
+        self.assertEqual(len(response["data"]["allTourReservations"]), 10)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(response["data"]["allTourReservations"][9]["reservation"]["user"]["username"], "client9")
+
+    def test_shared_users_are_loaded_once(self):
+        self.add_rows(3)
+        TourReservation.objects.update(reservation=Reservation.objects.first())
+        # Forward relations are joined into the list query, reverse ones prefetched
+        with self.assertNumQueries(2):
+            response = self.execute()
+        usernames = {row["reservation"]["user"]["username"] for row in response["data"]["allTourReservations"]}
+        self.assertEqual(usernames, {"client0"})
+
+    def test_loaders_fetch_shared_relations_once(self):
+        self.add_rows(3)
+        TourReservation.objects.update(reservation=Reservation.objects.first())
+        loaders = RelationLoaders()
+        links = loaders.register(TourReservation.objects.all())
+        with self.assertNumQueries(2):
+            users = {loaders.load(loaders.load(link, 'reservation'), 'user').username for link in links}
+        self.assertEqual(users, {"client0"})
+
+    def test_selection_narrows_columns_and_joins_relations(self):
+        self.add_rows(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.execute("query { allTours { id city price } }")
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("profile_pic", queries[0]["sql"])
+        self.assertEqual(response["data"]["allTours"][0]["city"], "Zakopane")
+
+        with self.assertNumQueries(2):
+            response = self.execute()
+        self.assertEqual(response["data"]["allTourReservations"][0]["tour"]["reservationLinks"], [{"isActive": True}])
+
+
+class GraphQLConnectionTest(TestCase):
+    def setUp(self):
+        self.client = Client(schema)
+        self.supervisor = User.objects.create(username="guide")
+        for i, price in enumerate([300, 100, 200, 100, 500]):
+            Tour.objects.create(
+                supervisor=self.supervisor,
+                max_number_of_participants=10,
+                date_start=date.today() + timedelta(days=i),
+                date_end=date.today() + timedelta(days=i + 3),
+                place_id=i,
+                tour_type="standard" if i % 2 else "exclusive",
+                price=price,
+                country="Italy",
+                region="Tuscany",
+                city=f"City{i}",
+                accommodation="Hotel",
+            )
+
+    def fetch(self, arguments):
+        query = """
+        query {
+            tours(%s) {
+                edges { cursor node { city price } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }
+        """ % arguments
+        return self.client.execute(query)["data"]["tours"]
+
+    def test_keyset_pages_follow_ordering(self):
+        cities = []
+        after = None
+        while True:
+            arguments = 'first: 2, orderBy: "price"' + (f', after: "{after}"' if after else '')
+            result = self.fetch(arguments)
+            cities += [edge["node"]["city"] for edge in result["edges"]]
+            if not result["pageInfo"]["hasNextPage"]:
+                break
+            after = result["pageInfo"]["endCursor"]
+        self.assertEqual(cities, ["City1", "City3", "City2", "City0", "City4"])
+
+    def test_filters_match_rest_filterset(self):
+        result = self.fetch('tourType: "standard", orderBy: "-date_start"')
+        self.assertEqual([edge["node"]["city"] for edge in result["edges"]], ["City3", "City1"])
+        response = self.client.execute('query { allTours(tourType: "exclusive") { city } }')
+        self.assertEqual(len(response["data"]["allTours"]), 3)
+
+    def test_invalid_cursor_and_ordering_are_rejected(self):
+        response = self.client.execute('query { tours(after: "nope") { edges { cursor } } }')
+        self.assertEqual(response["errors"][0]["message"], "Invalid cursor.")
+        response = self.client.execute('query { tours(orderBy: "city") { edges { cursor } } }')
+        self.assertIn("Unknown ordering", response["errors"][0]["message"])
+
+
+# REST TEST
+from django.core.cache import caches
+from rest_framework.test import APITestCase
+from .cache import LRUCache
+from .instrumentation import QueryBudgetTestMixin
+from .booking import OverbookingError, book_tour
+from concurrent.futures import ThreadPoolExecutor
+from django.http import StreamingHttpResponse
+import json
+import re
+import time
+from django.utils.http import http_date
+
+
+class KeysetPaginationTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.supervisor = User.objects.create(username="guide")
+        for i, price in enumerate([300, 100, 200, 100, 500, 400]):
+            Tour.objects.create(
+                supervisor=self.supervisor,
+                max_number_of_participants=10,
+                date_start=date.today() + timedelta(days=i),
+                date_end=date.today() + timedelta(days=i + 3),
+                place_id=i,
+                tour_type="standard",
+                price=price,
+                country="Italy",
+                region="Tuscany",
+                city=f"City{i}",
+                accommodation="Hotel",
+            )
+
+    def test_walks_pages_forward_and_back(self):
+        response = self.client.get('/api/tours/', {'ordering': '-price', 'page_size': 4})
+        self.assertEqual([tour['city'] for tour in response.data['results']], ["City4", "City5", "City0", "City2"])
+        self.assertIsNone(response.data['previous'])
+        self.assertNotIn('count', response.data)
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([tour['city'] for tour in response.data['results']], ["City3", "City1"])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([tour['city'] for tour in response.data['results']], ["City4", "City5", "City0", "City2"])
+
+    @override_settings(TRAVELAPP_MAX_PAGE_SIZE=2)
+    def test_page_size_is_capped_and_counts_are_opt_in(self):
+        response = self.client.get('/api/tours/', {'page_size': 50, 'count': 'exact'})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['count'], 6)
+
+        response = self.client.get('/api/tours/', {'count': 'estimated'})
+        self.assertIsInstance(response.data['count'], int)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/tours/', {'after': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ReservationAggregatesTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='client', password='clientpass')
+        self.client.force_authenticate(self.user)
+        self.reservation = Reservation.objects.create(user=self.user, amount_of_adults=2, amount_of_children=1)
+        Reservation.objects.create(user=self.user, amount_of_adults=1)
+        for place_id in range(2):
+            tour = Tour.objects.create(
+                supervisor=self.user,
+                max_number_of_participants=10,
+                date_start=date.today(),
+                date_end=date.today(),
+                place_id=place_id,
+                tour_type="standard",
+                price=100,
+                country="Poland",
+                region="Tatra",
+                city="Zakopane",
+                accommodation="Hotel",
+            )
+            TourReservation.objects.create(reservation=self.reservation, tour=tour)
+
+    def test_plain_list_has_no_group_by(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/reservations/')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertNotIn('participants', response.data['results'][0])
+        self.assertFalse(any('GROUP BY' in query['sql'] for query in queries))
+
+    def test_aggregates_are_opt_in(self):
+        response = self.client.get('/api/reservations/', {'aggregates': 'participants,tour_count'})
+        totals = [(row['participants'], row['tour_count']) for row in response.data['results']]
+        self.assertEqual(totals, [(3, 2), (1, 0)])
+
+        response = self.client.get('/api/reservations/', {'aggregates': 'tour_count'})
+        self.assertNotIn('participants', response.data['results'][0])
+
+
+class TourResponseCacheTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.tour = Tour.objects.create(
+            supervisor=self.admin,
+            max_number_of_participants=10,
+            date_start=date.today(),
+            date_end=date.today(),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+        )
+
+    def test_anonymous_reads_are_cached_until_a_tour_changes(self):
+        self.assertEqual(self.client.get('/api/tours/', {'country': 'Poland'})['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tours/', {'country': 'Poland'})
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['results'][0]['city'], 'Zakopane')
+
+        self.assertEqual(self.client.get(f'/api/tours/{self.tour.id}/')['X-Cache'], 'MISS')
+        Client(schema).execute(f'mutation {{ updateTour(id: {self.tour.id}, price: "120.00") {{ tour {{ id }} }} }}')
+
+        response = self.client.get(f'/api/tours/{self.tour.id}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['price'], '120.00')
+        self.assertEqual(self.client.get('/api/tours/', {'country': 'Poland'})['X-Cache'], 'MISS')
+
+    def test_authenticated_reads_bypass_the_cache(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/tours/')
+        self.assertNotIn('X-Cache', response)
+
+    def test_local_entries_expire_and_other_processes_invalidate_through_the_shared_backend(self):
+        with self.settings(TRAVELAPP_RESPONSE_CACHE={'LOCAL_TIMEOUT': 0}):
+            self.assertEqual(self.client.get('/api/tours/', {'country': 'Poland'})['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get('/api/tours/', {'country': 'Poland'})['X-Cache'], 'MISS')
+
+        with self.settings(TRAVELAPP_RESPONSE_CACHE={'LOCAL_TIMEOUT': None}):
+            self.assertNotIn('X-Cache', self.client.get('/api/tours/', {'country': 'Poland'}))
+
+        with self.settings(TRAVELAPP_RESPONSE_CACHE={'LOCAL_TIMEOUT': None, 'SHARED_BACKEND': 'default'}):
+            self.assertEqual(self.client.get('/api/tours/', {'country': 'Poland'})['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get('/api/tours/', {'country': 'Poland'})['X-Cache'], 'HIT')
+            # What a write in another worker or a management command does
+            caches['default'].incr(f'travelapp:version:{Tour._meta.db_table}')
+            self.assertEqual(self.client.get('/api/tours/', {'country': 'Poland'})['X-Cache'], 'MISS')
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+
+
+class ConditionalGetTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='client', password='clientpass')
+        self.other = User.objects.create_user(username='other', password='otherpass')
+        self.reservation = Reservation.objects.create(user=self.user, amount_of_adults=2)
+        self.client.force_authenticate(self.user)
+
+    def test_list_returns_304_until_rows_change(self):
+        response = self.client.get('/api/reservations/')
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/reservations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Reservation.objects.create(user=self.user)
+        response = self.client.get('/api/reservations/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Deleting the newest row leaves max(updated_at) behind; only the count tells
+        etag = response['ETag']
+        Reservation.objects.latest('id').delete()
+        since = http_date(time.time() + 60)
+        self.assertEqual(self.client.get('/api/reservations/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+        self.assertEqual(self.client.get('/api/reservations/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_validator_follows_updated_at(self):
+        url = f'/api/reservations/{self.reservation.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.reservation.amount_of_adults = 3
+        self.reservation.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_not_modified_still_checks_object_permissions(self):
+        url = f'/api/reservations/{self.reservation.id}/'
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+    def test_cached_anonymous_tours_answer_304(self):
+        self.client.force_authenticate(None)
+        Tour.objects.create(
+            supervisor=self.user,
+            max_number_of_participants=10,
+            date_start=date.today(),
+            date_end=date.today(),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+        )
+        etag = self.client.get('/api/tours/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tours/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class SeatBookingTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='client', password='clientpass')
+        self.client.force_authenticate(self.user)
+        self.tour = Tour.objects.create(
+            supervisor=self.user,
+            max_number_of_participants=5,
+            date_start=date.today(),
+            date_end=date.today(),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+        )
+        self.family = Reservation.objects.create(user=self.user, amount_of_adults=2, amount_of_children=2)
+        self.couple = Reservation.objects.create(user=self.user, amount_of_adults=2)
+
+    def test_booking_takes_seats_and_rejects_overbooking(self):
+        response = self.client.post('/api/tour-reservations/', {'reservation': self.family.id, 'tour': self.tour.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['seats'], 4)
+
+        response = self.client.post('/api/tour-reservations/', {'reservation': self.couple.id, 'tour': self.tour.id})
+        self.assertEqual(response.status_code, 400)
+
+        mutation = f"""
+        mutation {{
+            createTourReservation(reservationId: {self.couple.id}, tourId: {self.tour.id}) {{
+                tourReservation {{ seats }}
+            }}
+        }}
+        """
+        result = Client(schema).execute(mutation)
+        self.assertIn("fewer than 2 free seats", result["errors"][0]["message"])
+        self.tour.refresh_from_db()
+        self.assertEqual(self.tour.seats_taken, 4)
+        self.assertEqual(TourReservation.objects.count(), 1)
+
+    def test_cancelling_and_resizing_adjust_seats(self):
+        link = book_tour(self.family, self.tour)
+        response = self.client.patch(f'/api/reservations/{self.family.id}/', {'amount_of_children': 0})
+        self.assertEqual(response.status_code, 200)
+        self.tour.refresh_from_db()
+        self.assertEqual(self.tour.seats_taken, 2)
+
+        response = self.client.patch(f'/api/reservations/{self.family.id}/', {'amount_of_adults': 9})
+        self.assertEqual(response.status_code, 400)
+        self.family.refresh_from_db()
+        self.assertEqual(self.family.amount_of_adults, 2)
+
+        link.delete()
+        self.tour.refresh_from_db()
+        self.assertEqual(self.tour.seats_taken, 0)
+
+    def test_inactive_links_hold_no_seats(self):
+        link = book_tour(self.family, self.tour)
+        response = self.client.patch(f'/api/tour-reservations/{link.id}/', {'is_active': False})
+        self.assertEqual(response.status_code, 200)
+        self.tour.refresh_from_db()
+        self.assertEqual(self.tour.seats_taken, 0)
+
+        book_tour(self.couple, self.tour)
+        response = self.client.patch(f'/api/tour-reservations/{link.id}/', {'is_active': True})
+        self.assertEqual(response.status_code, 400)
+        link.refresh_from_db()
+        self.assertFalse(link.is_active)
+
+        link.delete()
+        self.tour.refresh_from_db()
+        self.assertEqual(self.tour.seats_taken, 2)
+
+
+class ConcurrentBookingTest(TransactionTestCase):
+    capacity = 40
+    attempts = 200
+
+    def setUp(self):
+        supervisor = User.objects.create(username="guide")
+        self.tour = Tour.objects.create(
+            supervisor=supervisor,
+            max_number_of_participants=self.capacity,
+            date_start=date.today(),
+            date_end=date.today(),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+        )
+        self.reservations = [
+            Reservation.objects.create(user=supervisor, amount_of_adults=1)
+            for _ in range(self.attempts)
+        ]
+
+    def book(self, reservation):
+        try:
+            book_tour(reservation, self.tour)
+            return True
+        except OverbookingError:
+            return False
+        finally:
+            connection.close()
+
+    def test_concurrent_bookings_never_oversell(self):
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(self.book, self.reservations))
+
+        self.tour.refresh_from_db()
+        self.assertEqual(results.count(True), self.capacity)
+        self.assertEqual(self.tour.seats_taken, self.capacity)
+        self.assertEqual(TourReservation.objects.filter(tour=self.tour).count(), self.capacity)
+
+
+class BulkEndpointsTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def tour_payload(self, **overrides):
+        payload = {
+            'supervisor': self.admin.id,
+            'max_number_of_participants': 3,
+            'date_start': '2025-07-01',
+            'date_end': '2025-07-08',
+            'place_id': 1,
+            'tour_type': 'standard',
+            'price': '999.00',
+            'country': 'Italy',
+            'region': 'Tuscany',
+            'city': 'Florence',
+            'accommodation': 'Hotel',
+        }
+        payload.update(overrides)
+        return payload
+
+    def test_bulk_create_tours_in_constant_queries(self):
+        payload = [self.tour_payload(place_id=i) for i in range(500)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/tours/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 500)
+        self.assertEqual(Tour.objects.count(), 500)
+        self.assertLess(len(queries), 10)
+
+    def test_bulk_create_reports_item_errors(self):
+        payload = [self.tour_payload(), self.tour_payload(tour_type='cruise'), self.tour_payload(supervisor=0)]
+        response = self.client.post('/api/tours/', payload, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('tour_type', response.data['errors'][0]['errors'])
+
+    def test_bulk_update_and_delete_tours(self):
+        tours = Tour.objects.bulk_create([Tour(**{**self.tour_payload(), 'supervisor': self.admin}) for _ in range(3)])
+        response = self.client.patch(
+            '/api/tours/', [{'id': tour.id, 'price': '10.00'} for tour in tours] + [{'id': 0, 'price': '1.00'}],
+            format='json',
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(set(Tour.objects.values_list('price', flat=True)), {Decimal('10.00')})
+
+        response = self.client.delete('/api/tours/', {'ids': [tours[0].id, tours[1].id]}, format='json')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(Tour.objects.count(), 1)
+
+    def test_bulk_booking_checks_capacity_per_tour(self):
+        roomy, small = Tour.objects.bulk_create([
+            Tour(**{**self.tour_payload(max_number_of_participants=10), 'supervisor': self.admin}),
+            Tour(**{**self.tour_payload(max_number_of_participants=3), 'supervisor': self.admin}),
+        ])
+        couples = [Reservation.objects.create(user=self.admin, amount_of_adults=2) for _ in range(2)]
+        payload = [{'reservation': couple.id, 'tour': tour.id} for tour in (roomy, small) for couple in couples]
+
+        response = self.client.post('/api/tour-reservations/', payload, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([error['index'] for error in response.data['errors']], [2, 3])
+        roomy.refresh_from_db()
+        small.refresh_from_db()
+        self.assertEqual((roomy.seats_taken, small.seats_taken), (4, 0))
+
+        links = TourReservation.objects.all()
+        response = self.client.patch(
+            '/api/tour-reservations/', [{'id': link.id, 'tour': small.id} for link in links], format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(
+            '/api/tour-reservations/', [{'id': link.id, 'is_active': False} for link in links], format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        roomy.refresh_from_db()
+        self.assertEqual(roomy.seats_taken, 0)
+
+        book_tour(Reservation.objects.create(user=self.admin, amount_of_adults=8), roomy)
+        response = self.client.patch(
+            '/api/tour-reservations/', [{'id': link.id, 'is_active': True} for link in links], format='json'
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertIn('is_active', response.data['errors'][0]['errors'])
+        roomy.refresh_from_db()
+        self.assertEqual(roomy.seats_taken, 10)
+
+    def test_bulk_booking_locks_tours_in_id_order(self):
+        tours = Tour.objects.bulk_create([
+            Tour(**{**self.tour_payload(max_number_of_participants=10), 'supervisor': self.admin}) for _ in range(2)
+        ])
+        couple = Reservation.objects.create(user=self.admin, amount_of_adults=2)
+        payload = [{'reservation': couple.id, 'tour': tour.id} for tour in reversed(tours)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/tour-reservations/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        locked = [
+            int(re.search(r'"id" = (\d+)', query['sql']).group(1)) for query in queries
+            if query['sql'].startswith('UPDATE "TravelApp_tour" SET "seats_taken"')
+        ]
+        self.assertEqual(locked, sorted(tour.id for tour in tours))
+        links = TourReservation.objects.in_bulk(response.data['ids'])
+        self.assertEqual([links[pk].tour_id for pk in response.data['ids']], [tour.id for tour in reversed(tours)])
+
+    def test_graphql_bulk_create_tours(self):
+        mutation = """
+        mutation {
+            bulkCreateTours(tours: [
+                {supervisorId: %d, maxNumberOfParticipants: 5, dateStart: "2025-06-01", dateEnd: "2025-06-07",
+                 placeId: 2, tourType: "standard", price: 299.99, country: "Germany", region: "Bavaria",
+                 city: "Munich", accommodation: "Hostel"},
+                {supervisorId: %d, maxNumberOfParticipants: 5, dateStart: "2025-06-01", dateEnd: "2025-06-07",
+                 placeId: 2, tourType: "space", price: 299.99, country: "Germany", region: "Bavaria",
+                 city: "Munich", accommodation: "Hostel"}
+            ]) {
+                tours { city }
+                errors { index messages }
+            }
+        }
+        """ % (self.admin.id, self.admin.id)
+        result = Client(schema).execute(mutation)["data"]["bulkCreateTours"]
+        self.assertEqual(result["tours"], [{"city": "Munich"}])
+        self.assertEqual(result["errors"][0]["index"], 1)
+        self.assertTrue(result["errors"][0]["messages"][0].startswith("tour_type:"))
+
+
+class ExportTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.client.force_authenticate(self.admin)
+        self.tour = Tour.objects.create(
+            supervisor=self.admin,
+            max_number_of_participants=10,
+            date_start=date.today(),
+            date_end=date.today(),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+        )
+        for name in ('anna', 'bartek'):
+            user = User.objects.create_user(username=name, password='pass1234')
+            reservation = Reservation.objects.create(user=user, amount_of_adults=2, is_confirmed=name == 'anna')
+            book_tour(reservation, self.tour)
+
+    def read(self, response):
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode()
+
+    def test_reservations_stream_as_csv_with_list_filters(self):
+        response = self.client.get('/api/reservations/export/', {'is_confirmed': 'true'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'user_id', 'user_username'])
+        self.assertEqual(len(lines), 2)
+        self.assertIn('anna', lines[1])
+
+    def test_manifest_streams_ndjson(self):
+        response = self.client.get(f'/api/tours/{self.tour.id}/manifest/', {'format': 'ndjson'})
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['reservation_user_username'] for row in rows], ['anna', 'bartek'])
+        self.assertEqual(rows[0]['reservation_amount_of_adults'], 2)
+
+        self.assertEqual(self.client.get('/api/tours/0/manifest/').status_code, 404)
+
+    async def test_exports_stream_asynchronously_under_asgi(self):
+        token = RefreshToken.for_user(self.admin).access_token
+        response = await AsyncClient().get(
+            '/api/reservations/export/', {'format': 'ndjson'}, headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([json.loads(line)['user_username'] for line in content.splitlines()], ['anna', 'bartek'])
+
+    def test_exports_are_admin_only(self):
+        self.client.force_authenticate(User.objects.get(username='anna'))
+        self.assertEqual(self.client.get('/api/tour-reservations/export/').status_code, 403)
+
+
+import os
+import tempfile
+from io import StringIO
+from django.core.management import CommandError, call_command
+
+
+class ImportToursCommandTest(TestCase):
+    def setUp(self):
+        self.supervisor = User.objects.create_user(username='guide', password='guidepass')
+        self.existing = Tour.objects.create(
+            supervisor=self.supervisor,
+            max_number_of_participants=10,
+            date_start=date(2025, 6, 1),
+            date_end=date(2025, 6, 8),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+            seats_taken=4,
+        )
+
+    def run_import(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as handle:
+            handle.write(content)
+        self.addCleanup(os.unlink, handle.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_tours', handle.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_upserts_and_rejects_invalid_rows(self):
+        content = (
+            "id,supervisor,max_number_of_participants,date_start,date_end,place_id,tour_type,price,"
+            "country,region,city,accommodation,is_active\n"
+            f"{self.existing.id},guide,12,2025-06-01,2025-06-08,1,standard,120.50,Poland,Tatra,Zakopane,Hotel,true\n"
+            ",guide,20,2025-07-01,2025-07-05,2,exclusive,999.99,Italy,Tuscany,Florence,Villa,\n"
+            ",guide,20,2025-07-05,2025-07-01,2,exclusive,10,Italy,Tuscany,Florence,Villa,\n"
+            ",guide,20,2025-07-01,2025-07-05,2,cruise,10,Italy,Tuscany,Florence,Villa,\n"
+            ",guide,20,2025-07-01,2025-07-05,2,standard,1.234,Italy,Tuscany,Florence,Villa,\n"
+            ",nobody,20,2025-07-01,2025-07-05,2,standard,10,Italy,Tuscany,Florence,Villa,\n"
+        )
+        out, err = self.run_import(content, '.csv')
+
+        self.assertIn('Imported 2 tours (1 new, 1 updated), rejected 4', out)
+        self.assertIn('rows/s', out)
+        self.assertIn('line 4: date_end is before date_start', err)
+        self.assertIn("line 7: supervisor: unknown username 'nobody'", err)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.price, self.existing.seats_taken), (Decimal('120.50'), 4))
+        florence = Tour.objects.get(city="Florence")
+        self.assertEqual((florence.seats_taken, florence.is_active), (0, True))
+        # The sequence still hands out fresh ids after the import
+        self.assertGreater(Tour.objects.create(**{
+            **{f.name: getattr(florence, f.name) for f in Tour._meta.concrete_fields if f.name != 'id'},
+        }).id, florence.id)
+
+    def test_ndjson_reservations_and_strict_mode(self):
+        rows = [
+            {"user": "guide", "date_of_reservation": "2025-05-01", "amount_of_adults": 2},
+            {"user": "guide", "date_of_reservation": "not a date"},
+        ]
+        content = "".join(json.dumps(row) + "\n" for row in rows)
+        with self.assertRaises(CommandError):
+            self.run_import(content, '.ndjson', '--kind', 'reservations', '--strict')
+        self.assertFalse(Reservation.objects.exists())
+
+        out, _ = self.run_import(content, '.ndjson', '--kind', 'reservations')
+        self.assertIn('Imported 1 reservations', out)
+        self.assertEqual(Reservation.objects.get().amount_of_adults, 2)
+
+    def test_malformed_ndjson_lines_are_rejected(self):
+        content = (
+            '{"user": "guide", "date_of_reservation": "2025-05-01", "amount_of_adults": 2}\n'
+            '{"user": "guide", "date_of_reservation": \n'
+            '["not", "an", "object"]\n'
+        )
+        out, err = self.run_import(content, '.ndjson', '--kind', 'reservations')
+        self.assertIn('Imported 1 reservations', out)
+        self.assertIn('rejected 2', out)
+        self.assertIn('line 2: invalid JSON', err)
+        self.assertIn('line 3: expected an object', err)
+
+    def test_booked_reservations_are_resized_within_capacity(self):
+        reservation = Reservation.objects.create(user=self.supervisor, amount_of_adults=2)
+        book_tour(reservation, self.existing)
+        other = Reservation.objects.create(user=self.supervisor, amount_of_adults=1)
+        book_tour(other, self.existing)
+
+        def row(pk, adults):
+            return json.dumps({"id": pk, "user": "guide", "date_of_reservation": "2025-05-01",
+                               "amount_of_adults": adults}) + "\n"
+
+        out, err = self.run_import(row(reservation.id, 5) + row(other.id, 20), '.ndjson', '--kind', 'reservations')
+        self.assertIn('Imported 1 reservations', out)
+        self.assertIn('has fewer than 19 free seats', err)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.seats_taken, 4 + 5 + 1)
+        self.assertEqual(reservation.tour_links.get().seats, 5)
+        other.refresh_from_db()
+        self.assertEqual((other.amount_of_adults, other.tour_links.get().seats), (1, 1))
+
+from . import search
+
+
+class TourSearchTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        supervisor = User.objects.create_user(username='guide', password='guidepass')
+        places = [
+            ("Poland", "Tatra", "Zakopane", "Mountain Lodge", "standard", 300),
+            ("Poland", "Pomerania", "Gdansk", "Old Town Hotel", "exclusive", 1200),
+            ("Italy", "Tuscany", "Florence", "Villa Medici", "all inclusive", 3000),
+            ("Italy", "Lazio", "Rome", "Hotel Roma", "standard", 800),
+        ]
+        for country, region, city, accommodation, tour_type, price in places:
+            Tour.objects.create(
+                supervisor=supervisor,
+                max_number_of_participants=10,
+                date_start=date(2025, 6, 1),
+                date_end=date(2025, 6, 8),
+                place_id=1,
+                tour_type=tour_type,
+                price=price,
+                country=country,
+                region=region,
+                city=city,
+                accommodation=accommodation,
+            )
+
+    def test_full_text_match_with_facets(self):
+        response = self.client.get('/api/tours/search/', {'q': 'poland'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual({tour['city'] for tour in response.data['results']}, {'Zakopane', 'Gdansk'})
+        self.assertNotIn('search_vector', response.data['results'][0])
+        self.assertEqual(response.data['facets']['country'], [{'value': 'Poland', 'count': 2}])
+        self.assertEqual(
+            response.data['facets']['tour_type'],
+            [{'value': 'exclusive', 'count': 1}, {'value': 'standard', 'count': 1}],
+        )
+        self.assertEqual(
+            response.data['facets']['price'],
+            [{'value': '0-500', 'count': 1}, {'value': '1000-2500', 'count': 1}],
+        )
+
+    def test_typo_tolerance(self):
+        if not search.trigram_enabled():
+            self.skipTest('pg_trgm is not installed')
+        response = self.client.get('/api/tours/search/', {'q': 'Zakopne'})
+        self.assertEqual([tour['city'] for tour in response.data['results']], ['Zakopane'])
+
+    def test_filters_and_updates(self):
+        response = self.client.get('/api/tours/search/', {'q': 'hotel', 'country': 'Italy'})
+        self.assertEqual([tour['city'] for tour in response.data['results']], ['Rome'])
+
+        tour = Tour.objects.get(city='Rome')
+        tour.city = 'Napoli'
+        tour.save()
+        response = self.client.get('/api/tours/search/', {'q': 'napoli'})
+        self.assertEqual([tour['city'] for tour in response.data['results']], ['Napoli'])
+
+        self.assertEqual(self.client.get('/api/tours/search/').status_code, 400)
+
+    def test_graphql_search_tours(self):
+        query = """
+        query {
+            searchTours(query: "italy", first: 1) {
+                count
+                facets { price { value count } }
+                tours { city }
+            }
+        }
+        """
+        result = Client(schema).execute(query)["data"]["searchTours"]
+        self.assertEqual(result["count"], 2)
+        self.assertEqual(len(result["tours"]), 1)
+        self.assertEqual(
+            result["facets"]["price"], [{"value": "500-1000", "count": 1}, {"value": "2500-5000", "count": 1}]
+        )
+
+
+class TourFilterTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        supervisor = User.objects.create_user(username='guide', password='guidepass')
+        tours = [
+            # city, country, start, end, price, max participants, seats taken
+            ("Rome", "Italy", date(2025, 7, 5), date(2025, 7, 12), 1500, 10, 2),
+            ("Milan", "Italy", date(2025, 6, 20), date(2025, 7, 1), 900, 10, 8),
+            ("Naples", "Italy", date(2025, 7, 15), date(2025, 7, 20), 800, 10, 0),
+            ("Venice", "Italy", date(2025, 7, 2), date(2025, 7, 4), 2500, 10, 0),
+            ("Krakow", "Poland", date(2025, 7, 3), date(2025, 7, 10), 700, 10, 0),
+        ]
+        for city, country, start, end, price, capacity, taken in tours:
+            Tour.objects.create(
+                supervisor=supervisor,
+                max_number_of_participants=capacity,
+                seats_taken=taken,
+                date_start=start,
+                date_end=end,
+                place_id=1,
+                tour_type="standard",
+                price=price,
+                country=country,
+                region="Region",
+                city=city,
+                accommodation="Hotel",
+            )
+
+    def cities(self, **params):
+        response = self.client.get('/api/tours/', {'page_size': 50, **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(tour['city'] for tour in response.data['results'])
+
+    def test_window_price_and_free_seats(self):
+        params = {'country': 'Italy', 'travel_after': '2025-07-01', 'travel_before': '2025-07-14'}
+        self.assertEqual(self.cities(**params), ['Milan', 'Rome', 'Venice'])
+        self.assertEqual(self.cities(**params, price_max=2000), ['Milan', 'Rome'])
+        self.assertEqual(self.cities(**params, price_max=2000, free_seats=4), ['Rome'])
+        self.assertEqual(self.cities(travel_after='2025-07-13'), ['Naples'])
+
+    def test_duration_and_price_range(self):
+        self.assertEqual(self.cities(duration_min=7), ['Krakow', 'Milan', 'Rome'])
+        self.assertEqual(self.cities(duration_max=5), ['Naples', 'Venice'])
+        self.assertEqual(self.cities(price_min=800, price_max=1500), ['Milan', 'Naples', 'Rome'])
+
+    def test_inverted_window_is_rejected(self):
+        response = self.client.get('/api/tours/', {'travel_after': '2025-07-14', 'travel_before': '2025-07-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('travel_after', response.data)
+
+    def test_tours_cannot_end_before_they_start(self):
+        admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.client.force_authenticate(admin)
+        tour = Tour.objects.get(city='Rome')
+        payload = {
+            'supervisor': admin.id, 'max_number_of_participants': 5, 'date_start': '2025-07-08',
+            'date_end': '2025-07-01', 'place_id': 1, 'tour_type': 'standard', 'price': '10.00', 'country': 'Italy',
+            'region': 'Lazio', 'city': 'Ostia', 'accommodation': 'Hotel',
+        }
+        response = self.client.post('/api/tours/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date_end', response.data)
+
+        response = self.client.patch(f'/api/tours/{tour.id}/', {'date_end': '2025-07-01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/tours/', [payload, {**payload, 'date_end': '2025-07-09'}], format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0])
+
+        response = self.client.patch('/api/tours/', [{'id': tour.id, 'date_end': '2025-07-01'}], format='json')
+        self.assertEqual(response.data['errors'][0]['errors'], {'date_end': ['Must not be before date_start.']})
+        tour.refresh_from_db()
+        self.assertEqual(tour.date_end, date(2025, 7, 12))
+
+        result = schema.execute(f'''
+            mutation {{ createTour(supervisorId: {admin.id}, maxNumberOfParticipants: 5, dateStart: "2025-07-08",
+                dateEnd: "2025-07-01", placeId: 1, tourType: "standard", price: 10, country: "Italy",
+                region: "Lazio", city: "Ostia", accommodation: "Hotel") {{ tour {{ id }} }} }}
+        ''')
+        self.assertEqual(result.errors[0].message, 'date_end must not be before date_start.')
+
+
+from .models import TourStats
+
+
+@override_settings(TRAVELAPP_REDUCED_PRICE_RATE='0.5')
+class TourStatsTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.tour = Tour.objects.create(
+            supervisor=self.admin,
+            max_number_of_participants=20,
+            date_start=date(2025, 7, 1),
+            date_end=date(2025, 7, 8),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+        )
+        self.family = Reservation.objects.create(user=self.admin, amount_of_adults=2, amount_of_children=2)
+        self.single = Reservation.objects.create(user=self.admin, amount_of_adults=1)
+
+    def stats(self):
+        return TourStats.objects.get(tour=self.tour)
+
+    def test_hooks_keep_stats_current(self):
+        self.assertEqual(self.stats().bookings, 0)
+        book_tour(self.family, self.tour)
+        link = book_tour(self.single, self.tour, is_price_reduced=True)
+        stats = self.stats()
+        self.assertEqual((stats.bookings, stats.adults, stats.children, stats.reduced_price_bookings),
+                         (2, 3, 2, 1))
+        self.assertEqual(stats.revenue, Decimal('450.00'))
+
+        self.family.amount_of_children = 1
+        self.family.save()
+        self.tour.price = 200
+        self.tour.save()
+        self.assertEqual(self.stats().revenue, Decimal('700.00'))
+
+        link.delete()
+        stats = self.stats()
+        self.assertEqual((stats.bookings, stats.adults, stats.revenue), (1, 2, Decimal('600.00')))
+
+        # Deleting the tour cascades through its links without recreating the row
+        self.tour.delete()
+        self.assertFalse(TourStats.objects.exists())
+
+    def test_endpoint_graphql_and_repair_command(self):
+        book_tour(self.family, self.tour)
+        TourStats.objects.update(bookings=0, adults=0, children=0, revenue=0)
+        call_command('refresh_tour_stats', stdout=StringIO())
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/tours/{self.tour.id}/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['bookings'], response.data['revenue']), (1, '400.00'))
+
+        query = "{ allTours { city stats { adults children } } }"
+        with CaptureQueriesContext(connection) as queries:
+            result = Client(schema).execute(query, context_value=RequestFactory().get('/graphql/'))
+        self.assertEqual(result["data"]["allTours"], [{"city": "Zakopane", "stats": {"adults": 2, "children": 2}}])
+        self.assertLessEqual(len(queries), 2)
+
+
+from . import views
+
+
+class AsyncCatalogueTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.tour = Tour.objects.create(
+            supervisor=self.admin,
+            max_number_of_participants=10,
+            date_start=date(2025, 7, 1),
+            date_end=date(2025, 7, 8),
+            place_id=1,
+            tour_type="standard",
+            price=100,
+            country="Poland",
+            region="Tatra",
+            city="Zakopane",
+            accommodation="Hotel",
+        )
+
+    async def test_anonymous_reads_are_served_in_the_event_loop(self):
+        client = AsyncClient()
+        response = await client.get('/api/tours/', {'country': 'Poland', 'count': 'exact'})
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        body = response.json()
+        self.assertEqual((body['count'], body['results'][0]['city']), (1, 'Zakopane'))
+
+        sync = views.TourList.as_view()(RequestFactory().get('/api/tours/', {'country': 'Poland', 'count': 'exact'}))
+        self.assertEqual(body, json.loads(json.dumps(sync.data)))
+        self.assertEqual(response['ETag'], sync['ETag'])
+
+        response = await client.get('/api/tours/', {'country': 'Poland', 'count': 'exact'})
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = await client.get(
+            '/api/tours/', {'country': 'Poland', 'count': 'exact'}, headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = await client.get(f'/api/tours/{self.tour.id}/')
+        self.assertEqual((response.status_code, response.json()['price']), (200, '100.00'))
+        self.assertEqual((await client.get('/api/tours/0/')).status_code, 404)
+
+        response = await client.get('/')
+        self.assertEqual(response.json()['tours'], 'http://testserver/api/tours/')
+
+    async def test_errors_and_other_requests_use_the_sync_view(self):
+        client = AsyncClient()
+        response = await client.get('/api/tours/', {'travel_after': '2025-08-01', 'travel_before': '2025-07-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('travel_after', response.json())
+
+        response = await client.post('/api/tours/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+        response = await client.get('/api/tours/', headers={'Accept': 'text/html'})
+        self.assertIn('text/html', response['Content-Type'])
+
+    def test_authenticated_requests_are_delegated(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/tours/{self.tour.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Cache', response)
+
+    async def test_graphql_view(self):
+        response = await AsyncClient().post(
+            '/graphql/', {'query': '{ allTours { city } }'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'allTours': [{'city': 'Zakopane'}]})
+
+        response = await AsyncClient().get('/graphql/', headers={'Accept': 'text/html'})
+        self.assertContains(response, 'graphiql')
+
+        response = await AsyncClient().get('/graphql/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['message'], 'Must provide query string.')
+
+
+from rest_framework import serializers as drf_serializers
+from .rows import RowSerializer, row_serializer
+from .serializers import ReservationAggregatesSerializer, ReservationSerializer, TourReservationSerializer, \
+    TourSerializer
+from django.db.models import F
+
+
+class RowSerializerTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='client', password='clientpass')
+        self.reservation = Reservation.objects.create(user=self.user, amount_of_adults=2, amount_of_children=1)
+        for place_id, picture in enumerate(['profile/zakopane.jpg', '']):
+            tour = Tour.objects.create(
+                supervisor=self.user,
+                max_number_of_participants=10,
+                date_start=date(2025, 7, 1),
+                date_end=date(2025, 7, 8),
+                place_id=place_id,
+                tour_type="exclusive",
+                price=Decimal('1234.5'),
+                country="Poland",
+                region="Tatra",
+                city="Zakopane",
+                accommodation="Hotel",
+                profile_pic=picture,
+            )
+            TourReservation.objects.create(reservation=self.reservation, tour=tour, is_price_reduced=True)
+
+    def test_output_matches_the_model_serializers(self):
+        request = RequestFactory().get('/api/tours/')
+        context = {'request': request}
+        cases = [
+            (TourSerializer, Tour.objects.defer('search_vector')),
+            (ReservationSerializer, Reservation.objects.all()),
+            (TourReservationSerializer, TourReservation.objects.all()),
+        ]
+        for serializer_class, queryset in cases:
+            compiled = row_serializer(serializer_class, context)
+            rows = queryset.order_by('id').values(*compiled.columns)
+            expected = serializer_class(queryset.order_by('id'), many=True, context=context).data
+            self.assertEqual(compiled.serialize(rows, context), expected)
+
+        compiled = row_serializer(TourSerializer, context)
+        data = compiled.serialize(Tour.objects.order_by('id').values(*compiled.columns), context)
+        self.assertEqual(data[0]['price'], '1234.50')
+        self.assertEqual(data[0]['profile_pic'], 'http://testserver/media/profile/zakopane.jpg')
+        self.assertIsNone(data[1]['profile_pic'])
+        self.assertTrue(data[0]['updated_at'].endswith('Z'))
+
+    def test_list_endpoints_read_values_rows(self):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tours/', {'ordering': '-price'})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertNotIn('search_vector', queries[-1]['sql'])
+
+        response = self.client.get('/api/reservations/', {'aggregates': 'participants,tour_count'})
+        row = response.data['results'][0]
+        self.assertEqual((row['participants'], row['tour_count'], row['user']), (3, 2, self.user.id))
+
+        response = self.client.get('/api/tour-reservations/', {'ordering': 'tour'})
+        self.assertEqual([row['tour'] for row in response.data['results']],
+                         sorted(Tour.objects.values_list('id', flat=True)))
+
+    def test_serializers_with_nested_fields_are_not_compiled(self):
+        class NestedSerializer(drf_serializers.ModelSerializer):
+            tour = TourSerializer()
+
+            class Meta:
+                model = TourReservation
+                fields = '__all__'
+
+        self.assertFalse(RowSerializer(NestedSerializer()).supported)
+
+        compiled = RowSerializer(ReservationAggregatesSerializer(context={'aggregates': ['participants']}))
+        self.assertFalse(compiled.readable(Reservation.objects.all()))
+        self.assertTrue(compiled.readable(Reservation.objects.annotate(participants=F('amount_of_adults'))))
+
+
+import unittest
+from rest_framework.renderers import JSONRenderer as StdlibJSONRenderer
+from .renderers import JSONRenderer, MessagePackRenderer, msgpack
+
+
+class SparseFieldsTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        for place_id, price in enumerate([300, 100, 200]):
+            Tour.objects.create(
+                supervisor=self.admin,
+                max_number_of_participants=10,
+                date_start=date(2025, 7, 1),
+                date_end=date(2025, 7, 8),
+                place_id=place_id,
+                tour_type="standard",
+                price=price,
+                country="Poland",
+                region="Tatra",
+                city=f"City {place_id}",
+                accommodation="Hotel",
+            )
+        self.tour = Tour.objects.order_by('id').first()
+
+    def test_fields_narrow_the_payload_and_the_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tours/', {'fields': 'id,city,price', 'ordering': 'date_start',
+                                                       'page_size': 2})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'price', 'city'])
+        page_query = queries[-1]['sql']
+        self.assertIn('"date_start"', page_query)
+        self.assertNotIn('profile_pic', page_query)
+        self.assertNotIn('supervisor_id', page_query)
+
+        # The cursor is built from the ordering columns even though they are not returned
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+
+        response = self.client.get('/api/tours/', {'exclude': 'profile_pic,supervisor'})
+        self.assertNotIn('profile_pic', response.data['results'][0])
+        self.assertIn('updated_at', response.data['results'][0])
+
+        response = self.client.get(f'/api/tours/{self.tour.id}/', {'fields': 'city'})
+        self.assertEqual(response.json(), {'city': 'City 0'})
+
+    def test_unknown_fields_and_writes(self):
+        response = self.client.get('/api/tours/', {'fields': 'city,nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'fields': ['Unknown field: nope.']})
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/tours/{self.tour.id}/', {'fields': 'price'})
+        self.assertEqual(response.data, {'price': '300.00'})
+        response = self.client.patch(f'/api/tours/{self.tour.id}/?fields=price', {'city': 'Krakow'})
+        self.assertEqual(response.data['city'], 'Krakow')
+        self.assertIn('supervisor', response.data)
+
+        response = self.client.get('/api/users/', {'fields': 'username'})
+        self.assertEqual(response.data['results'], [{'username': 'admin'}])
+
+    def test_orjson_renderer_matches_the_stdlib_renderer(self):
+        response = self.client.get('/api/tours/', {'count': 'exact'})
+        self.assertEqual(json.loads(JSONRenderer().render(response.data)),
+                         json.loads(StdlibJSONRenderer().render(response.data)))
+        payload = {'price': Decimal('1.50'), 'day': date(2025, 7, 1), 1: 'one'}
+        self.assertEqual(json.loads(JSONRenderer().render(payload)),
+                         json.loads(StdlibJSONRenderer().render(payload)))
+
+    def test_messagepack_is_negotiated_when_installed(self):
+        response = self.client.get('/api/tours/', headers={'Accept': 'application/msgpack'})
+        if msgpack is None:
+            self.assertEqual(response.status_code, 406)
+            return
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['results'][0]['city'], 'City 0')
+
+    @unittest.skipUnless(msgpack, 'msgpack is not installed')
+    def test_messagepack_renderer_encodes_drf_types(self):
+        data = msgpack.unpackb(MessagePackRenderer().render({'price': Decimal('1.50'), 'day': date(2025, 7, 1)}))
+        self.assertEqual(data, {'price': 1.5, 'day': '2025-07-01'})
+
+
+class TokenAuthenticationTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create_user(username='owner', password='ownerpass')
+        self.other = User.objects.create_user(username='other', password='otherpass')
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        self.reservation = Reservation.objects.create(user=self.owner, amount_of_adults=1)
+
+    def login(self, username, password):
+        response = self.client.post('/login/', {'username': username, 'password': password})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def assertNoUserQuery(self, queries):
+        self.assertFalse([query['sql'] for query in queries if 'auth_user' in query['sql']])
+
+    def test_claims_authenticate_without_a_user_query(self):
+        self.login('owner', 'ownerpass')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/reservations/{self.reservation.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNoUserQuery(queries)
+
+        self.login('other', 'otherpass')
+        self.assertEqual(self.client.get(f'/api/reservations/{self.reservation.id}/').status_code, 403)
+
+        self.login('admin', 'adminpass')
+        tour = Tour.objects.create(
+            supervisor=self.admin, max_number_of_participants=10, date_start=date.today(), date_end=date.today(),
+            place_id=1, tour_type="standard", price=100, country="Poland", region="Tatra", city="Zakopane",
+            accommodation="Hotel",
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/tours/{tour.id}/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNoUserQuery(queries)
+
+    def test_register_and_refresh_keep_the_claims(self):
+        response = self.client.post('/register/', {
+            'username': 'new', 'email': 'new@example.com', 'password': 'newpass123', 'password2': 'newpass123',
+        })
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/token/refresh/', {'refresh': response.data['refresh']})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/reservations/').status_code, 200)
+        self.assertEqual(self.client.get('/api/users/').status_code, 403)
+
+    def test_refresh_follows_role_changes_and_deactivation(self):
+        refresh = self.client.post('/login/', {'username': 'admin', 'password': 'adminpass'}).data['refresh']
+        self.admin.is_staff = False
+        self.admin.save()
+        response = self.client.post('/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(self.client.get('/api/users/').status_code, 403)
+
+        self.admin.is_active = False
+        self.admin.save()
+        self.client.credentials()
+        self.assertEqual(self.client.post('/token/refresh/', {'refresh': refresh}).status_code, 401)
+        self.admin.delete()
+        self.assertEqual(self.client.post('/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+    def test_tokens_without_claims_load_the_user_through_the_cache(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.owner).access_token}')
+        self.assertEqual(self.client.get('/api/reservations/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/reservations/').status_code, 200)
+        self.assertNoUserQuery(queries)
+
+        self.owner.is_active = False
+        self.owner.save()
+        self.assertEqual(self.client.get('/api/reservations/').status_code, 401)
+
+
+from django.core.cache import cache
+
+from .throttling import local_backend, rejections, request_throttled
+
+
+class ThrottlingTest(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='booker', password='bookerpass')
+        local_backend.clear()
+        self.addCleanup(local_backend.clear)
+        self.addCleanup(cache.clear)
+
+    @override_settings(TRAVELAPP_THROTTLING={'RATES': {'login': '2/min'}})
+    def test_login_attempts_are_limited_per_address(self):
+        received = []
+
+        def receiver(**kwargs):
+            received.append((kwargs['scope'], kwargs['ident']))
+        request_throttled.connect(receiver)
+        self.addCleanup(request_throttled.disconnect, receiver)
+        rejected = rejections['login']
+
+        for _ in range(2):
+            self.assertEqual(self.client.post('/login/', {'username': 'booker', 'password': 'wrong'}).status_code, 401)
+        response = self.client.post('/login/', {'username': 'booker', 'password': 'bookerpass'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(rejections['login'], rejected + 1)
+        self.assertEqual(received, [('login', 'addr:127.0.0.1')])
+
+        other = self.client.post('/login/', {'username': 'booker', 'password': 'bookerpass'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.status_code, 200)
+
+    @override_settings(TRAVELAPP_THROTTLING={'RATES': {'catalogue': '1/min'}})
+    def test_anonymous_catalogue_reads_are_limited_in_the_event_loop(self):
+        rejected = rejections['catalogue']
+        self.assertEqual(self.client.get('/api/tours/').status_code, 200)
+        response = self.client.get('/api/tours/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('Retry-After', response)
+        self.assertEqual(rejections['catalogue'], rejected + 1)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/api/tours/').status_code, 200)
+
+    @override_settings(TRAVELAPP_THROTTLING={'RATES': {'booking': '1/min'}})
+    def test_booking_scope_only_limits_writes(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/reservations/').status_code, 200)
+        reservation = Reservation.objects.create(user=self.user, amount_of_adults=1)
+        url = f'/api/reservations/{reservation.id}/'
+        self.assertEqual(self.client.patch(url, {'amount_of_adults': 2}).status_code, 200)
+        self.assertEqual(self.client.patch(url, {'amount_of_adults': 3}).status_code, 429)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(TRAVELAPP_THROTTLING={'RATES': {'catalogue': '2/min', 'booking': '1/min'}})
+    def test_graphql_operations_count_against_their_scope(self):
+        def post(body):
+            return self.client.post('/graphql/', body, content_type='application/json')
+
+        query = {'query': '{ allTours { city } }'}
+        mutation = {'query': 'mutation { deleteTour(id: 0) { success } }'}
+        self.assertEqual(post(query).status_code, 200)
+        self.assertEqual(post(mutation).status_code, 200)
+        response = post(mutation)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertIn('throttled', response.json()['errors'][0]['message'])
+
+        # Each operation of a batch counts, and none runs when one is over
+        response = post([query, query])
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(post(query).status_code, 429)
+
+    @override_settings(TRAVELAPP_THROTTLING={'RATES': {'login': '2/min'}, 'SHARED_BACKEND': 'default'})
+    def test_shared_backend_counts_in_the_cache(self):
+        statuses = [
+            self.client.post('/login/', {'username': 'booker', 'password': 'bookerpass'}).status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertFalse(local_backend._buckets)
+
+
+from rest_framework.test import APIClient
+from . import instrumentation
+
+
+class InstrumentationTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        Tour.objects.create(
+            supervisor=self.admin, max_number_of_participants=10, date_start=date.today(), date_end=date.today(),
+            place_id=1, tour_type="standard", price=100, country="Poland", region="Tatra", city="Zakopane",
+            accommodation="Hotel",
+        )
+        for histogram in instrumentation.HISTOGRAMS:
+            histogram.clear()
+        instrumentation.budget_overruns.clear()
+
+    def metric(self, name, route, method='GET'):
+        content = self.client.get('/metrics/').content.decode()
+        prefix = f'{name}{{route="{route}",method="{method}"}} '
+        values = [line[len(prefix):] for line in content.splitlines() if line.startswith(prefix)]
+        return float(values[0]) if values else None
+
+    def test_metrics_expose_histograms_per_route(self):
+        self.client.get('/api/tours/')
+        self.client.get('/api/tours/')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        content = response.content.decode()
+        self.assertIn('# TYPE travelapp_request_duration_seconds histogram', content)
+        self.assertIn('travelapp_request_duration_seconds_bucket{route="tour-list",method="GET",le="+Inf"} 2', content)
+        self.assertEqual(self.metric('travelapp_request_queries_count', 'tour-list'), 2)
+        self.assertGreater(self.metric('travelapp_request_queries_sum', 'tour-list'), 0)
+        self.assertGreater(self.metric('travelapp_request_serializer_duration_seconds_sum', 'tour-list'), 0)
+
+    def test_graphql_requests_are_named_after_the_operation(self):
+        self.client.post('/graphql/', {'query': 'query Tours { allTours { id } }',
+                                       'operationName': 'Tours'}, format='json')
+        self.assertEqual(self.metric('travelapp_request_duration_seconds_count', 'graphql:Tours', 'POST'), 1)
+
+    @override_settings(TRAVELAPP_INSTRUMENTATION={'QUERY_BUDGETS': {'tour-list': 1}})
+    def test_requests_over_budget_are_logged_and_counted(self):
+        with self.assertLogs('TravelApp.instrumentation', 'WARNING') as logs:
+            self.client.get('/api/tours/')
+        self.assertIn('over its budget of 1', logs.output[0])
+        self.assertEqual(self.metric('travelapp_query_budget_exceeded_total', 'tour-list'), 1)
+
+    @override_settings(TRAVELAPP_INSTRUMENTATION={'QUERY_BUDGETS': {'tour-list': 1}})
+    def test_budget_mixin_fails_the_test(self):
+        class Over(instrumentation.QueryBudgetTestMixin, unittest.TestCase):
+            def setUp(self):
+                super().setUp()
+                self.client = APIClient()
+
+            def test_list(self):
+                self.client.get('/api/tours/')
+
+        result = unittest.TestResult()
+        with self.assertLogs('TravelApp.instrumentation', 'WARNING'):
+            Over('test_list').run(result)
+        self.assertEqual(len(result.failures), 1)
+        self.assertIn('GET tour-list', result.failures[0][1])
+
+    def test_metrics_are_limited_to_allowed_addresses(self):
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='10.0.0.9').status_code, 403)
+
+
+from django.db.models import Count, Sum
+from django.test import LiveServerTestCase
+from .schema import Query
+
+
+def seed_benchmark(**options):
+    call_command('seed_benchmark', users=20, tours=50, reservations=200, stdout=StringIO(), **options)
+
+
+class BenchmarkSuiteTest(TestCase):
+    def test_seed_is_skewed_within_capacity_and_reproducible(self):
+        seed_benchmark(seed=0.1)
+        tours = Tour.objects.filter(supervisor__username='bench-admin').order_by('id')
+        prices = list(tours.values_list('price', flat=True))
+        self.assertEqual(len(prices), 50)
+        self.assertEqual(TourStats.objects.filter(tour__in=tours).count(), 50)
+        self.assertFalse(tours.filter(seats_taken__gt=F('max_number_of_participants')).exists())
+        for tour in tours.annotate(booked=Sum('reservation_links__seats')):
+            self.assertEqual(tour.seats_taken, tour.booked or 0)
+        # The first users hold most reservations
+        counts = sorted(Reservation.objects.filter(user__username__startswith='bench-user-')
+                        .values('user').annotate(n=Count('id')).values_list('n', flat=True), reverse=True)
+        self.assertGreater(counts[0], 200 / 20 * 3)
+
+        links = TourReservation.objects.filter(tour__in=tours).count()
+        seed_benchmark(seed=0.1)
+        self.assertEqual(list(tours.values_list('price', flat=True)), prices)
+        self.assertEqual(TourReservation.objects.filter(tour__in=tours).count(), links)
+
+        seed_benchmark(flush=True)
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+        self.assertFalse(tours.exists())
+
+    def test_micro_benchmarks_cover_every_serializer_and_resolver(self):
+        seed_benchmark()
+        out = StringIO()
+        call_command('run_benchmarks', rows=20, repeat=1, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual([entry['field'] for entry in result['resolvers']], list(Query._meta.fields))
+        self.assertIn('TourSerializer', [entry['serializer'] for entry in result['serializers']])
+        self.assertEqual(result['meta']['rows']['TravelApp.Tour'], 50)
+
+    def test_micro_benchmarks_need_the_dataset(self):
+        with self.assertRaises(CommandError):
+            call_command('run_benchmarks', stdout=StringIO())
+
+
+@override_settings(TRAVELAPP_THROTTLING={'RATES': {}})
+class LoadScenarioTest(LiveServerTestCase):
+    def test_scenario_reports_latency_and_queries_per_endpoint(self):
+        seed_benchmark()
+        out = StringIO()
+        call_command('load_scenario', self.live_server_url, iterations=12, concurrency=2,
+                     mix='browse=3,booking=1,export=1', stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result['scenario']['mix'], {'browse': 3, 'booking': 1, 'export': 1})
+        tour_list = result['endpoints']['GET tour-list']
+        self.assertEqual(tour_list['errors'], 0)
+        self.assertEqual(set(tour_list['statuses']), {'200'})
+        self.assertLessEqual(tour_list['p50_ms'], tour_list['p99_ms'])
+        self.assertIsNotNone(tour_list['queries_per_request'])
+        self.assertEqual(set(result['endpoints']['GET reservation-export']['statuses']), {'200'})
+
+
+class GraphQLCostTest(TestCase):
+    deep_query = """
+    query { allTours { ...Supervisor } }
+    fragment Supervisor on TourType {
+        supervisor { reservations { tourLinks { tour { supervisor { reservations { tourLinks { tour { id } } } } } } } }
+    }
+    """
+
+    def setUp(self):
+        admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        Tour.objects.create(
+            supervisor=admin, max_number_of_participants=10, date_start=date.today(), date_end=date.today(),
+            place_id=1, tour_type="standard", price=100, country="Poland", region="Tatra", city="Zakopane",
+            accommodation="Hotel",
+        )
+
+    def post(self, query, variables=None):
+        return self.client.post('/graphql/', {'query': query, 'variables': variables}, content_type='application/json')
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post('{ tours(first: 5) { edges { node { city } } } }')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['tours']['edges'], [{'node': {'city': 'Zakopane'}}])
+        self.assertEqual(response.json()['extensions']['cost'],
+                         {'cost': 11, 'maxCost': 5_000, 'depth': 3, 'maxDepth': 8})
+
+    def test_page_sizes_come_from_variables_and_are_capped(self):
+        query = 'query($n: Int) { tours(first: $n) { edges { node { city supervisor { username } } } } }'
+        self.assertEqual(self.post(query, {'n': 10}).json()['extensions']['cost']['cost'], 1 + 10 * 3)
+        self.assertEqual(self.post(query, {'n': 10_000}).json()['extensions']['cost']['cost'], 1 + 100 * 3)
+        # Lists without a page size use LIST_SIZES
+        self.assertEqual(self.post('{ allTours { city } }').json()['extensions']['cost']['cost'], 100)
+
+    @override_settings(TRAVELAPP_GRAPHQL_COST={'MAX_COST': 50})
+    def test_costly_operations_are_rejected_before_they_run(self):
+        with self.assertNumQueries(0):
+            response = self.post('{ allTours { city } }')
+        self.assertEqual(response.status_code, 400)
+        error = response.json()['errors'][0]
+        self.assertEqual(error['message'], 'Query cost 100 exceeds the maximum of 50.')
+        self.assertEqual(error['extensions']['code'], 'QUERY_TOO_COSTLY')
+        self.assertNotIn('data', response.json())
+
+    def test_deep_operations_are_rejected_through_fragments(self):
+        response = self.post(self.deep_query)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'QUERY_TOO_DEEP')
+        self.assertEqual(response.json()['extensions']['cost']['depth'], 9)
+
+    def test_only_the_selected_operation_is_estimated(self):
+        response = self.client.post('/graphql/', {
+            'query': self.deep_query.replace('query {', 'query Deep {') + 'query Shallow { allTours { id } }',
+            'operationName': 'Shallow',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['extensions']['cost']['depth'], 1)
+
+    def test_introspection_is_free(self):
+        response = self.post('{ __schema { types { name fields { name type { ofType { ofType { name } } } } } } }')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['extensions']['cost']['cost'], 0)
+
+
+import hashlib
+from django.core.exceptions import ImproperlyConfigured
+from graphql import specified_rules
+from . import documents
+
+
+class PersistedQueryTest(TestCase):
+    query = '{ allTours { city } }'
+    hash = hashlib.sha256(query.encode()).hexdigest()
+
+    def setUp(self):
+        admin = User.objects.create_user(username='admin', password='adminpass', is_staff=True)
+        Tour.objects.create(
+            supervisor=admin, max_number_of_participants=10, date_start=date.today(), date_end=date.today(),
+            place_id=1, tour_type="standard", price=100, country="Poland", region="Tatra", city="Zakopane",
+            accommodation="Hotel",
+        )
+        documents.registry.clear()
+        documents.document_cache.clear()
+
+    def post(self, query=None, hash=None):
+        body = {'query': query} if query else {}
+        if hash:
+            body['extensions'] = {'persistedQuery': {'version': 1, 'sha256Hash': hash}}
+        return self.client.post('/graphql/', body, content_type='application/json')
+
+    def allow_list(self, documents):
+        manifest = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        self.addCleanup(os.unlink, manifest.name)
+        with manifest:
+            json.dump(documents, manifest)
+        return manifest.name
+
+    def test_documents_are_registered_then_sent_by_hash(self):
+        response = self.post(hash=self.hash)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+        response = self.post(self.query, self.hash)
+        self.assertEqual(response.json()['data'], {'allTours': [{'city': 'Zakopane'}]})
+        response = self.post(hash=self.hash)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'allTours': [{'city': 'Zakopane'}]})
+
+        extensions = json.dumps({'persistedQuery': {'version': 1, 'sha256Hash': self.hash}})
+        response = self.client.get('/graphql/', {'extensions': extensions}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['data'], {'allTours': [{'city': 'Zakopane'}]})
+
+    def test_hash_must_match_the_document(self):
+        response = self.post('{ allTours { id } }', self.hash)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_HASH_MISMATCH')
+        self.assertIsNone(documents.registry.get(self.hash))
+
+    def test_only_runnable_documents_are_registered(self):
+        invalid = '{ allTours { nope } }'
+        costly = '{ allTours { reservationLinks { reservation { user { username } } } } }'
+        with self.settings(TRAVELAPP_GRAPHQL_COST={'MAX_COST': 10}):
+            for query in (invalid, '{ allTours {', costly):
+                hash = hashlib.sha256(query.encode()).hexdigest()
+                response = self.post(query, hash)
+                self.assertEqual(response.status_code, 400)
+                self.assertIsNone(documents.registry.get(hash))
+            self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'QUERY_TOO_COSTLY')
+
+        with self.settings(TRAVELAPP_GRAPHQL_DOCUMENTS={'MAX_DOCUMENT_LENGTH': 10}):
+            response = self.post(self.query, self.hash)
+        self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'QUERY_TOO_LARGE')
+        self.assertIsNone(documents.registry.get(self.hash))
+
+    def test_documents_are_parsed_and_validated_once(self):
+        schema_ = schema.graphql_schema
+        rules = tuple(specified_rules)
+        document, errors = documents.validated_document(schema_, self.query, rules)
+        self.assertEqual(errors, [])
+        self.assertIs(documents.validated_document(schema_, self.query, rules)[0], document)
+
+        _, errors = documents.validated_document(schema_, '{ allTours { nope } }', rules)
+        self.assertEqual(len(errors), 1)
+        self.assertIs(documents.validated_document(schema_, '{ allTours { nope } }', rules)[1], errors)
+        response = self.post('{ allTours { nope } }')
+        self.assertEqual(response.status_code, 400)
+
+    def test_allow_list_only(self):
+        path = self.allow_list({self.hash: self.query})
+        with self.settings(TRAVELAPP_GRAPHQL_DOCUMENTS={'ALLOW_LIST': path, 'ALLOW_LIST_ONLY': True}):
+            self.assertEqual(self.post(hash=self.hash).json()['data'], {'allTours': [{'city': 'Zakopane'}]})
+            self.assertEqual(self.post(self.query).json()['data'], {'allTours': [{'city': 'Zakopane'}]})
+
+            other = '{ allTours { id } }'
+            for response in (self.post(other), self.post(other, hashlib.sha256(other.encode()).hexdigest())):
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_ALLOWED')
+                self.assertNotIn('data', response.json())
+
+    def test_allow_list_hashes_are_checked(self):
+        path = self.allow_list({'0' * 64: self.query})
+        with self.settings(TRAVELAPP_GRAPHQL_DOCUMENTS={'ALLOW_LIST': path}):
+            with self.assertRaises(ImproperlyConfigured):
+                self.post(hash=self.hash)
+
+
+from django.db import DatabaseError
+from .async_views import read_snapshot
+
+
+class GraphQLBatchedRequestTest(TestCase):
+    links = '{ allTourReservations { tour { tourType supervisor { username } } } }'
+
+    def setUp(self):
+        supervisor = User.objects.create_user(username='guide', password='guidepass')
+        self.tour = Tour.objects.create(
+            supervisor=supervisor, max_number_of_participants=10, date_start=date.today(), date_end=date.today(),
+            place_id=1, tour_type="standard", price=100, country="Poland", region="Tatra", city="Zakopane",
+            accommodation="Hotel",
+        )
+        reservation = Reservation.objects.create(user=supervisor, amount_of_adults=1)
+        TourReservation.objects.create(reservation=reservation, tour=self.tour)
+
+    def post(self, body):
+        return self.client.post('/graphql/', body, content_type='application/json')
+
+    def test_operations_share_the_relation_loaders(self):
+        with self.assertNumQueries(2):
+            response = self.post([
+                {'id': 1, 'query': self.links},
+                {'id': 2, 'query': 'query($id: Int) { tour(id: $id) { supervisor { username } } }',
+                 'variables': {'id': self.tour.id}},
+            ])
+        self.assertEqual(response.status_code, 200)
+        first, second = response.json()
+        self.assertEqual((first['id'], first['status']), (1, 200))
+        self.assertEqual(first['data']['allTourReservations'][0]['tour']['supervisor'], {'username': 'guide'})
+        self.assertEqual(second['data'], {'tour': {'supervisor': {'username': 'guide'}}})
+        self.assertIn('cost', second['extensions'])
+
+        response = self.post([{'query': '{ allTours { id } }'}, {'query': '{ allReservations { id } }'}])
+        loaders = response.wsgi_request.relation_loaders
+        self.assertEqual({model for model, objects in loaders._objects.items() if objects}, {Tour, Reservation})
+
+    def test_operations_after_a_mutation_load_afresh(self):
+        response = self.post([
+            {'query': self.links},
+            {'query': f'mutation {{ updateTour(id: {self.tour.id}, tourType: "exclusive") {{ tour {{ id }} }} }}'},
+            {'query': self.links},
+        ])
+        types = [entry['data']['allTourReservations'][0]['tour']['tourType'] for entry in response.json()[::2]]
+        self.assertEqual(types, ['STANDARD', 'EXCLUSIVE'])
+
+        response = self.post([{'query': self.links},
+                              {'query': 'mutation { deleteTour(id: 0) { success } }'}])
+        self.assertIsNone(response.wsgi_request.relation_loaders)
+
+    def test_batch_size_is_limited(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        response = self.post([{'query': '{ allTours { id } }'}] * 11)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['message'], 'A batch must hold 1 to 10 operations.')
+        self.assertEqual(self.post(['{ allTours { id } }']).status_code, 400)
+
+
+class GraphQLBatchSnapshotTest(TransactionTestCase):
+    def post(self, body):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/graphql/', body, content_type='application/json')
+        return response, [query['sql'] for query in queries]
+
+    def test_queries_read_one_snapshot(self):
+        response, sql = self.post([{'query': '{ allTours { id } }'}, {'query': '{ allReservations { id } }'}])
+        self.assertEqual(response.status_code, 200)
+        # Before the first read of the transaction
+        snapshot = sql.index('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        self.assertFalse([query for query in sql[:snapshot] if query.startswith('SELECT')])
+
+        _, sql = self.post([{'query': '{ allTours { id } }'},
+                            {'query': 'mutation { deleteTour(id: 0) { success } }'}])
+        self.assertNotIn('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY', sql)
+        _, sql = self.post({'query': '{ allTours { id } }'})
+        self.assertNotIn('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY', sql)
+
+    def test_snapshot_is_read_only(self):
+        with self.assertRaises(DatabaseError):
+            with read_snapshot():
+                User.objects.create(username='writer')
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import Signal
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULT_CONFIG = {
+    'RATES': {
+        'login': '10/min',
+        'register': '20/hour',
+        'catalogue': '600/min',
+        'booking': '60/min',
+    },
+    'LOCAL_MAXSIZE': 10_000,
+    'SHARED_BACKEND': None,
+}
+
+
+def get_config():
+    return {**DEFAULT_CONFIG, **getattr(settings, 'TRAVELAPP_THROTTLING', {})}
+
+
+def parse_rate(rate):
+    """``'600/min'`` as ``(600, 60)``; DRF's rate format, the period's first letter counts."""
+    count, period = rate.split('/')
+    return int(count), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+class LocalBackend:
+    """
+    Token buckets in this process: ``count`` tokens, refilled evenly over
+    ``period``. Enough for a single worker; the least recently used buckets
+    are dropped past ``LOCAL_MAXSIZE``, which only ever refills them.
+    """
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, count, period):
+        now = time.monotonic()
+        refill = count / period
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (count, now))
+            tokens = min(count, tokens + (now - stamp) * refill)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / refill
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > get_config()['LOCAL_MAXSIZE']:
+                self._buckets.popitem(last=False)
+        return wait
+
+    async def ahit(self, key, count, period):
+        return self.hit(key, count, period)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SharedBackend:
+    """
+    Sliding-window counters in a ``CACHES`` alias shared by all workers
+    (Redis, memcached, or a file cache for several workers on one host).
+
+    Each window is an atomic ``incr``; the previous window is weighted by how
+    much of it still overlaps the sliding window.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def keys(self, key, period):
+        now = time.time()
+        window = int(now // period)
+        return f'travelapp:throttle:{key}:{window}', f'travelapp:throttle:{key}:{window - 1}', now % period
+
+    def estimate(self, current, previous, elapsed, count, period):
+        weight = 1 - elapsed / period
+        if previous * weight + current <= count:
+            return 0
+        if current > count or not previous:
+            return period - elapsed
+        # When enough of the previous window has slid out
+        return period * (1 - (count - current) / previous) - elapsed
+
+    def hit(self, key, count, period):
+        current_key, previous_key, elapsed = self.keys(key, period)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            current = 1 if self.cache.add(current_key, 1, timeout=2 * period) else self.cache.incr(current_key)
+        return self.estimate(current, self.cache.get(previous_key, 0), elapsed, count, period)
+
+    async def ahit(self, key, count, period):
+        current_key, previous_key, elapsed = self.keys(key, period)
+        try:
+            current = await self.cache.aincr(current_key)
+        except ValueError:
+            added = await self.cache.aadd(current_key, 1, timeout=2 * period)
+            current = 1 if added else await self.cache.aincr(current_key)
+        return self.estimate(current, await self.cache.aget(previous_key, 0), elapsed, count, period)
+
+
+local_backend = LocalBackend()
+
+
+def get_backend():
+    alias = get_config()['SHARED_BACKEND']
+    return SharedBackend(alias) if alias else local_backend
+
+
+# Sent for every rejected request, with ``scope``, ``ident`` and ``wait``
+request_throttled = Signal()
+
+rejections = Counter()
+_rejections_lock = threading.Lock()
+
+
+class ScopedThrottle(BaseThrottle):
+    """
+    Per-client limits for the scope a view declares.
+
+    ``throttle_scope`` covers every method; ``read_throttle_scope`` and
+    ``write_throttle_scope`` cover safe and unsafe methods only. Clients are
+    told apart by user id when authenticated, by address otherwise. Views
+    without a scope, or scopes without a rate, are not limited.
+    """
+
+    def get_scope(self, request, view):
+        if request.method in SAFE_METHODS:
+            scope = getattr(view, 'read_throttle_scope', None)
+        else:
+            scope = getattr(view, 'write_throttle_scope', None)
+        return scope or getattr(view, 'throttle_scope', None)
+
+    def get_ident(self, request):
+        user = request.user
+        if user.is_authenticated:
+            return f'user:{user.id}'
+        return f'addr:{super().get_ident(request)}'
+
+    def prepare(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = get_config()['RATES'].get(scope) if scope else None
+        if rate is None:
+            return None
+        self.scope = scope
+        self.ident = self.get_ident(request)
+        return (f'{scope}:{self.ident}', *parse_rate(rate))
+
+    def allow_request(self, request, view):
+        hit = self.prepare(request, view)
+        if hit is None:
+            return True
+        return self.finish(get_backend().hit(*hit), view)
+
+    async def aallow_request(self, request, view):
+        hit = self.prepare(request, view)
+        if hit is None:
+            return True
+        return self.finish(await get_backend().ahit(*hit), view)
+
+    def finish(self, wait, view):
+        self.wait_seconds = wait
+        if not wait:
+            return True
+        with _rejections_lock:
+            rejections[self.scope] += 1
+        request_throttled.send(sender=type(view), scope=self.scope, ident=self.ident, wait=wait)
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+async def acheck_throttles(view, request):
+    """``APIView.check_throttles`` for views answered in the event loop."""
+    durations = []
+    for throttle in view.get_throttles():
+        if hasattr(throttle, 'aallow_request'):
+            allowed = await throttle.aallow_request(request, view)
+        else:
+            allowed = throttle.allow_request(request, view)
+        if not allowed:
+            durations.append(throttle.wait())
+    if durations:
+        durations = [duration for duration in durations if duration is not None]
+        view.throttled(request, max(durations, default=None))
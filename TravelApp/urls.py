@@ -1,8 +1,9 @@
 from django.urls import path
-from . import views
+from . import async_views, views, exports, instrumentation
 
 urlpatterns = [
-    path('', views.ApiRoot.as_view(), name='api-root'),
+    path('', async_views.ApiRoot.as_view(), name='api-root'),
+    path('metrics/', instrumentation.metrics, name='metrics'),
 
     path('register/', views.RegisterAPIView.as_view(), name='register'),
     path('login/', views.LoginAPIView.as_view(), name='login'),
@@ -12,11 +13,16 @@ urlpatterns = [
     path('api/users/<int:pk>/', views.UserDetail.as_view(), name='user-detail'),
 
     path('api/reservations/', views.ReservationList.as_view(), name='reservation-list'),
+    path('api/reservations/export/', exports.ReservationExport.as_view(), name='reservation-export'),
     path('api/reservations/<int:pk>/', views.ReservationDetail.as_view(), name='reservation-detail'),
 
-    path('api/tours/', views.TourList.as_view(), name='tour-list'),
-    path('api/tours/<int:pk>/', views.TourDetail.as_view(), name='tour-detail'),
+    path('api/tours/', async_views.TourList.as_view(), name='tour-list'),
+    path('api/tours/search/', views.TourSearch.as_view(), name='tour-search'),
+    path('api/tours/<int:pk>/', async_views.TourDetail.as_view(), name='tour-detail'),
+    path('api/tours/<int:pk>/stats/', views.TourStatsDetail.as_view(), name='tour-stats'),
+    path('api/tours/<int:pk>/manifest/', exports.TourManifest.as_view(), name='tour-manifest'),
 
     path('api/tour-reservations/', views.TourReservationList.as_view(), name='tourreservation-list'),
+    path('api/tour-reservations/export/', exports.TourReservationExport.as_view(), name='tourreservation-export'),
     path('api/tour-reservations/<int:pk>/', views.TourReservationDetail.as_view(), name='tourreservation-detail'),
 ]
\ No newline at end of file
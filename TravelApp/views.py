@@ -1,37 +1,43 @@
 from rest_framework import generics, filters
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import User, Reservation, Tour, TourReservation
+from .models import User, Reservation, Tour, TourReservation, TourStats
+from .filters import TourFilter
 from .serializers import ReservationSerializer, TourSerializer, TourReservationSerializer, RegisterSerializer, \
-    UserSerializer
+    UserSerializer, ReservationAggregatesSerializer, TourStatsSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.reverse import reverse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Count
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from .permissions import IsReservedOrAdmin
+from .authentication import TokenObtainPairSerializer, TokenRefreshSerializer, tokens_for
+from .pagination import StandardResultsSetPagination, KeysetPagination
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .rows import ValuesListMixin
+from .sparse import SparseFieldsMixin
+from .bulk import BulkListMixin, create_tours, create_tour_reservations
+from . import search
 from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 
 
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-
-
 class LoginAPIView(TokenObtainPairView):
     permission_classes = [AllowAny]
-    serializer_class = TokenObtainPairView.serializer_class
+    serializer_class = TokenObtainPairSerializer
+    throttle_scope = 'login'
 
 
 class TokenRefreshAPIView(TokenRefreshView):
     permission_classes = [AllowAny]
+    serializer_class = TokenRefreshSerializer
 
 
-class UserList(generics.ListCreateAPIView):
+class UserList(SparseFieldsMixin, generics.ListCreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = StandardResultsSetPagination
@@ -41,51 +47,98 @@ class UserList(generics.ListCreateAPIView):
     name = 'user-list'
 
 
-class UserDetail(generics.RetrieveUpdateDestroyAPIView):
+class UserDetail(SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
     name = 'user-detail'
 
 
-class ReservationList(generics.ListCreateAPIView):
-    queryset = Reservation.objects.annotate(num_characters=Count('user')).all()
-    # queryset = Reservation.objects.all()
+class ReservationList(ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
+    queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     ordering_fields = ['date_of_reservation']
     filterset_fields = ['user', 'is_confirmed', 'is_active']
     permission_classes = [IsAuthenticated]
     name = 'reservation-list'
-
-
-class ReservationDetail(generics.RetrieveUpdateDestroyAPIView):
+    write_throttle_scope = 'booking'
+    # Computed only for ?aggregates=participants,tour_count, per row and without a GROUP BY
+    aggregates = {
+        'participants': F('amount_of_adults') + F('amount_of_children'),
+        'tour_count': Coalesce(
+            Subquery(
+                TourReservation.objects.filter(reservation=OuterRef('pk'))
+                .order_by()
+                .values('reservation')
+                .annotate(count=Count('*'))
+                .values('count')
+            ),
+            0,
+        ),
+    }
+
+    def get_aggregates(self):
+        requested = self.request.query_params.get('aggregates', '').split(',')
+        return [name for name in requested if name in self.aggregates]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            queryset = queryset.annotate(**{name: self.aggregates[name] for name in self.get_aggregates()})
+        return queryset
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self.get_aggregates():
+            return ReservationAggregatesSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['aggregates'] = self.get_aggregates()
+        return context
+
+    def get_row_serializer_key(self):
+        return tuple(self.get_aggregates())
+
+    def get_validator_fingerprint(self):
+        if 'tour_count' not in self.get_aggregates():
+            return ()
+        # Link changes alter tour_count without touching the reservation rows
+        return tuple(TourReservation.objects.aggregate(Max('updated_at'), Count('pk')).values())
+
+
+class ReservationDetail(ConditionalGetMixin, SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
     permission_classes = [IsReservedOrAdmin]
     name = 'reservation-detail'
+    write_throttle_scope = 'booking'
 
 
-class TourList(generics.ListCreateAPIView):
-    queryset = Tour.objects.all()
+class TourList(BulkListMixin, CachedResponseMixin, ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
+    queryset = Tour.objects.defer('search_vector')
     serializer_class = TourSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     ordering_fields = ['price', 'date_start']
-    filterset_fields = ['tour_type', 'country', 'is_active']
+    filterset_class = TourFilter
     name = 'tour-list'
+    read_throttle_scope = 'catalogue'
+    bulk_create = staticmethod(create_tours)
 
     def get_permissions(self):
-        if self.request.method == 'POST':
+        if self.request.method in ['POST', 'PATCH', 'DELETE']:
             return [IsAdminUser()]
         return [AllowAny()]
 
 
-class TourDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Tour.objects.all()
+class TourDetail(CachedResponseMixin, ConditionalGetMixin, SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Tour.objects.defer('search_vector')
     serializer_class = TourSerializer
     name = 'tour-detail'
+    read_throttle_scope = 'catalogue'
 
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH', 'DELETE']:
@@ -93,32 +146,83 @@ class TourDetail(generics.RetrieveUpdateDestroyAPIView):
         return [AllowAny()]
 
 
-class TourReservationList(generics.ListCreateAPIView):
+class TourStatsDetail(SparseFieldsMixin, generics.RetrieveAPIView):
+    queryset = TourStats.objects.all()
+    serializer_class = TourStatsSerializer
+    permission_classes = [IsAdminUser]
+    name = 'tour-stats'
+
+
+class TourSearch(CachedResponseMixin, SparseFieldsMixin, generics.ListAPIView):
+    queryset = Tour.objects.defer('search_vector')
+    serializer_class = TourSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TourFilter
+    permission_classes = [AllowAny]
+    name = 'tour-search'
+    read_throttle_scope = 'catalogue'
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.search, request, *args, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'q': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = int(request.query_params.get('page_size', StandardResultsSetPagination.page_size))
+        except ValueError:
+            return Response({'detail': 'page and page_size must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(max(page_size, 1), KeysetPagination().max_page_size)
+
+        matches = search.matching(self.filter_queryset(self.get_queryset()), text)
+        # The facet query's grand total doubles as the result count
+        facets, count = search.facet_counts(matches)
+        offset = (page - 1) * page_size
+        tours = search.ranked(matches, text)[offset:offset + page_size]
+        return Response({
+            'count': count,
+            'next': replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+            if offset + page_size < count else None,
+            'previous': replace_query_param(request.build_absolute_uri(), 'page', page - 1) if page > 1 else None,
+            'facets': facets,
+            'results': self.get_serializer(tours, many=True).data,
+        })
+
+
+class TourReservationList(BulkListMixin, ConditionalGetMixin, ValuesListMixin, generics.ListCreateAPIView):
     queryset = TourReservation.objects.all()
     serializer_class = TourReservationSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     ordering_fields = ['reservation', 'tour']
     filterset_fields = ['is_price_reduced', 'is_active']
     permission_classes = [IsAuthenticated]
     name = 'tourreservation-list'
+    write_throttle_scope = 'booking'
+    bulk_create = staticmethod(create_tour_reservations)
+    # Moving links between tours or reservations needs per-link seat moves
+    bulk_update_fields = ['is_price_reduced', 'is_active']
 
 
-class TourReservationDetail(generics.RetrieveUpdateDestroyAPIView):
+class TourReservationDetail(ConditionalGetMixin, SparseFieldsMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = TourReservation.objects.all()
     serializer_class = TourReservationSerializer
     permission_classes = [IsAuthenticated]
     name = 'tourreservation-detail'
+    write_throttle_scope = 'booking'
 
 
 class RegisterAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'register'
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for(user)
             return Response({
                 'user': RegisterSerializer(user).data,
                 'refresh': str(refresh),
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework_simplejwt',
     'TravelApp',
     'rest_framework',
@@ -51,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its latency covers every other middleware
+    'TravelApp.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -128,17 +131,131 @@ USE_I18N = True
 USE_TZ = True
 
 REST_FRAMEWORK = {
+    # Tried in order: bearer tokens first, so API clients never reach the
+    # session lookup or Basic auth's password hashing
     'DEFAULT_AUTHENTICATION_CLASSES': (
-
+        'TravelApp.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
         ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # orjson and msgpack are optional; without them JSON uses the stdlib
+    # encoder and MessagePack is not offered
+    'DEFAULT_RENDERER_CLASSES': [
+        'TravelApp.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'TravelApp.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS': 'TravelApp.renderers.ContentNegotiation',
+    # Limits views that declare a throttle scope, see TRAVELAPP_THROTTLING
+    'DEFAULT_THROTTLE_CLASSES': [
+        'TravelApp.throttling.ScopedThrottle',
+    ],
+}
+
+# Upper bound for ?page_size= on keyset-paginated lists
+TRAVELAPP_MAX_PAGE_SIZE = 100
+
+# Anonymous tour catalogue responses. Point SHARED_BACKEND at a CACHES alias
+# shared by all workers when running more than one process: without it writes
+# from other workers or management commands are only seen once LOCAL_TIMEOUT
+# expires, and setting LOCAL_TIMEOUT to None turns the cache off.
+TRAVELAPP_RESPONSE_CACHE = {
+    'LOCAL_MAXSIZE': 1024,
+    'LOCAL_TIMEOUT': 5,
+    'SHARED_BACKEND': None,
+    'TIMEOUT': 300,
+}
+
+# Access tokens carry is_staff/is_superuser claims and authenticate without a
+# User query; tokens without them load the user through a per-process cache
+SIMPLE_JWT = {
+    'TOKEN_USER_CLASS': 'TravelApp.authentication.TokenUser',
+}
+
+TRAVELAPP_AUTHENTICATION = {
+    'STATELESS_TOKENS': True,
+    'USER_CACHE_TTL': 60,
+    'USER_CACHE_MAXSIZE': 1024,
+}
+
+# Per-client rates for each throttle scope. Counters are token buckets in each
+# process; point SHARED_BACKEND at a CACHES alias (Redis, memcached) to share
+# sliding-window counters between workers. Each GraphQL operation counts as a
+# booking (mutations) or a catalogue read (everything else).
+TRAVELAPP_THROTTLING = {
+    'RATES': {
+        'login': '10/min',
+        'register': '20/hour',
+        'catalogue': '600/min',
+        'booking': '60/min',
+    },
+    'LOCAL_MAXSIZE': 10_000,
+    'SHARED_BACKEND': None,
+}
+
+# Request metrics served at /metrics/. A request running more queries than its
+# route's budget is logged; QueryBudgetTestMixin turns that into a test failure.
+TRAVELAPP_INSTRUMENTATION = {
+    'QUERY_BUDGETS': {
+        'login': 1,
+        'register': 2,
+        'token_refresh': 1,
+        'user-list': 2,
+        'reservation-list': 4,
+        'reservation-detail': 12,
+        'tour-list': 6,
+        'tour-detail': 3,
+        'tour-search': 3,
+        'tour-stats': 1,
+        'tourreservation-list': 8,
+        'tourreservation-detail': 8,
+    },
+    'DEFAULT_QUERY_BUDGET': None,
+    'METRICS_ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'MAX_SERIES': 500,
 }
 
+# GraphQL operations estimated to cost more than MAX_COST, or nesting object
+# fields deeper than MAX_DEPTH, are rejected before they run. A list field
+# multiplies its selections' cost by first/last, or by its LIST_SIZES entry.
+# A batch holds at most MAX_BATCH_SIZE operations, each checked on its own.
+TRAVELAPP_GRAPHQL_COST = {
+    'MAX_COST': 5_000,
+    'MAX_DEPTH': 8,
+    'MAX_BATCH_SIZE': 10,
+    'DEFAULT_LIST_SIZE': 20,
+    'LIST_SIZES': {
+        'Query.allReservations': 100,
+        'Query.allTours': 100,
+        'Query.allTourReservations': 100,
+    },
+    'FIELD_WEIGHTS': {
+        'Query.searchTours': 10,
+    },
+}
+
+# Parsed and validated GraphQL documents are cached per process. Clients may
+# send a document's SHA-256 hash instead of its text once it is registered
+# (automatic persisted queries); with ALLOW_LIST_ONLY only the documents in the
+# ALLOW_LIST manifest ({hash: document} JSON) run. Documents are registered only
+# once they have been validated and passed the cost check.
+TRAVELAPP_GRAPHQL_DOCUMENTS = {
+    'DOCUMENT_CACHE_MAXSIZE': 512,
+    'MAX_DOCUMENT_LENGTH': 20_000,
+    'REGISTRY_MAXSIZE': 1024,
+    'SHARED_BACKEND': None,
+    'SHARED_TIMEOUT': 24 * 60 * 60,
+    'ALLOW_LIST': None,
+    'ALLOW_LIST_ONLY': False,
+}
+
+# Share of the tour price paid per participant on reduced-price bookings,
+# used for the revenue in the tour statistics
+TRAVELAPP_REDUCED_PRICE_RATE = '0.5'
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
@@ -18,7 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from graphene_django.views import GraphQLView
+from TravelApp.async_views import GraphQLView
 from TravelApp.schema import schema
 
 urlpatterns = [